@@ -0,0 +1,172 @@
+"""Benchmark the synthetic catalog with Zipf distributed request URLs
+
+Concurrent keep-alive clients request catalog URLs drawn from a Zipf
+popularity distribution against an in-process server. The ids are sampled in
+constant time and memory however many objects the catalog has. With --urls
+the URLs are printed instead, one per line, for other load generators.
+
+Run from the repository root:
+
+  python3 -m benchmarks.catalog_zipf
+  python3 -m benchmarks.catalog_zipf --objects 100000000 --exponent 0.8 1.2
+  python3 -m benchmarks.catalog_zipf --urls 1000000 > urls.txt
+"""
+
+import argparse
+import asyncio
+import collections
+import math
+import random
+import time
+
+import tornado.httpclient
+import tornado.netutil
+
+from src.app import MockHTTPServer, make_app, percentiles
+
+
+class ZipfSampler:
+    """Sample ranks 1 to `n' with a probability proportional to 1 / rank**s
+
+    Rejection-inversion sampling takes constant time and memory for any `n'.
+
+    See Also:
+    * W. Hormann, G. Derflinger, "Rejection-inversion to generate variates
+      from monotone discrete distributions", ACM TOMACS 6(3), 1996
+    """
+
+    def __init__(self, n: int, exponent: float, seed=None):
+        self.n = n
+        self.exponent = exponent
+        self.random = random.Random(seed)
+        self.h_integral_x1 = self.h_integral(1.5) - 1.0
+        self.h_integral_n = self.h_integral(n + 0.5)
+        self.threshold = 2.0 - self.h_integral_inverse(
+            self.h_integral(2.5) - self.h(2.0)
+        )
+
+    @staticmethod
+    def log1p_ratio(x: float) -> float:
+        """log(1 + x) / x, accurate near zero"""
+        if abs(x) > 1e-8:
+            return math.log1p(x) / x
+        return 1.0 - x * (0.5 - x * (1.0 / 3.0 - 0.25 * x))
+
+    @staticmethod
+    def expm1_ratio(x: float) -> float:
+        """(exp(x) - 1) / x, accurate near zero"""
+        if abs(x) > 1e-8:
+            return math.expm1(x) / x
+        return 1.0 + x * 0.5 * (1.0 + x * (1.0 / 3.0) * (1.0 + 0.25 * x))
+
+    def h(self, x: float) -> float:
+        return math.exp(-self.exponent * math.log(x))
+
+    def h_integral(self, x: float) -> float:
+        log_x = math.log(x)
+        return self.expm1_ratio((1.0 - self.exponent) * log_x) * log_x
+
+    def h_integral_inverse(self, x: float) -> float:
+        t = max(-1.0, x * (1.0 - self.exponent))
+        return math.exp(self.log1p_ratio(t) * x)
+
+    def sample(self) -> int:
+        while True:
+            u = self.h_integral_n + self.random.random() * (
+                self.h_integral_x1 - self.h_integral_n
+            )
+            x = self.h_integral_inverse(u)
+            k = min(self.n, max(1, int(x + 0.5)))
+            if k - x <= self.threshold or u >= self.h_integral(k + 0.5) - self.h(k):
+                return k
+
+
+def zipf_urls(base, objects, exponent, seed=None):
+    """Yield catalog URLs, id 0 the most popular"""
+    sampler = ZipfSampler(objects, exponent, seed=seed)
+    while True:
+        yield f"{base}{sampler.sample() - 1}"
+
+
+async def client(urls, deadline, latencies, sizes):
+    http_client = tornado.httpclient.AsyncHTTPClient(force_instance=True)
+    while time.monotonic() < deadline:
+        began = time.perf_counter()
+        response = await http_client.fetch(next(urls))
+        latencies.append(time.perf_counter() - began)
+        sizes.append(len(response.body))
+    http_client.close()
+
+
+async def run(clients, seconds, objects, exponent, size) -> dict:
+    app = make_app(
+        catalog="/catalog/",
+        catalog_objects=objects,
+        catalog_size=size,
+    )
+    sockets = tornado.netutil.bind_sockets(0, address="127.0.0.1")
+    port = sockets[0].getsockname()[1]
+    server = MockHTTPServer(app)
+    server.add_sockets(sockets)
+
+    # Every client draws from the same popularity distribution
+    urls = zipf_urls(f"http://127.0.0.1:{port}/catalog/", objects, exponent, seed=1)
+    deadline = time.monotonic() + seconds
+    latencies = []
+    sizes = []
+    await asyncio.gather(
+        *[client(urls, deadline, latencies, sizes) for _ in range(clients)]
+    )
+
+    server.stop()
+    await server.close_all_connections()
+
+    result = percentiles(latencies, points=(50, 90, 99))
+    result["requests_per_second"] = len(latencies) / seconds
+    result["megabytes_per_second"] = sum(sizes) / seconds / 1e6
+    return result
+
+
+def popularity(objects, exponent, samples) -> dict:
+    """Return the distinct ids and the share of requests for the top 1%"""
+    counts = collections.Counter()
+    urls = zipf_urls("", objects, exponent, seed=1)
+    for _ in range(samples):
+        counts[next(urls)] += 1
+    top = sum(count for _, count in counts.most_common(max(1, len(counts) // 100)))
+    return {"distinct": len(counts), "top_share": top / samples}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--objects", type=int, default=1000000)
+    parser.add_argument("--exponent", type=float, nargs="+", default=[0.8, 1.0, 1.2])
+    parser.add_argument("--size", default="lognormal:8:1")
+    parser.add_argument("--base", default="http://127.0.0.1:8888/catalog/")
+    parser.add_argument("--urls", type=int, help="print this many URLs and exit")
+    argv = parser.parse_args()
+
+    if argv.urls:
+        urls = zipf_urls(argv.base, argv.objects, argv.exponent[0])
+        for _ in range(argv.urls):
+            print(next(urls))
+        raise SystemExit(0)
+
+    print(
+        f"{'exponent':>8} {'distinct':>8} {'top 1%':>7} {'req/s':>8} {'MB/s':>7} ",
+        end="",
+    )
+    print(" ".join(f"{p:>9}" for p in ["p50 ms", "p90 ms", "p99 ms"]))
+    for exponent in argv.exponent:
+        shares = popularity(argv.objects, exponent, 100000)
+        result = asyncio.run(
+            run(argv.clients, argv.seconds, argv.objects, exponent, argv.size)
+        )
+        print(
+            f"{exponent:>8.2f} {shares['distinct']:>8} {shares['top_share']:>7.1%} "
+            f"{result['requests_per_second']:>8.0f} "
+            f"{result['megabytes_per_second']:>7.1f} "
+            + " ".join(f"{1000 * result[key]:>9.2f}" for key in ["p50", "p90", "p99"])
+        )
@@ -0,0 +1,109 @@
+"""Benchmark request latency while the config file is rewritten
+
+Requests are made by concurrent keep-alive clients against an in-process
+server, once with an unchanged config and once with the config rewritten
+every --rewrite-interval seconds. Reloads should not add to the tail latency.
+
+Run from the repository root:
+
+  python3 -m benchmarks.config_reload
+  python3 -m benchmarks.config_reload --clients 32 --seconds 5 --rules 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import tornado.httpclient
+import tornado.netutil
+
+from src.app import MockHTTPServer, make_app, percentiles
+
+
+def write_config(path, rules, generation):
+    """Write a config with `rules' path rules, none matching the requests"""
+    config = {
+        "defaults": {"max_content_length": 10240 + generation % 2},
+        "rules": [
+            {"name": f"rule-{index}", "path": f"/rule/{index}/", "set": "status:503"}
+            for index in range(rules)
+        ],
+    }
+    with open(path + ".tmp", "w") as f:
+        json.dump(config, f)
+    # Replace the file in one step so a partial file is never read
+    os.replace(path + ".tmp", path)
+
+
+async def client(url, deadline, latencies):
+    http_client = tornado.httpclient.AsyncHTTPClient(force_instance=True)
+    while time.monotonic() < deadline:
+        began = time.perf_counter()
+        await http_client.fetch(url)
+        latencies.append(time.perf_counter() - began)
+    http_client.close()
+
+
+async def rewriter(path, rules, interval, deadline) -> int:
+    generation = 0
+    while time.monotonic() < deadline:
+        await asyncio.sleep(interval)
+        generation += 1
+        write_config(path, rules, generation)
+    return generation
+
+
+async def run(clients, seconds, rules, rewrite_interval) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "config.json")
+        write_config(path, rules, 0)
+        app = make_app(config=path, config_poll_interval=0.05)
+        sockets = tornado.netutil.bind_sockets(0, address="127.0.0.1")
+        port = sockets[0].getsockname()[1]
+        server = MockHTTPServer(app)
+        server.add_sockets(sockets)
+        app.settings["config_store"].start(app)
+
+        url = f"http://127.0.0.1:{port}/test/with.ext?content=1024"
+        deadline = time.monotonic() + seconds
+        latencies = []
+        tasks = [client(url, deadline, latencies) for _ in range(clients)]
+        if rewrite_interval:
+            tasks.append(rewriter(path, rules, rewrite_interval, deadline))
+        await asyncio.gather(*tasks)
+
+        app.settings["config_store"].periodic_callback.stop()
+        server.stop()
+        await server.close_all_connections()
+        reloads = app.settings["config_store"].counters["reloads"]
+
+    result = percentiles(latencies, points=(50, 90, 99, 99.9))
+    result["requests_per_second"] = len(latencies) / seconds
+    result["reloads"] = reloads
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--rules", type=int, default=100)
+    parser.add_argument("--rewrite-interval", type=float, default=0.1)
+    argv = parser.parse_args()
+
+    print(f"{'reloading':>9} {'reloads':>7} {'req/s':>8} ", end="")
+    print(" ".join(f"{p:>9}" for p in ["p50 ms", "p90 ms", "p99 ms", "p99.9 ms"]))
+    for rewrite_interval in [0, argv.rewrite_interval]:
+        result = asyncio.run(
+            run(argv.clients, argv.seconds, argv.rules, rewrite_interval)
+        )
+        print(
+            f"{bool(rewrite_interval)!s:>9} {result['reloads']:>7} "
+            f"{result['requests_per_second']:>8.0f} "
+            + " ".join(
+                f"{1000 * result[key]:>9.2f}" for key in ["p50", "p90", "p99", "p99.9"]
+            )
+        )
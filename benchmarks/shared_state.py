@@ -0,0 +1,74 @@
+"""Benchmark SharedState update cost under contention
+
+Run from the repository root:
+
+  python3 -m benchmarks.shared_state
+  python3 -m benchmarks.shared_state --processes 1 2 4 8 --updates 50000
+"""
+
+import argparse
+import multiprocessing
+import time
+
+from src.app import SharedState
+
+
+def worker(shared_state, keys, updates, start, results):
+    """Add to counters spread over `keys' keys, report the seconds taken"""
+    names = [f"counter-{index}" for index in range(keys)]
+    start.wait()
+    began = time.perf_counter()
+    for update in range(updates):
+        shared_state.add(names[update % keys])
+    results.put(time.perf_counter() - began)
+
+
+def run(processes, keys, updates) -> dict:
+    shared_state = SharedState(counter_slots=max(1024, keys * 8))
+    # The shared memory is inherited by forked processes
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    results = context.Queue()
+    workers = [
+        context.Process(
+            target=worker, args=(shared_state, keys, updates, start, results)
+        )
+        for _ in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    began = time.perf_counter()
+    start.set()
+    seconds = [results.get() for _ in workers]
+    elapsed = time.perf_counter() - began
+    for process in workers:
+        process.join()
+
+    # Check no update was lost
+    total = sum(shared_state.counter(f"counter-{index}") for index in range(keys))
+    assert total == processes * updates, f"lost updates: {total!r}"
+
+    return {
+        "processes": processes,
+        "keys": keys,
+        "ns_per_update": 1e9 * sum(seconds) / (processes * updates),
+        "updates_per_second": processes * updates / elapsed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--keys", type=int, nargs="+", default=[1, 64, 4096])
+    parser.add_argument("--updates", type=int, default=20000)
+    argv = parser.parse_args()
+
+    print(f"{'processes':>9} {'keys':>6} {'ns/update':>10} {'updates/s':>12}")
+    for keys in argv.keys:
+        for processes in argv.processes:
+            result = run(processes, keys, argv.updates)
+            print(
+                f"{result['processes']:>9} {result['keys']:>6} "
+                f"{result['ns_per_update']:>10.0f} "
+                f"{result['updates_per_second']:>12.0f}"
+            )
@@ -1,15 +1,46 @@
+import asyncio
+import collections
+import copy
+import cProfile
 import datetime
+import email.utils
+import fcntl
+import functools
 import gzip
+import hashlib
+import hmac
 import json
 import logging
+import math
+import mmap
+import multiprocessing
+import os
+import pstats
 import random
-
+import re
+import resource
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import tracemalloc
+import types
+import zlib
 from pathlib import Path
 
 # https://www.tornadoweb.org/
 # python -m pip install --upgrade tornado
-import tornado.httpserver
 import tornado.gen
+import tornado.http1connection
+import tornado.httpserver
+import tornado.httputil
+import tornado.ioloop
+import tornado.netutil
+import tornado.process
 import tornado.web
 
 # Silly f-string support
@@ -24,6 +55,24 @@ FOOTBALL_SVG = Path(f"{Path(__file__).parent}/football.svg").read_text()
 # Help file content
 HELP = Path(f"{Path(__file__).parent}/help.txt").read_text()
 
+# Validators of the static responses computed once at start up, the
+# responses change only when this file changes
+STATIC_LAST_MODIFIED = int(Path(__file__).stat().st_mtime)
+STATIC_ETAGS = {
+    key: '"s-{}"'.format(
+        hashlib.blake2b(
+            f"{key}\0{text}\0{STATIC_LAST_MODIFIED}".encode("utf-8"), digest_size=12
+        ).hexdigest()
+    )
+    for key, text in [
+        ("/ping", "pong"),
+        ("/ping.json", "pong"),
+        ("/hello_world", "Hello, World!"),
+        ("/hello_world.json", "Hello, World!"),
+        ("/football.svg", FOOTBALL_SVG),
+    ]
+}
+
 
 class JSONEncoderPlus(json.JSONEncoder):
     """Extend the standard JSONEncoder to handle additional object types."""
@@ -47,13 +96,2903 @@ class JSONEncoderPlus(json.JSONEncoder):
         return super().default(obj)
 
 
+def percentiles(values, points: tuple = (50, 90, 99)) -> dict:
+    """Return a dictionary of nearest-rank percentiles for a list of values
+
+    values <list>: Numeric values to summarize.
+
+    points <tuple>: Percentiles to report (Default = (50, 90, 99))
+    """
+    values = sorted(values)
+    if not values:
+        return {f"p{point}": None for point in points}
+    return {
+        f"p{point}": values[min(len(values) - 1, int(len(values) * point / 100))]
+        for point in points
+    }
+
+
+def memory_rss() -> int:
+    """Return the resident set size of this process in bytes
+
+    The peak resident set size is returned where the current size is not
+    available from /proc.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * mmap.PAGESIZE
+    except OSError:
+        # ru_maxrss is kilobytes on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class ConnectionRecord:
+    """Details for a single client connection to the server"""
+
+    __slots__ = ("server_conn", "started", "requests")
+
+    def __init__(self, server_conn):
+        self.server_conn = server_conn
+        self.started = time.monotonic()
+        self.requests = 0
+
+    def age(self) -> float:
+        return time.monotonic() - self.started
+
+
+class ConnectionStats:
+    """Track requests served and the lifetime of client connections
+
+    history <int>: Number of closed connections kept for reporting.
+        (Default = 1024)
+    """
+
+    def __init__(self, history: int = 1024):
+        # Open connections keyed by their IOStream
+        self.open = {}
+        # Recently closed connections as (requests, lifetime) pairs
+        self.closed = collections.deque(maxlen=history)
+        self.totals = {"opened": 0, "closed": 0, "requests": 0}
+
+    def connection_opened(self, stream, server_conn) -> ConnectionRecord:
+        record = ConnectionRecord(server_conn)
+        self.open[stream] = record
+        self.totals["opened"] += 1
+        return record
+
+    def connection_closed(self, stream):
+        record = self.open.pop(stream, None)
+        if record is None:
+            return
+        self.totals["closed"] += 1
+        self.closed.append((record.requests, record.age()))
+
+    def request_started(self, stream):
+        record = self.open.get(stream)
+        if record is not None:
+            record.requests += 1
+            self.totals["requests"] += 1
+
+    def lookup(self, stream):
+        """Return the ConnectionRecord for a stream or None when untracked"""
+        return self.open.get(stream)
+
+    def stats(self) -> dict:
+        requests = [count for count, _ in self.closed]
+        lifetimes = [round(lifetime, 3) for _, lifetime in self.closed]
+        return {
+            "open": len(self.open),
+            "totals": dict(self.totals),
+            "closed_recently": len(self.closed),
+            "requests_per_connection": {
+                "max": max(requests, default=None),
+                **percentiles(requests),
+            },
+            "lifetime_seconds": {
+                "max": max(lifetimes, default=None),
+                **percentiles(lifetimes),
+            },
+        }
+
+
+class AdmissionControl:
+    """Limit the requests and request body bytes in-flight for this worker
+
+    Requests over the limits wait in a bounded FIFO queue and are shed when
+    the queue is full or the wait exceeds `queue_timeout'.
+
+    max_inflight <int>: Maximum requests handled at the same time.
+        (Default = None, unlimited)
+
+    max_inflight_bytes <int>: Maximum request body bytes held at the same
+        time. A single request larger than this is admitted alone.
+        (Default = None, unlimited)
+
+    max_queue <int>: Maximum requests waiting for admission. (Default = 0)
+
+    queue_timeout <float>: Maximum seconds a request waits for admission.
+        (Default = None, wait until admitted)
+    """
+
+    def __init__(
+        self,
+        max_inflight: int | None = None,
+        max_inflight_bytes: int | None = None,
+        max_queue: int = 0,
+        queue_timeout: float | None = None,
+    ):
+        self.max_inflight = max_inflight
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_queue = max_queue or 0
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.inflight_bytes = 0
+        # Waiting requests as (future, size) pairs, timed out futures are
+        # cancelled and skipped lazily so removal stays O(1)
+        self.waiters = collections.deque()
+        self.queue_depth = 0
+        self.counters = {"admitted": 0, "queued": 0}
+        self.shed = {"queue_full": 0, "queue_timeout": 0}
+
+    def fits(self, size: int) -> bool:
+        if self.max_inflight is not None and self.inflight >= self.max_inflight:
+            return False
+        if (
+            self.max_inflight_bytes is not None
+            and self.inflight_bytes
+            and self.inflight_bytes + size > self.max_inflight_bytes
+        ):
+            return False
+        return True
+
+    def admit(self, size: int):
+        self.inflight += 1
+        self.inflight_bytes += size
+        self.counters["admitted"] += 1
+
+    async def acquire(self, size: int = 0):
+        """Wait for admission, return the reason when the request is shed"""
+        if not self.queue_depth and self.fits(size):
+            self.admit(size)
+            return None
+
+        if self.queue_depth >= self.max_queue:
+            self.shed["queue_full"] += 1
+            return "queue full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append((waiter, size))
+        self.queue_depth += 1
+        self.counters["queued"] += 1
+        try:
+            if self.queue_timeout is None:
+                await waiter
+            else:
+                await tornado.gen.with_timeout(
+                    datetime.timedelta(seconds=self.queue_timeout), waiter
+                )
+        except tornado.gen.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Give back an admission granted as the request was cancelled
+            if waiter.done() and not waiter.cancelled():
+                self.release(size)
+            raise
+        finally:
+            # A request no longer waiting is skipped lazily by release
+            if not waiter.done() or waiter.cancelled():
+                waiter.cancel()
+                self.queue_depth -= 1
+        if waiter.cancelled():
+            self.shed["queue_timeout"] += 1
+            return "queue timeout"
+        return None
+
+    def hold(self, size: int):
+        """Count more request body bytes of an admitted request"""
+        self.inflight_bytes += size
+
+    def release(self, size: int = 0):
+        self.inflight -= 1
+        self.inflight_bytes -= size
+        # Admit waiting requests in order while they fit
+        while self.waiters:
+            waiter, waiter_size = self.waiters[0]
+            if waiter.cancelled():
+                self.waiters.popleft()
+                continue
+            if not self.fits(waiter_size):
+                break
+            self.waiters.popleft()
+            self.queue_depth -= 1
+            self.admit(waiter_size)
+            waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "inflight_bytes": self.inflight_bytes,
+            "queue_depth": self.queue_depth,
+            "limits": {
+                "max_inflight": self.max_inflight,
+                "max_inflight_bytes": self.max_inflight_bytes,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+            },
+            "totals": dict(self.counters),
+            "shed": dict(self.shed),
+        }
+
+
+class RequestBody:
+    """Measure a request body as it is received without holding all of it
+
+    The size, a SHA-256 digest and the throughput are updated for each chunk
+    while only the first `keep' bytes are held for echoing back.
+
+    keep <int>: Number of leading body bytes held. (Default = 10240)
+
+    hashed <bool>: Calculate the SHA-256 digest of the body. (Default = True)
+    """
+
+    __slots__ = ("keep", "kept", "size", "hash", "started", "finished")
+
+    def __init__(self, keep: int = 10240, hashed: bool = True):
+        self.keep = keep
+        self.kept = bytearray()
+        self.size = 0
+        self.hash = hashlib.sha256() if hashed else None
+        self.started = None
+        self.finished = None
+
+    def received(self, chunk: bytes):
+        if self.started is None:
+            self.started = time.perf_counter()
+        self.size += len(chunk)
+        if self.hash is not None:
+            self.hash.update(chunk)
+        if len(self.kept) < self.keep:
+            self.kept += chunk[: self.keep - len(self.kept)]
+
+    def complete(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > len(self.kept)
+
+    def seconds(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def throughput(self) -> float:
+        """Return the bytes received per second, None when too quick to tell"""
+        seconds = self.seconds()
+        return self.size / seconds if seconds > 0 else None
+
+    def summary(self) -> dict:
+        return {
+            "bytes": self.size,
+            "seconds": round(self.seconds(), 6),
+            "bytes_per_second": self.throughput(),
+            "sha256": self.hash.hexdigest() if self.hash is not None else None,
+            "truncated": self.truncated,
+        }
+
+
+class UploadSink:
+    """Select the uploads whose request bodies are read and discarded
+
+    A sink gives a target which accepts uploads at line rate for measuring
+    the upload path of a proxy. The body is counted and optionally hashed
+    but never held.
+
+    matches <list>: Sink specifications, method:<POST|PUT> or path:<prefix>.
+        (Default = None, only requests with `?sink')
+
+    read_rate <float>: Maximum body bytes read per second by each request,
+        simulating a slow consumer. (Default = None, unlimited)
+    """
+
+    METHODS = ("POST", "PUT")
+
+    def __init__(self, matches: list | None = None, read_rate: float | None = None):
+        self.matches = []
+        for spec in matches or []:
+            key, _, value = spec.partition(":")
+            if key == "method" and value.upper() in self.METHODS:
+                self.matches.append((key, value.upper()))
+            elif key == "path" and value:
+                self.matches.append((key, value))
+            else:
+                raise ValueError(f"Unknown sink: {spec!r}")
+        if read_rate is not None and read_rate <= 0:
+            raise ValueError(f"Sink read rate must be positive: {read_rate!r}")
+        self.read_rate = read_rate
+        self.counters = {"requests": 0, "bytes": 0}
+        self.seconds = 0.0
+
+    def select(self, method: str, path: str) -> bool:
+        """Return True when the request body should be discarded"""
+        for key, value in self.matches:
+            if key == "method" and method == value:
+                return True
+            if key == "path" and path.startswith(value):
+                return True
+        return False
+
+    def record(self, request_body: RequestBody):
+        self.counters["requests"] += 1
+        self.counters["bytes"] += request_body.size
+        self.seconds += request_body.seconds()
+
+    def stats(self) -> dict:
+        return {
+            "matches": [f"{key}:{value}" for key, value in self.matches],
+            "read_rate": self.read_rate,
+            "totals": dict(self.counters),
+            "bytes_per_second": (
+                self.counters["bytes"] / self.seconds if self.seconds else None
+            ),
+        }
+
+
+class DrainControl:
+    """Track requests in-flight and drain them when the server is stopped
+
+    timeout <float>: Seconds to wait for requests in-flight to finish before
+        the remaining connections are closed. (Default = 25)
+    """
+
+    def __init__(self, timeout: float = 25):
+        self.timeout = timeout
+        self.inflight = 0
+        self.finished = 0
+        self.ready = True
+        self.draining = False
+        self.idle = None
+
+    def request_started(self):
+        self.inflight += 1
+
+    def request_finished(self):
+        self.inflight -= 1
+        self.finished += 1
+        if self.idle is not None and self.inflight == 0:
+            self.idle.set()
+
+    def force(self):
+        """Stop waiting for requests in-flight"""
+        if self.idle is not None:
+            self.idle.set()
+
+    async def drain(self, server) -> dict:
+        """Stop accepting connections, wait for the requests in-flight to
+        finish up to the timeout, then close all connections
+
+        server <tornado.httpserver.HTTPServer>: Server to drain.
+        """
+        # Report not ready and stop accepting new connections
+        self.ready = False
+        self.draining = True
+        server.stop()
+
+        began = time.monotonic()
+        inflight = self.inflight
+        finished = self.finished
+        self.idle = asyncio.Event()
+        if self.inflight:
+            logging.info(f"Draining {inflight} requests in-flight")
+            try:
+                await asyncio.wait_for(self.idle.wait(), self.timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        # Close idle keep-alive connections and any requests still in-flight
+        counts = {
+            "inflight": inflight,
+            "finished": self.finished - finished,
+            "forced": self.inflight,
+            "connections": len(server._connections),
+            "seconds": round(time.monotonic() - began, 3),
+        }
+        await server.close_all_connections()
+        log = logging.warning if counts["forced"] else logging.info
+        log(
+            f"Drained {counts['finished']} requests in {counts['seconds']}s, "
+            f"{counts['forced']} requests still in-flight were closed "
+            f"with {counts['connections']} connections"
+        )
+        return counts
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "draining": self.draining,
+            "inflight": self.inflight,
+            "timeout": self.timeout,
+        }
+
+
+class LoopMonitor:
+    """Measure the IOLoop lag and capture callbacks blocking the IOLoop
+
+    The lag is how late a callback scheduled for a time runs. When a
+    `threshold' is set a watchdog thread captures the stack of the IOLoop
+    thread once the IOLoop is blocked for longer than the threshold, the
+    handler stage is the innermost request handler method in the stack.
+
+    interval <float>: Seconds between lag samples. (Default = 0.1)
+
+    samples <int>: Number of recent lag samples kept. (Default = 600)
+
+    threshold <float>: Seconds blocked before the running callback is
+        captured, None disables the watchdog thread. (Default = None)
+
+    offenders <int>: Number of recent blocking callbacks kept. (Default = 20)
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        samples: int = 600,
+        threshold: float | None = None,
+        offenders: int = 20,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = 0.0
+        # Recent (time, lag) samples
+        self.samples = collections.deque(maxlen=samples)
+        self.offenders = collections.deque(maxlen=offenders)
+        self.blocked = 0
+        self.io_loop = None
+        self.expected = None
+        self.timeout = None
+        # Set by the watchdog thread: (expected, offender)
+        self.pending = None
+        self.thread = None
+        self.thread_id = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        """Sample the lag and watch for blocking callbacks while the IOLoop runs"""
+        self.io_loop = tornado.ioloop.IOLoop.current()
+        self.schedule()
+        if self.threshold:
+            self.thread_id = threading.get_ident()
+            self.stopping.clear()
+            self.thread = threading.Thread(
+                target=self.watch, name="LoopMonitor", daemon=True
+            )
+            self.thread.start()
+
+    def stop(self):
+        if self.timeout is not None:
+            self.io_loop.remove_timeout(self.timeout)
+            self.timeout = None
+        if self.thread is not None:
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+
+    def schedule(self):
+        self.expected = self.io_loop.time() + self.interval
+        self.timeout = self.io_loop.call_at(self.expected, self.sample)
+
+    def sample(self):
+        now = self.io_loop.time()
+        self.lag = max(0.0, now - self.expected)
+        self.samples.append((now, self.lag))
+        pending = self.pending
+        if pending is not None:
+            self.pending = None
+            expected, offender = pending
+            if expected == self.expected:
+                offender["blocked"] = round(self.lag, 6)
+                self.offenders.append(offender)
+                self.blocked += 1
+                logging.warning(
+                    f"IOLoop blocked for {self.lag:.3f}s in {offender['stage']}, "
+                    f"stack (most recent call last):\n  "
+                    + "\n  ".join(offender["stack"])
+                )
+        self.schedule()
+
+    def watch(self):
+        """Capture the IOLoop thread stack when a callback blocks the IOLoop"""
+        captured = None
+        while not self.stopping.wait(max(self.threshold / 2, 0.01)):
+            expected = self.expected
+            if expected is None or expected == captured:
+                continue
+            # IOLoop.time only reads the clock, it is safe to call here
+            if self.io_loop.time() - expected > self.threshold:
+                captured = expected
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is not None:
+                    self.pending = (expected, self.offender(frame))
+                del frame
+
+    @staticmethod
+    def offender(frame, limit: int = 12) -> dict:
+        """Describe the stage and the innermost `limit' frames of a stack"""
+        stage = None
+        caller = frame
+        while caller is not None and stage is None:
+            code = caller.f_code
+            if code.co_filename == __file__ and "Handler." in code.co_qualname:
+                stage = code.co_qualname
+            caller = caller.f_back
+        return {
+            "time": datetime.datetime.now(datetime.timezone.utc),
+            "stage": stage,
+            "stack": [
+                f"{summary.filename}:{summary.lineno} {summary.name}"
+                for summary in traceback.extract_stack(frame)[-limit:]
+            ],
+        }
+
+    def recent_lag(self, seconds: float = 2) -> float:
+        """Return the largest lag sampled in the last `seconds'"""
+        if not self.samples:
+            return self.lag
+        since = self.samples[-1][0] - seconds
+        return max(lag for when, lag in self.samples if when >= since)
+
+    def stats(self) -> dict:
+        lags = [lag for when, lag in self.samples]
+        recent = percentiles(lags, points=(50, 90, 99, 100))
+        recent["max"] = recent.pop("p100")
+        return {
+            "interval": self.interval,
+            "lag": self.lag,
+            "recent": recent,
+            "threshold": self.threshold,
+            "blocked": self.blocked,
+            "offenders": list(self.offenders),
+        }
+
+
+class HealthCheck:
+    """Decide whether the server is ready for more requests
+
+    Readiness fails while draining or when a load threshold is crossed.
+
+    max_loop_lag <float>: Maximum IOLoop lag in seconds. (Default = None)
+
+    max_inflight <int>: Maximum requests in-flight. (Default = None)
+
+    max_rss <int>: Maximum resident set size in bytes. (Default = None)
+    """
+
+    def __init__(
+        self,
+        max_loop_lag: float | None = None,
+        max_inflight: int | None = None,
+        max_rss: int | None = None,
+    ):
+        self.max_loop_lag = max_loop_lag
+        self.max_inflight = max_inflight
+        self.max_rss = max_rss
+        self.counters = {"ready": 0, "not_ready": 0}
+
+    def check(self, drain_control=None, loop_monitor=None) -> tuple:
+        """Return the measured values and the reasons for not being ready"""
+        values = {"rss": memory_rss()}
+        reasons = []
+        if drain_control is not None:
+            values["inflight"] = drain_control.inflight
+            if drain_control.draining:
+                reasons.append("draining")
+            if self.max_inflight is not None and (
+                drain_control.inflight > self.max_inflight
+            ):
+                reasons.append(
+                    f"inflight {drain_control.inflight} > {self.max_inflight}"
+                )
+        if loop_monitor is not None:
+            # One on time sample after a stall does not make the server ready
+            lag = loop_monitor.recent_lag()
+            values["loop_lag"] = round(lag, 6)
+            if self.max_loop_lag is not None and lag > self.max_loop_lag:
+                reasons.append(f"loop lag {lag:.3f}s > {self.max_loop_lag}s")
+        if self.max_rss is not None and values["rss"] > self.max_rss:
+            reasons.append(f"rss {values['rss']} > {self.max_rss}")
+
+        self.counters["not_ready" if reasons else "ready"] += 1
+        return values, reasons
+
+    def stats(self) -> dict:
+        return {
+            "max_loop_lag": self.max_loop_lag,
+            "max_inflight": self.max_inflight,
+            "max_rss": self.max_rss,
+            "checks": dict(self.counters),
+        }
+
+
+def parse_distribution(spec: str):
+    """Return a function which samples values from a distribution
+
+    spec <str>: A <name>[:<arg>[:<arg>]] distribution specification, the
+        arguments are those used by the Python random module.
+        const:<value>
+        uniform:<low>:<high>
+        exp:<mean>
+        normal:<mean>:<stddev> (negative values are sampled as zero)
+        lognormal:<mu>:<sigma>
+        pareto:<scale>:<alpha>
+
+    The returned function samples from the random module, or from the
+    random.Random instance it is called with so a seeded instance returns the
+    same values each time.
+
+    See Also:
+    * docs.python.org/3/library/random.html#real-valued-distributions
+    """
+    name, *args = spec.split(":")
+    args = [float(arg) for arg in args]
+    # NOTE: The random module is not used in any security context here
+    if name == "const" and len(args) == 1:
+        return lambda rng=random: args[0]
+    if name == "uniform" and len(args) == 2:
+        return lambda rng=random: rng.uniform(*args)  # nosec B311
+    if name == "exp" and len(args) == 1:
+        return lambda rng=random: rng.expovariate(1 / args[0]) if args[0] else 0.0  # nosec B311
+    if name == "normal" and len(args) == 2:
+        return lambda rng=random: max(0.0, rng.normalvariate(*args))  # nosec B311
+    if name == "lognormal" and len(args) == 2:
+        return lambda rng=random: rng.lognormvariate(*args)  # nosec B311
+    if name == "pareto" and len(args) == 2:
+        return lambda rng=random: args[0] * rng.paretovariate(args[1])  # nosec B311
+    raise ValueError(f"Unknown distribution: {spec!r}")
+
+
+class WorkerPool:
+    """A pool of virtual workers which each serve one request at a time
+
+    Requests wait in FIFO order for a free worker and hold it for a service
+    time sampled from a distribution, similar to a M/G/c queue.
+
+    workers <int>: Number of virtual workers.
+
+    service_time <str>: Service time distribution in seconds, see
+        parse_distribution. (Default = "const:0")
+    """
+
+    def __init__(self, workers: int, service_time: str = "const:0"):
+        self.workers = workers
+        self.service_time = service_time
+        self.sample = parse_distribution(service_time)
+        # asyncio.Semaphore keeps waiters in a deque, so a large number of
+        # waiting requests costs a future each and O(1) per wake up
+        self.semaphore = asyncio.Semaphore(workers)
+        self.busy = 0
+        self.waiting = 0
+        self.served = 0
+        self.recent_waits = collections.deque(maxlen=1024)
+
+    async def serve(self) -> tuple:
+        """Wait for a worker and hold it, return the (wait, service) seconds"""
+        queued = time.monotonic()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        wait = time.monotonic() - queued
+        self.recent_waits.append(wait)
+        self.busy += 1
+        service = self.sample()
+        try:
+            await asyncio.sleep(service)
+        finally:
+            self.busy -= 1
+            self.served += 1
+            self.semaphore.release()
+        return wait, service
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "service_time": self.service_time,
+            "busy": self.busy,
+            "waiting": self.waiting,
+            "served": self.served,
+            "wait_seconds": {
+                key: None if value is None else round(value, 6)
+                for key, value in percentiles(self.recent_waits).items()
+            },
+        }
+
+
+class CapacityModel:
+    """Select the virtual worker pool used for a request
+
+    pools <list>: Worker pool specifications using the `?set' like syntax:
+        workers:<int>,service:<distribution>[,host:<str>|path:<prefix>]
+        A pool without a host or path match is used for all other requests.
+    """
+
+    def __init__(self, pools: list | None = None):
+        self.pools = []
+        self.default = None
+        for spec in pools or []:
+            options = dict(option.split(":", 1) for option in spec.split(","))
+            pool = WorkerPool(
+                int(options["workers"]), options.get("service", "const:0")
+            )
+            if "host" in options:
+                self.pools.append(("host", options["host"].lower(), pool))
+            elif "path" in options:
+                self.pools.append(("path", options["path"], pool))
+            else:
+                self.default = pool
+
+    def select(self, host: str, path: str):
+        """Return the WorkerPool for a request or None when not modeled"""
+        for match_key, match_value, pool in self.pools:
+            if match_key == "host" and host.lower() == match_value:
+                return pool
+            if match_key == "path" and path.startswith(match_value):
+                return pool
+        return self.default
+
+    def stats(self) -> dict:
+        stats = {f"{k}:{v}": pool.stats() for k, v, pool in self.pools}
+        if self.default is not None:
+            stats["default"] = self.default.stats()
+        return stats
+
+
+class StreamEcho(UploadSink):
+    """Select the uploads whose request bodies are streamed back
+
+    Each chunk of a matching request body is written back as the response
+    body while the rest is still arriving, so the request and response
+    buffering of a proxy are measured together.
+
+    matches <list>: Echo specifications, method:<POST|PUT> or path:<prefix>.
+        (Default = None, only requests with `?echo')
+    """
+
+    def __init__(self, matches: list | None = None):
+        super().__init__(matches=matches)
+
+    def stats(self) -> dict:
+        return {
+            "matches": [f"{key}:{value}" for key, value in self.matches],
+            "totals": dict(self.counters),
+        }
+
+
+class RevalidationStats:
+    """Count the responses validated before rendering and the conditional
+    requests answered with a 304 status code"""
+
+    def __init__(self):
+        self.counters = {"validated": 0, "conditional": 0, "not_modified": 0}
+
+    def record(self, conditional: bool, not_modified: bool):
+        self.counters["validated"] += 1
+        self.counters["conditional"] += int(conditional)
+        self.counters["not_modified"] += int(not_modified)
+
+    def stats(self) -> dict:
+        conditional = self.counters["conditional"]
+        return {
+            "totals": dict(self.counters),
+            "not_modified_ratio": (
+                self.counters["not_modified"] / conditional if conditional else None
+            ),
+        }
+
+
+class GeneratedContent:
+    """Deterministic generated content where any byte range is read directly
+
+    The content is split into blocks of BLOCK_SIZE bytes. Each block is a
+    SHAKE-128 digest of the seed and block number mapped onto the fill
+    pattern, so reading a range only generates the blocks it covers.
+
+    length <int>: Content length in bytes.
+
+    fill <str>: ASCII characters the content is drawn from, so the content
+        is valid text of `length' bytes. (Default = letters, digits and a space)
+
+    seed <str>: Seed of the content. (Default = "0")
+    """
+
+    BLOCK_SIZE = 65536
+    DEFAULT_FILL = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 "
+    # Changed whenever the generated bytes change, invalidating the ETags
+    VERSION = 1
+
+    def __init__(self, length: int, fill: str | None = None, seed: str = "0"):
+        self.length = length
+        self.fill = fill or self.DEFAULT_FILL
+        if not self.fill.isascii():
+            raise ValueError(f"Fill pattern must be ASCII: {self.fill!r}")
+        self.seed = str(seed)
+        self.table = self.fill_table(self.fill)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def fill_table(fill: str) -> bytes:
+        """Map each digest byte onto the fill pattern with bytes.translate"""
+        pattern = fill.encode("utf-8")
+        return bytes(pattern[i % len(pattern)] for i in range(256))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def etag(self, encoding: str | None = None) -> str:
+        """Return a strong ETag derived from the parameters, not the bytes
+
+        encoding <str>: Content-Encoding of the representation, which is
+            added to the ETag. (Default = None, identity)
+        """
+        digest = hashlib.blake2b(
+            f"{self.VERSION}\0{self.length}\0{self.fill}\0{self.seed}".encode("utf-8"),
+            digest_size=12,
+        ).hexdigest()
+        tag = f"g{self.VERSION}-{digest}"
+        if encoding:
+            tag = f"{tag}-{encoding}"
+        return f'"{tag}"'
+
+    def block(self, index: int, size: int = BLOCK_SIZE) -> bytes:
+        """Return the first `size' bytes of a block
+
+        SHAKE-128 is an extendable output function, a shorter digest is a
+        prefix of a longer one so a partial block matches the whole block.
+        """
+        digest = hashlib.shake_128(f"{self.seed}:{index}".encode("utf-8"))
+        return digest.digest(size).translate(self.table)
+
+    def read(self, start: int = 0, end: int | None = None) -> bytes:
+        """Return the bytes from `start' up to, not including, `end'"""
+        end = self.length if end is None else min(end, self.length)
+        if start >= end:
+            return b""
+        first = start // self.BLOCK_SIZE
+        last = (end - 1) // self.BLOCK_SIZE
+        offset = first * self.BLOCK_SIZE
+        data = b"".join(
+            self.block(index, min(self.BLOCK_SIZE, end - index * self.BLOCK_SIZE))
+            for index in range(first, last + 1)
+        )
+        return data[start - offset :]
+
+
+def parse_byte_ranges(header: str, length: int, max_ranges: int = 100):
+    """Return the (start, end) byte ranges of a Range request header
+
+    The end of each range is exclusive. Return None when the header is not
+    a valid byte range set and is ignored, or an empty list when none of the
+    ranges are satisfiable.
+
+    header <str>: Range request header value, e.g. "bytes=0-99,-100".
+
+    length <int>: Length of the selected representation in bytes.
+
+    max_ranges <int>: Maximum ranges in a request, more are ignored.
+        (Default = 100)
+
+    See Also:
+    * https://httpwg.org/specs/rfc9110.html#field.range
+    """
+    unit, _, range_set = header.partition("=")
+    if unit.strip().lower() != "bytes" or not range_set.strip():
+        return None
+    specs = range_set.split(",")
+    if len(specs) > max_ranges:
+        return None
+    ranges = []
+    for spec in specs:
+        first, sep, last = spec.strip().partition("-")
+        if not sep:
+            return None
+        if not first and last.isdigit():
+            # A suffix range of the last bytes
+            start, end = max(0, length - int(last)), length
+        elif first.isdigit() and (not last or last.isdigit()):
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            end = min(int(last) + 1, length) if last else length
+        else:
+            return None
+        if start < end:
+            ranges.append((start, end))
+    return ranges
+
+
+class StoredObject:
+    """The body of an object and the response headers fixed when created"""
+
+    __slots__ = ("body", "headers")
+
+    def __init__(self, body: bytes, headers: dict):
+        self.body = body
+        self.headers = headers
+
+
+class ObjectStore:
+    """An in-process LRU cache of stable generated objects with a byte budget
+
+    The size and response headers of an object are sampled from a random
+    generator seeded by its key when first requested, so an object evicted
+    and created again, or created by another worker, is identical but for
+    its Last-Modified header, the time the object was created. The least
+    recently used objects are evicted once their bodies are over the byte
+    budget, optionally spilling to a memory-mapped file which is written as
+    a ring so the oldest spilled objects are overwritten first.
+
+    budget <int>: Bytes of object bodies kept in memory. (Default = 67108864)
+
+    size <str>: Distribution of the object sizes in bytes, see
+        parse_distribution, capped to the budget. (Default = "lognormal:9:1")
+
+    max_age <str>: Distribution of the Cache-Control max-age in seconds.
+        (Default = "const:3600")
+
+    age <str>: Distribution of the Age header in seconds, capped to the
+        max-age. (Default = None, no Age header)
+
+    spill <str>: Directory of the spill file, an unlinked temporary file of
+        each worker process. (Default = None, evicted objects are dropped)
+
+    spill_size <int>: Size of the spill file in bytes. (Default = 1073741824)
+    """
+
+    def __init__(
+        self,
+        budget: int | None = None,
+        size: str | None = None,
+        max_age: str | None = None,
+        age: str | None = None,
+        spill: str | None = None,
+        spill_size: int | None = None,
+    ):
+        self.budget = 67108864 if budget is None else budget
+        self.sample_size = parse_distribution(size or "lognormal:9:1")
+        self.sample_max_age = parse_distribution(max_age or "const:3600")
+        self.sample_age = parse_distribution(age) if age else None
+        # Objects kept in memory, least recently used first
+        self.objects = collections.OrderedDict()
+        self.bytes = 0
+        # Objects spilled to the file, (offset, length, headers) oldest first
+        self.spilled = collections.OrderedDict()
+        self.spill_map = None
+        self.spill_size = 0
+        self.spill_offset = 0
+        self.spill_bytes = 0
+        if spill:
+            self.spill_size = 1073741824 if spill_size is None else spill_size
+            with tempfile.TemporaryFile(dir=spill) as spill_file:
+                spill_file.truncate(self.spill_size)
+                self.spill_map = mmap.mmap(spill_file.fileno(), self.spill_size)
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "evicted_bytes": 0,
+            "spilled": 0,
+            "spill_hits": 0,
+            "spill_evictions": 0,
+        }
+
+    def create(self, key: str) -> StoredObject:
+        """Return the object of a key, the same each time it is created"""
+        # NOTE: The random module is not used in any security context here
+        rng = random.Random(key)  # nosec B311
+        size = min(self.budget, int(self.sample_size(rng)))
+        max_age = int(self.sample_max_age(rng))
+        content = GeneratedContent(size, seed=key)
+        headers = {
+            "Cache-Control": f"public, max-age={max_age}",
+            "Content-Type": "application/octet-stream",
+            "Etag": content.etag(),
+            "Last-Modified": email.utils.formatdate(usegmt=True),
+        }
+        if self.sample_age is not None:
+            headers["Age"] = str(min(max_age, int(self.sample_age(rng))))
+        return StoredObject(content.read(), headers)
+
+    def get(self, key: str) -> StoredObject:
+        """Return the object of a key, from memory, the spill file or created"""
+        stored = self.objects.get(key)
+        if stored is not None:
+            self.objects.move_to_end(key)
+            self.counters["hits"] += 1
+            return stored
+        spilled = self.spilled.get(key)
+        if spilled is not None:
+            offset, length, headers = spilled
+            stored = StoredObject(self.spill_map[offset : offset + length], headers)
+            self.counters["spill_hits"] += 1
+        else:
+            stored = self.create(key)
+            self.counters["misses"] += 1
+        self.store(key, stored)
+        return stored
+
+    def store(self, key: str, stored: StoredObject):
+        """Keep an object in memory, evicting the least recently used"""
+        self.objects[key] = stored
+        self.bytes += len(stored.body)
+        while self.bytes > self.budget:
+            evicted_key, evicted = self.objects.popitem(last=False)
+            self.bytes -= len(evicted.body)
+            self.counters["evictions"] += 1
+            self.counters["evicted_bytes"] += len(evicted.body)
+            self.spill(evicted_key, evicted)
+
+    def spill(self, key: str, stored: StoredObject):
+        """Write an evicted object to the spill file, when there is one"""
+        length = len(stored.body)
+        if (
+            self.spill_map is None
+            or key in self.spilled
+            or not 0 < length <= self.spill_size
+        ):
+            return
+        start = self.spill_offset
+        wrapped = start + length > self.spill_size
+        if wrapped:
+            start = 0
+        end = start + length
+        # Overwrite the oldest objects, which are those after the offset
+        while self.spilled:
+            oldest = next(iter(self.spilled))
+            offset, spilled_length, _ = self.spilled[oldest]
+            overlaps = offset < end and start < offset + spilled_length
+            if not (overlaps or (wrapped and offset >= self.spill_offset)):
+                break
+            del self.spilled[oldest]
+            self.spill_bytes -= spilled_length
+            self.counters["spill_evictions"] += 1
+        self.spill_map[start:end] = stored.body
+        self.spilled[key] = (start, length, stored.headers)
+        self.spill_bytes += length
+        self.spill_offset = end
+        self.counters["spilled"] += 1
+
+    def stats(self) -> dict:
+        requests = (
+            self.counters["hits"]
+            + self.counters["spill_hits"]
+            + self.counters["misses"]
+        )
+        return {
+            "budget": self.budget,
+            "objects": len(self.objects),
+            "bytes": self.bytes,
+            "spill": (
+                {
+                    "size": self.spill_size,
+                    "objects": len(self.spilled),
+                    "bytes": self.spill_bytes,
+                }
+                if self.spill_map is not None
+                else None
+            ),
+            "totals": dict(self.counters),
+            "hit_ratio": self.counters["hits"] / requests if requests else None,
+        }
+
+
+class Catalog:
+    """A synthetic catalog of objects described by their id alone
+
+    The size, content type and cacheability of an object are sampled from a
+    random generator seeded by its id each time it is requested, so a lookup
+    takes constant time and no state is kept for any object however many
+    objects the catalog has.
+
+    objects <int>: Objects in the catalog, ids 0 up to objects - 1.
+        (Default = 100000000)
+
+    size <str>: Distribution of the object sizes in bytes, see
+        parse_distribution. (Default = "lognormal:9:1.5")
+
+    max_size <int>: Largest object size in bytes. (Default = 104857600)
+
+    types <str>: Comma separated <content type>:<weight> of the objects.
+        (Default = DEFAULT_TYPES)
+
+    cacheable <float>: Fraction of the objects which are cacheable, others
+        are sent with `Cache-Control: private, no-store'. (Default = 0.9)
+
+    max_age <str>: Distribution of the Cache-Control max-age in seconds of
+        the cacheable objects. (Default = "const:86400")
+    """
+
+    DEFAULT_TYPES = "image/jpeg:5,text/html:2,application/javascript:2,video/mp4:1"
+
+    def __init__(
+        self,
+        objects: int | None = None,
+        size: str | None = None,
+        max_size: int | None = None,
+        types: str | None = None,
+        cacheable: float | None = None,
+        max_age: str | None = None,
+    ):
+        self.objects = 100000000 if objects is None else objects
+        self.size = size or "lognormal:9:1.5"
+        self.sample_size = parse_distribution(self.size)
+        self.max_size = 104857600 if max_size is None else max_size
+        self.types = []
+        cum_weights = []
+        for spec in (types or self.DEFAULT_TYPES).split(","):
+            content_type, _, weight = spec.strip().rpartition(":")
+            if not content_type or float(weight) <= 0:
+                raise ValueError(f"Unknown catalog content type: {spec!r}")
+            self.types.append(content_type)
+            cum_weights.append((cum_weights[-1] if cum_weights else 0) + float(weight))
+        self.cum_weights = cum_weights
+        self.cacheable = 0.9 if cacheable is None else cacheable
+        self.sample_max_age = parse_distribution(max_age or "const:86400")
+        self.counters = {"lookups": 0, "not_found": 0}
+
+    def describe(self, object_id: int):
+        """Return the GeneratedContent and response headers of an object, or
+        None when the id is not in the catalog"""
+        self.counters["lookups"] += 1
+        if not 0 <= object_id < self.objects:
+            self.counters["not_found"] += 1
+            return None
+        key = f"catalog:{object_id}"
+        # NOTE: The random module is not used in any security context here
+        rng = random.Random(key)  # nosec B311
+        content = GeneratedContent(
+            max(0, min(self.max_size, int(self.sample_size(rng)))), seed=key
+        )
+        content_type = rng.choices(self.types, cum_weights=self.cum_weights)[0]
+        if rng.random() < self.cacheable:
+            cache_control = f"public, max-age={int(self.sample_max_age(rng))}"
+        else:
+            cache_control = "private, no-store"
+        headers = {
+            "Cache-Control": cache_control,
+            "Content-Type": content_type,
+            "Etag": content.etag(),
+        }
+        return content, headers
+
+    def stats(self) -> dict:
+        return {
+            "objects": self.objects,
+            "size": self.size,
+            "max_size": self.max_size,
+            "types": self.types,
+            "cacheable": self.cacheable,
+            "totals": dict(self.counters),
+        }
+
+
+class SharedSlots:
+    """A fixed size table of keyed slots in memory shared by forked workers
+
+    Each slot holds a 64-bit key digest and two float values. A key hashes to
+    a bucket of `ways' slots guarded by one of a set of striped locks. When a
+    bucket is full the slot with the smallest second value (by convention the
+    time last used) is replaced, so memory use never grows.
+
+    slots <int>: Number of slots, rounded up to a whole bucket.
+
+    ways <int>: Number of slots in each bucket. (Default = 8)
+
+    locks <int>: Number of locks striped across the buckets. (Default = 64)
+    """
+
+    SLOT = struct.Struct("Qdd")
+
+    def __init__(self, slots: int, ways: int = 8, locks: int = 64):
+        self.ways = ways
+        self.buckets = max(1, -(-slots // ways))
+        self.slots = self.buckets * ways
+        # An anonymous shared mapping is inherited by processes forked later
+        # https://docs.python.org/3/library/mmap.html
+        self.memory = mmap.mmap(-1, self.slots * self.SLOT.size)
+        self.locks = [multiprocessing.Lock() for _ in range(min(locks, self.buckets))]
+
+    @staticmethod
+    def digest(key: str) -> int:
+        # The builtin hash() is salted per interpreter, so use a stable hash
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        # The lowest bit is always set so an empty slot (0) never matches
+        return int.from_bytes(digest, "little") | 1
+
+    def update(self, key: str, function) -> tuple:
+        """Atomically replace the values for a key, return (values, status)
+
+        function <callable>: Called with the current (a, b) values, or None
+            when the key is not stored, and returns the new (a, b) values.
+
+        The status is "found" when the key was stored, "new" when an empty
+        slot was used or "evicted" when another key was replaced.
+        """
+        digest = self.digest(key)
+        bucket = (digest >> 1) % self.buckets
+        with self.locks[bucket % len(self.locks)]:
+            # Prefer the slot holding the key, then an empty slot, then the
+            # slot with the smallest second value
+            victim, victim_digest, victim_last, values = None, 0, None, None
+            for slot in range(bucket * self.ways, (bucket + 1) * self.ways):
+                slot_digest, a, b = self.SLOT.unpack_from(
+                    self.memory, slot * self.SLOT.size
+                )
+                if slot_digest == digest:
+                    victim, victim_digest, values = slot, slot_digest, (a, b)
+                    break
+                if victim is not None and victim_digest == 0:
+                    continue
+                if slot_digest == 0 or victim is None or b < victim_last:
+                    victim, victim_digest, victim_last = slot, slot_digest, b
+            status = "found" if values is not None else "new"
+            if values is None and victim_digest:
+                status = "evicted"
+            values = function(values)
+            self.SLOT.pack_into(self.memory, victim * self.SLOT.size, digest, *values)
+        return values, status
+
+    def get(self, key: str):
+        """Return the (a, b) values for a key or None when not stored"""
+        digest = self.digest(key)
+        bucket = (digest >> 1) % self.buckets
+        with self.locks[bucket % len(self.locks)]:
+            for slot in range(bucket * self.ways, (bucket + 1) * self.ways):
+                slot_digest, a, b = self.SLOT.unpack_from(
+                    self.memory, slot * self.SLOT.size
+                )
+                if slot_digest == digest:
+                    return a, b
+        return None
+
+
+class SharedRecord:
+    """A fixed record of float values in memory shared by forked workers
+
+    The record is read and replaced as a whole under one lock, so a reader
+    never sees a partly written record and nothing is ever evicted.
+
+    fields <int>: Number of values in the record.
+    """
+
+    def __init__(self, fields: int):
+        self.struct = struct.Struct(f"{fields}d")
+        self.memory = mmap.mmap(-1, self.struct.size)
+        self.lock = multiprocessing.Lock()
+
+    def read(self) -> tuple:
+        with self.lock:
+            return self.struct.unpack_from(self.memory, 0)
+
+    def update(self, function) -> tuple:
+        """Atomically replace the values, return the new values
+
+        function <callable>: Called with the current values and returns the
+            new values.
+        """
+        with self.lock:
+            values = function(self.struct.unpack_from(self.memory, 0))
+            self.struct.pack_into(self.memory, 0, *values)
+        return values
+
+
+class SharedState:
+    """Keyed values and named counters shared by forked worker processes
+
+    Create this before forking, see main.
+
+    slots <int>: Number of keyed value slots. (Default = 262144)
+
+    counter_slots <int>: Number of named counter slots. (Default = 1024)
+    """
+
+    def __init__(self, slots: int = 262144, counter_slots: int = 1024):
+        self.values = SharedSlots(slots)
+        self.counters = SharedSlots(counter_slots)
+        # Runtime settings are kept apart from the evicted keyed values
+        self.runtime = SharedRecord(RuntimeControl.RECORD_FIELDS)
+
+    def update(self, key: str, function) -> tuple:
+        """Atomically replace the values for a key, see SharedSlots.update"""
+        values, status = self.values.update(key, function)
+        if status != "found":
+            self.add(f"shared_state.{status}")
+        return values
+
+    def add(self, name: str, delta: float = 1) -> float:
+        """Add to a named counter, return the new total"""
+        return self.counters.update(
+            name, lambda values: ((values or (0, 0))[0] + delta, time.monotonic())
+        )[0][0]
+
+    def counter(self, name: str) -> float:
+        values = self.counters.get(name)
+        return int(values[0]) if values else 0
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.values.slots,
+            "keys_added": self.counter("shared_state.new"),
+            "evicted": self.counter("shared_state.evicted"),
+            "requests": self.counter("requests"),
+        }
+
+
+def parse_rate_limit(rate_limit: str) -> tuple:
+    """Return the (rate, burst) of a <rate>[:<burst>] rate limit
+
+    Raise ValueError unless both are positive numbers.
+    """
+    rate, _, burst = str(rate_limit).partition(":")
+    rate = float(rate)
+    burst = float(burst or max(rate, 1))
+    if not (0 < rate < math.inf and 0 < burst < math.inf):
+        raise ValueError(f"Rate limit must be positive: {rate_limit!r}")
+    return rate, burst
+
+
+class RateLimiter:
+    """Token bucket rate limits kept in a bounded LRU of keys
+
+    Buckets are refilled lazily when a key is checked, so an idle key costs
+    nothing until it is evicted as the least recently used.
+
+    max_keys <int>: Maximum number of keys tracked. (Default = 100000)
+
+    shared_state <SharedState>: Keep the buckets and counters in memory shared
+        with other worker processes instead. (Default = None)
+    """
+
+    def __init__(self, max_keys: int = 100000, shared_state: SharedState | None = None):
+        self.max_keys = max_keys
+        self.shared_state = shared_state
+        # Keys mapped to (tokens, last checked) pairs in LRU order
+        self.buckets = collections.OrderedDict()
+        self.counters = {"allowed": 0, "limited": 0, "evicted": 0}
+
+    def count(self, counter: str):
+        if self.shared_state is not None:
+            self.shared_state.add(f"rate_limit.{counter}")
+        else:
+            self.counters[counter] += 1
+
+    def check(self, key: str, rate: float, burst: float) -> tuple:
+        """Take a token for a key, return (allowed, remaining, reset seconds)
+
+        rate <float>: Tokens added per second.
+
+        burst <float>: Maximum tokens held by a bucket.
+        """
+        now = time.monotonic()
+        allowed = False
+
+        def take_token(values):
+            nonlocal allowed
+            tokens, last = values or (burst, now)
+            tokens = min(burst, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            return (tokens - 1 if allowed else tokens), now
+
+        if self.shared_state is not None:
+            tokens, _ = self.shared_state.update(f"rate_limit|{key}", take_token)
+        else:
+            tokens, _ = self.buckets[key] = take_token(self.buckets.pop(key, None))
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+                self.count("evicted")
+        self.count("allowed" if allowed else "limited")
+        return allowed, tokens, (burst - tokens) / rate if rate else 0
+
+    def stats(self) -> dict:
+        if self.shared_state is not None:
+            return {
+                "shared": True,
+                "totals": {
+                    counter: self.shared_state.counter(f"rate_limit.{counter}")
+                    for counter in self.counters
+                },
+            }
+        return {
+            "keys": len(self.buckets),
+            "max_keys": self.max_keys,
+            "totals": dict(self.counters),
+        }
+
+
+class ScenarioState:
+    """Request counters per scenario key which expire when idle
+
+    Keys are kept in least recently used order, so expired keys are always
+    at the front and are removed in O(1) as other keys are used.
+
+    ttl <float>: Seconds a key is kept after it was last used. (Default = 300)
+
+    max_keys <int>: Maximum number of keys tracked. (Default = 100000)
+
+    shared_state <SharedState>: Keep the counts in memory shared with other
+        worker processes instead, expired keys are reset when next used.
+        (Default = None)
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300,
+        max_keys: int = 100000,
+        shared_state: SharedState | None = None,
+    ):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.shared_state = shared_state
+        # Keys mapped to (count, last used) pairs in LRU order
+        self.counts = collections.OrderedDict()
+        self.counters = {"expired": 0, "evicted": 0}
+
+    def increment(self, key: str) -> int:
+        """Count a request for a key, return the count including it"""
+        now = time.monotonic()
+
+        def count_request(values):
+            count, last = values or (0, now)
+            if now - last > self.ttl:
+                count = 0
+            return count + 1, now
+
+        if self.shared_state is not None:
+            return int(self.shared_state.update(f"scenario|{key}", count_request)[0])
+
+        # Remove expired keys from the front
+        while self.counts:
+            oldest = next(iter(self.counts))
+            if now - self.counts[oldest][1] <= self.ttl:
+                break
+            del self.counts[oldest]
+            self.counters["expired"] += 1
+        count, _ = self.counts[key] = count_request(self.counts.pop(key, None))
+        if len(self.counts) > self.max_keys:
+            self.counts.popitem(last=False)
+            self.counters["evicted"] += 1
+        return count
+
+    def stats(self) -> dict:
+        if self.shared_state is not None:
+            return {"shared": True, "ttl": self.ttl}
+        return {
+            "keys": len(self.counts),
+            "max_keys": self.max_keys,
+            "ttl": self.ttl,
+            "totals": dict(self.counters),
+        }
+
+
+class OutageWindow:
+    """A one-shot or periodic window of time when conditions apply
+
+    Times are seconds since the schedule started.
+
+    name <str>: Name reported in the `X-Outage-Window' response header.
+
+    set <str>: Conditions using the `?set' syntax, e.g. "status:503".
+
+    refuse <bool>: Refuse new connections during the window.
+
+    start <float>, end <float>: One-shot window boundaries, a window without
+        an `end' lasts forever.
+
+    every <float>, duration <float>, offset <float>: Periodic window which
+        lasts `duration' seconds every `every' seconds, from `offset'.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        set: str = "",
+        refuse: bool = False,
+        start: float = 0,
+        end: float | None = None,
+        every: float | None = None,
+        duration: float = 0,
+        offset: float = 0,
+    ):
+        self.name = name
+        self.conditions = [c for c in set.split(",") if c]
+        self.refuse = refuse
+        self.start = start
+        self.end = end
+        self.every = every
+        self.duration = duration
+        self.offset = offset
+
+    def state(self, elapsed: float) -> tuple:
+        """Return (active, seconds elapsed at the next change) for a time"""
+        if self.every:
+            if elapsed < self.offset:
+                return False, self.offset
+            position = (elapsed - self.offset) % self.every
+            cycle_start = elapsed - position
+            if position < self.duration:
+                return True, cycle_start + self.duration
+            return False, cycle_start + self.every
+        if elapsed < self.start:
+            return False, self.start
+        if self.end is None:
+            return True, math.inf
+        if elapsed < self.end:
+            return True, self.end
+        return False, math.inf
+
+
+class OutageSchedule:
+    """Apply outage windows on a schedule
+
+    The windows active and the time of the next change are precomputed, so
+    checking the schedule for a request is a single timestamp comparison.
+
+    windows <list>: OutageWindow instances.
+    """
+
+    def __init__(self, windows: list | None = None):
+        self.windows = windows or []
+        self.started = time.monotonic()
+        self.next_change = self.started
+        self.active = ()
+        self.conditions = []
+        self.header = None
+        self.refuse = False
+
+    @classmethod
+    def from_file(cls, path: str):
+        """Load a JSON list of OutageWindow keyword arguments"""
+        windows = json.loads(Path(path).read_text())
+        return cls([OutageWindow(**window) for window in windows])
+
+    def check(self, now: float | None = None):
+        """Return this schedule after updating it for the time when needed"""
+        now = time.monotonic() if now is None else now
+        if now >= self.next_change:
+            self.recompute(now)
+        return self
+
+    def recompute(self, now: float):
+        elapsed = now - self.started
+        active = []
+        next_change = math.inf
+        for window in self.windows:
+            window_active, window_change = window.state(elapsed)
+            if window_active:
+                active.append(window)
+            next_change = min(next_change, window_change)
+        self.next_change = self.started + next_change
+        self.active = tuple(active)
+        self.conditions = [c for window in active for c in window.conditions]
+        self.header = ", ".join(window.name for window in active) or None
+        self.refuse = any(window.refuse for window in active)
+        logging.info(f"Outage windows active: {self.header or 'none'}")
+
+    def stats(self) -> dict:
+        self.check()
+        return {
+            "windows": len(self.windows),
+            "active": [window.name for window in self.active],
+            "next_change_seconds": (
+                None
+                if self.next_change == math.inf
+                else round(self.next_change - time.monotonic(), 3)
+            ),
+        }
+
+
+class RuntimeSettings:
+    """An immutable snapshot of the default behavior changed at runtime
+
+    A field set to None leaves the default behavior unchanged.
+
+    delay <float>: Default `?delay' for requests.
+
+    status <int>: Default `?status' for requests.
+
+    error_rate <float>: Fraction of requests answered with `error_status'.
+
+    error_status <int>: Status code used for `error_rate'. (Default = 500)
+
+    max_content_length <int>: Maximum `?content' length.
+    """
+
+    FIELDS = ("delay", "status", "error_rate", "error_status", "max_content_length")
+
+    __slots__ = FIELDS
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            object.__setattr__(self, field, values.get(field))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("RuntimeSettings is immutable, use replace")
+
+    def replace(self, **changes):
+        """Return a new snapshot with some fields changed
+
+        Raise ValueError for an unknown field or a value of the wrong type or
+        out of range.
+        """
+        unknown = set(changes) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown runtime settings: {sorted(unknown)!r}")
+        for field, value in changes.items():
+            self.validate(field, value)
+        return RuntimeSettings(**{**self.as_dict(), **changes})
+
+    @staticmethod
+    def validate(field: str, value):
+        """Raise ValueError when a value is not valid for a field"""
+        if value is None:
+            return
+        integer = field in ["status", "error_status", "max_content_length"]
+        if isinstance(value, bool) or not isinstance(
+            value, int if integer else (int, float)
+        ):
+            kind = "an integer" if integer else "a number"
+            raise ValueError(f"Runtime setting {field!r} must be {kind}: {value!r}")
+        if field in ["status", "error_status"]:
+            valid = 100 <= value <= 599
+        elif field == "error_rate":
+            valid = 0 <= value <= 1
+        else:
+            valid = 0 <= value < math.inf
+        if not valid:
+            raise ValueError(f"Runtime setting {field!r} is out of range: {value!r}")
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class RuntimeControl:
+    """Hold the current RuntimeSettings snapshot and swap it atomically
+
+    Runtime changes are applied on top of the configured `base' defaults.
+    Requests keep the snapshot they started with, so a change only applies
+    to requests started after it.
+
+    shared_state <SharedState>: Share changes with other worker processes.
+        (Default = None)
+    """
+
+    # A generation followed by the value and whether it is set of each field
+    RECORD_FIELDS = 1 + 2 * len(RuntimeSettings.FIELDS)
+
+    def __init__(self, shared_state: SharedState | None = None):
+        self.shared_state = shared_state
+        self.base = RuntimeSettings()
+        self.changes = RuntimeSettings()
+        self.current = RuntimeSettings()
+        self.generation = 0
+
+    def merge(self):
+        self.current = self.base.replace(
+            **{k: v for k, v in self.changes.as_dict().items() if v is not None}
+        )
+
+    @staticmethod
+    def decode(record: tuple) -> RuntimeSettings:
+        """Return the runtime changes held in a shared record"""
+        values = {}
+        for index, field in enumerate(RuntimeSettings.FIELDS):
+            value, is_set = record[1 + 2 * index : 3 + 2 * index]
+            if is_set:
+                values[field] = int(value) if value.is_integer() else value
+        return RuntimeSettings(**values)
+
+    @staticmethod
+    def encode(generation: float, changes: RuntimeSettings) -> tuple:
+        """Return a shared record holding the runtime changes"""
+        record = [generation]
+        for value in changes.as_dict().values():
+            record.extend([value or 0, value is not None])
+        return tuple(record)
+
+    def snapshot(self) -> RuntimeSettings:
+        """Return the current snapshot, including changes from other workers"""
+        if self.shared_state is not None:
+            record = self.shared_state.runtime.read()
+            if record[0] != self.generation:
+                self.changes = self.decode(record)
+                self.generation = record[0]
+                self.merge()
+        return self.current
+
+    def set_base(self, base: RuntimeSettings):
+        """Swap in new configured defaults"""
+        self.base = base
+        self.merge()
+
+    def update(self, **changes) -> RuntimeSettings:
+        """Swap in a new snapshot with some fields changed"""
+        if self.shared_state is not None:
+            # Apply the changes to the latest shared record in one step
+            runtime_changes = []
+
+            def apply(record):
+                runtime_changes.append(self.decode(record).replace(**changes))
+                return self.encode(record[0] + 1, runtime_changes[0])
+
+            self.generation = self.shared_state.runtime.update(apply)[0]
+            self.changes = runtime_changes[0]
+        else:
+            self.changes = self.changes.replace(**changes)
+        self.merge()
+        return self.current
+
+    def reset(self) -> RuntimeSettings:
+        return self.update(**{field: None for field in RuntimeSettings.FIELDS})
+
+    def stats(self) -> dict:
+        return self.snapshot().as_dict()
+
+
+class ConfigSnapshot:
+    """An immutable configuration compiled from a JSON config file
+
+    {
+      "defaults": {<RuntimeSettings fields>},
+      "limits": {"max_inflight": <int>, "max_inflight_bytes": <int>,
+                 "max_queue": <int>, "queue_timeout": <float>,
+                 "rate_limit": "<rate>[:<burst>]", "rate_limit_key": <str>},
+      "rules": [{"name": <str>, "host": <str>, "method": <str|list>,
+                 "path": <prefix>, "path_regex": <regex>,
+                 "set": "<condition:value>[,<condition:value>]"}],
+      "schedule": [{<OutageWindow arguments>}],
+      "worker_pools": ["workers:<int>,service:<distribution>[,...]"]
+    }
+
+    text <str>: JSON configuration, an empty string is an empty config.
+
+    source <str>: Where the configuration was read from.
+    """
+
+    LIMITS = (
+        "max_inflight",
+        "max_inflight_bytes",
+        "max_queue",
+        "queue_timeout",
+        "rate_limit",
+        "rate_limit_key",
+    )
+
+    __slots__ = (
+        "source",
+        "loaded",
+        "defaults",
+        "limits",
+        "rules",
+        "schedule",
+        "schedule_spec",
+        "capacity_model",
+        "worker_pools_spec",
+    )
+
+    def __init__(self, text: str = "", source: str | None = None):
+        config = json.loads(text) if text.strip() else {}
+        if not isinstance(config, dict):
+            raise ValueError("The config must be a JSON object")
+        unknown = set(config) - {
+            "defaults",
+            "limits",
+            "rules",
+            "schedule",
+            "worker_pools",
+        }
+        if unknown:
+            raise ValueError(f"Unknown config sections: {sorted(unknown)!r}")
+        limits = config.get("limits", {})
+        if set(limits) - set(self.LIMITS):
+            raise ValueError(
+                f"Unknown limits: {sorted(set(limits) - set(self.LIMITS))!r}"
+            )
+        if limits.get("rate_limit"):
+            parse_rate_limit(limits["rate_limit"])
+
+        values = {
+            "source": source,
+            "loaded": datetime.datetime.now(datetime.timezone.utc),
+            "defaults": RuntimeSettings().replace(**config.get("defaults", {})),
+            "limits": types.MappingProxyType(dict(limits)),
+            "rules": tuple(
+                ConfigRule(index, **rule)
+                for index, rule in enumerate(config.get("rules", []))
+            ),
+            "schedule": (
+                OutageSchedule(
+                    [OutageWindow(**window) for window in config["schedule"]]
+                )
+                if "schedule" in config
+                else None
+            ),
+            "schedule_spec": config.get("schedule"),
+            "capacity_model": (
+                CapacityModel(config["worker_pools"])
+                if "worker_pools" in config
+                else None
+            ),
+            "worker_pools_spec": config.get("worker_pools"),
+        }
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ConfigSnapshot is immutable")
+
+
+class ConfigRule:
+    """A precompiled config rule setting conditions for matching requests
+
+    All of the `host', `method', `path' prefix and `path_regex' given must
+    match the request.
+    """
+
+    __slots__ = ("name", "host", "methods", "path", "path_regex", "conditions")
+
+    def __init__(
+        self,
+        index: int,
+        name: str | None = None,
+        host: str | None = None,
+        method=None,
+        path: str | None = None,
+        path_regex: str | None = None,
+        set: str = "",
+    ):
+        self.name = name or f"rule-{index}"
+        for field, value in [("host", host), ("path", path), ("set", set)]:
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"Config rule {self.name!r} {field} must be a string")
+        self.host = host.lower() if host else None
+        if isinstance(method, str):
+            method = [method]
+        if method is not None and not (
+            isinstance(method, list) and all(isinstance(m, str) for m in method)
+        ):
+            raise ValueError(
+                f"Config rule {self.name!r} method must be a string or a list"
+            )
+        self.methods = frozenset(m.upper() for m in method) if method else None
+        self.path = path
+        try:
+            self.path_regex = re.compile(path_regex) if path_regex else None
+        except (re.error, TypeError) as err:
+            raise ValueError(f"Config rule {self.name!r} path_regex: {err}")
+        self.conditions = [c for c in (set or "").split(",") if c]
+
+    def matches(self, request) -> bool:
+        if self.path is not None and not request.path.startswith(self.path):
+            return False
+        if self.methods is not None and request.method not in self.methods:
+            return False
+        if self.host is not None and (
+            str(request.headers.get("host")).lower() != self.host
+        ):
+            return False
+        if self.path_regex is not None and not self.path_regex.search(request.path):
+            return False
+        return True
+
+
+class ConfigStore:
+    """Hold the current ConfigSnapshot and reload it when the file changes
+
+    The file is checked and read in a thread and compiled into a fresh
+    snapshot before it is swapped in, so requests never wait on a reload and
+    requests in-flight finish with the snapshot they started with.
+
+    path <str>: JSON config file. (Default = None, an empty config)
+
+    interval <float>: Seconds between checks for changes. (Default = 1)
+    """
+
+    # Errors reading or compiling a config file
+    ERRORS = (OSError, ValueError, TypeError, AttributeError, re.error)
+
+    def __init__(self, path: str | None = None, interval: float = 1):
+        self.path = path
+        self.interval = interval
+        self.current = ConfigSnapshot()
+        self.signature = None
+        self.generation = 0
+        self.counters = {"reloads": 0, "errors": 0}
+        self.last_error = None
+        self.periodic_callback = None
+
+    def file_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def read(self) -> tuple:
+        """Return the file signature and a compiled snapshot"""
+        signature = self.file_signature()
+        return signature, ConfigSnapshot(Path(self.path).read_text(), self.path)
+
+    def load(self) -> ConfigSnapshot:
+        """Load the config file now, raise any error"""
+        self.signature, snapshot = self.read()
+        return snapshot
+
+    async def poll(self, application):
+        """Reload the config in the background when the file has changed"""
+        loop = asyncio.get_running_loop()
+        try:
+            signature = await loop.run_in_executor(None, self.file_signature)
+            if signature == self.signature:
+                return
+            signature, snapshot = await loop.run_in_executor(None, self.read)
+        except self.ERRORS as err:
+            self.record_error(err)
+            return
+        self.signature = signature
+        application.apply_config(snapshot)
+
+    def record_error(self, err: Exception):
+        """Count a failed reload, the current config is kept"""
+        self.counters["errors"] += 1
+        self.last_error = f"{type(err).__name__}: {err}"
+        logging.error(f"Config reload failed, keeping the current config; {err}")
+
+    def start(self, application):
+        """Check the config file for changes periodically"""
+        if self.path is None:
+            return
+        # https://www.tornadoweb.org/en/stable/ioloop.html#tornado.ioloop.PeriodicCallback
+        self.periodic_callback = tornado.ioloop.PeriodicCallback(
+            lambda: self.poll(application), self.interval * 1000
+        )
+        self.periodic_callback.start()
+
+    def stats(self) -> dict:
+        return {
+            "source": self.current.source,
+            "loaded": self.current.loaded,
+            "generation": self.generation,
+            "rules": len(self.current.rules),
+            "totals": dict(self.counters),
+            "last_error": self.last_error,
+        }
+
+
+class AdminAuthHandler(tornado.web.RequestHandler):
+    """Base handler for the admin endpoints
+
+    Requests must include `Authorization: Bearer <admin token>'. The handler
+    responds 404 when no admin token is configured.
+    """
+
+    def initialize(self, **kwargs):
+        self.set_header("Cache-Control", "private, no-store")
+        self.set_header("Server", self.settings.get("name"))
+
+    def prepare(self):
+        admin_token = self.settings.get("admin_token")
+        if not admin_token:
+            raise tornado.web.HTTPError(404)
+        authorization = self.request.headers.get("Authorization", "")
+        if not hmac.compare_digest(
+            authorization.encode("utf-8"), f"Bearer {admin_token}".encode("utf-8")
+        ):
+            self.set_status(401)
+            self.set_header("WWW-Authenticate", "Bearer")
+            self.finish()
+
+
+class AdminHandler(AdminAuthHandler):
+    """Change the default behavior at runtime"""
+
+    def respond(self, runtime_settings: RuntimeSettings, **kwargs):
+        self.set_header("Content-Type", "text/json")
+        self.write(
+            json.dumps(
+                {"runtime": runtime_settings.as_dict(), **kwargs},
+                indent=4,
+                separators=(",", ": "),
+                sort_keys=True,
+                cls=JSONEncoderPlus,
+            )
+            + "\n"
+        )
+
+    def get(self, **kwargs):
+        self.respond(self.settings.get("runtime_control").snapshot())
+
+    def post(self, **kwargs):
+        """Change runtime settings with a JSON object, null clears a field
+
+        {"delay": 2, "error_rate": 0.1, "reload": true}
+        """
+        name = "AdminHandler.post"
+        try:
+            changes = json.loads(self.request.body or b"{}")
+            if not isinstance(changes, dict):
+                raise ValueError("Runtime settings must be a JSON object")
+            reload = changes.pop("reload", False)
+            runtime_settings = self.settings.get("runtime_control").update(**changes)
+        except (TypeError, ValueError) as err:
+            raise tornado.web.HTTPError(400, str(err))
+        logging.info(f"{name} - runtime settings: {runtime_settings.as_dict()!r}")
+
+        reloaded = []
+        if reload:
+            try:
+                reloaded = self.application.reload()
+            except ValueError as err:
+                raise tornado.web.HTTPError(400, str(err))
+        self.respond(runtime_settings, reloaded=reloaded)
+
+    def delete(self, **kwargs):
+        self.respond(self.settings.get("runtime_control").reset())
+
+
+class Profiler:
+    """Profile the running process for a bounded time, one profile at a time
+
+    Modes:
+      cprofile  every function call on the IOLoop thread with cProfile
+      sample    the stacks of the IOLoop thread, or all threads, read with
+                sys._current_frames from a background thread
+
+    enabled <bool>: Allow profiles to run. (Default = False)
+
+    max_seconds <float>: Maximum duration of a profile. (Default = 30)
+    """
+
+    MODES = ("cprofile", "sample")
+
+    def __init__(self, enabled: bool = False, max_seconds: float = 30):
+        self.enabled = enabled
+        self.max_seconds = max_seconds
+        self.running = None
+        self.counters = {"profiles": 0, "rejected": 0}
+
+    async def profile(
+        self,
+        mode: str = "sample",
+        seconds: float = 5,
+        interval: float = 0.005,
+        threads: str = "loop",
+        limit: int = 30,
+    ) -> dict:
+        """Run a profile and return the hot functions
+
+        Raises RuntimeError when profiling is disabled or already running and
+        ValueError for invalid arguments.
+        """
+        if not self.enabled:
+            raise RuntimeError("profiling is disabled")
+        if self.running is not None:
+            self.counters["rejected"] += 1
+            raise RuntimeError(f"a {self.running} profile is already running")
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {self.MODES!r}")
+        if threads not in ["loop", "all"]:
+            raise ValueError("threads must be `loop' or `all'")
+        seconds = min(max(float(seconds), 0.01), self.max_seconds)
+        interval = max(float(interval), 0.001)
+        limit = min(max(int(limit), 1), 200)
+
+        self.running = mode
+        self.counters["profiles"] += 1
+        logging.warning(f"Running a {seconds}s {mode} profile")
+        try:
+            if mode == "cprofile":
+                result = await self.run_cprofile(seconds, limit)
+            else:
+                loop_thread_id = threading.get_ident() if threads == "loop" else None
+                result = await asyncio.get_running_loop().run_in_executor(
+                    None, self.run_sample, seconds, interval, loop_thread_id, limit
+                )
+        finally:
+            self.running = None
+        return {"mode": mode, "seconds": seconds, **result}
+
+    @staticmethod
+    async def run_cprofile(seconds: float, limit: int) -> dict:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as err:
+            # Another profiler, such as a debugger or coverage, is active
+            raise RuntimeError(str(err))
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+
+        stats = pstats.Stats(profile).stats
+        functions = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)
+        return {
+            "calls": sum(values[1] for values in stats.values()),
+            "functions": [
+                {
+                    "function": pstats.func_std_string(function),
+                    "calls": calls,
+                    "self": round(tottime, 6),
+                    "total": round(cumtime, 6),
+                }
+                for function, (_, calls, tottime, cumtime, _) in functions[:limit]
+            ],
+        }
+
+    @staticmethod
+    def run_sample(seconds: float, interval: float, thread_id: int, limit: int) -> dict:
+        """Sample thread stacks every `interval' seconds, `thread_id' None
+        samples all threads other than this one"""
+        own_thread_id = threading.get_ident()
+        self_counts = collections.Counter()
+        total_counts = collections.Counter()
+        stacks = collections.Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own_thread_id or (thread_id and ident != thread_id):
+                    continue
+                samples += 1
+                names = []
+                seen = set()
+                while frame is not None:
+                    code = frame.f_code
+                    function = (
+                        f"{code.co_filename}:{code.co_firstlineno}({code.co_qualname})"
+                    )
+                    if not names:
+                        self_counts[function] += 1
+                    if function not in seen:
+                        seen.add(function)
+                        total_counts[function] += 1
+                    names.append(code.co_qualname)
+                    frame = frame.f_back
+                stacks[";".join(reversed(names))] += 1
+            time.sleep(interval)
+
+        return {
+            "interval": interval,
+            "samples": samples,
+            "functions": [
+                {
+                    "function": function,
+                    "self": count,
+                    "total": total_counts[function],
+                    "self_percent": round(100 * count / samples, 2),
+                    "total_percent": round(100 * total_counts[function] / samples, 2),
+                }
+                for function, count in self_counts.most_common(limit)
+            ],
+            # Collapsed stacks, root first, as used to draw flame graphs
+            "stacks": [
+                {"stack": stack, "count": count}
+                for stack, count in stacks.most_common(limit)
+            ],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "totals": dict(self.counters),
+        }
+
+
+class ProfileHandler(AdminAuthHandler):
+    """Profile the running process and return the hot functions
+
+    The handler responds 404 unless profiling is enabled.
+    """
+
+    async def get(self, **kwargs):
+        name = "ProfileHandler.get"
+        profiler = self.settings.get("profiler")
+        if profiler is None or not profiler.enabled:
+            raise tornado.web.HTTPError(404)
+
+        options = {}
+        for key in ["mode", "seconds", "interval", "threads", "limit"]:
+            value = self.get_argument(key, None)
+            if value is not None:
+                options[key] = value
+        logging.debug(f"{name} - options: {options!r}")
+        try:
+            result = await profiler.profile(**options)
+        except ValueError as err:
+            raise tornado.web.HTTPError(400, str(err))
+        except RuntimeError as err:
+            raise tornado.web.HTTPError(409, str(err))
+
+        self.set_header("Content-Type", "text/json")
+        self.write(
+            json.dumps(result, indent=4, separators=(",", ": "), cls=JSONEncoderPlus)
+            + "\n"
+        )
+
+
+class MemoryMonitor:
+    """Account for the process memory and trace allocations on demand
+
+    The resident set size is always reported. While allocations are traced
+    with tracemalloc, which slows the server, a sampled request records the
+    peak traced memory above the traced memory when it started and snapshots
+    group the traced memory by the RepeaterHandler stage which allocated it.
+
+    sample_rate <float>: Fraction of requests sampled while tracing.
+        (Default = 0.01)
+
+    requests <int>: Number of sampled requests kept. (Default = 1000)
+    """
+
+    def __init__(self, sample_rate: float = 0.01, requests: int = 1000):
+        self.sample_rate = sample_rate
+        # Recent (path, peak bytes) of sampled requests
+        self.peaks = collections.deque(maxlen=requests)
+        # Only one request is sampled at a time, the peak is for the process
+        self.sampling = False
+        # Summary of the previous snapshot, by stage and by line
+        self.snapshot = None
+        self.ranges = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start_tracing(self, frames: int = 25, sample_rate: float | None = None):
+        """Trace allocations keeping `frames' frames of each traceback"""
+        if sample_rate is not None:
+            self.sample_rate = float(sample_rate)
+        if not self.tracing:
+            tracemalloc.start(int(frames))
+            logging.warning(f"Tracing memory allocations with {frames} frames")
+
+    def stop_tracing(self):
+        tracemalloc.stop()
+        self.snapshot = None
+        self.sampling = False
+
+    def request_started(self):
+        """Return the traced memory when a request is sampled, or None"""
+        # NOTE: random.random is not used in any security context here
+        if self.sampling or random.random() >= self.sample_rate:  # nosec B311
+            return None
+        self.sampling = True
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def request_finished(self, traced: int, path: str):
+        if self.tracing:
+            self.peaks.append((path, tracemalloc.get_traced_memory()[1] - traced))
+        self.sampling = False
+
+    def stage_ranges(self) -> list:
+        """Return the (first line, last line, name) of RepeaterHandler methods"""
+        if self.ranges is None:
+            self.ranges = []
+            for function in vars(RepeaterHandler).values():
+                code = getattr(function, "__code__", None)
+                if code is None:
+                    continue
+                lines = [line for _, _, line in code.co_lines() if line]
+                self.ranges.append((code.co_firstlineno, max(lines), code.co_qualname))
+        return self.ranges
+
+    def stage(self, traceback) -> str:
+        """Return the innermost RepeaterHandler method in a traceback"""
+        for frame in reversed(traceback):
+            if frame.filename == __file__:
+                for first, last, name in self.stage_ranges():
+                    if first <= frame.lineno <= last:
+                        return name
+        return "other"
+
+    async def take_snapshot(self, limit: int = 10) -> dict:
+        """Snapshot the traced memory, compared with the previous snapshot
+
+        The snapshot is grouped in a thread as this takes time with many
+        traced allocations.
+        """
+        snapshot = tracemalloc.take_snapshot()
+        summary = await asyncio.get_running_loop().run_in_executor(
+            None, self.summarize, snapshot
+        )
+        stages, lines = summary
+
+        result = {
+            "traced": tracemalloc.get_traced_memory()[0],
+            "stages": stages,
+            "top": [
+                {"line": line, "size": size}
+                for line, size in sorted(lines.items(), key=lambda item: -item[1])[
+                    :limit
+                ]
+            ],
+        }
+        if self.snapshot is not None:
+            previous_stages, previous_lines = self.snapshot
+            result["diff"] = {
+                "stages": {
+                    stage: stages.get(stage, {}).get("size", 0)
+                    - previous_stages.get(stage, {}).get("size", 0)
+                    for stage in set(stages) | set(previous_stages)
+                },
+                "top": [
+                    {"line": line, "size_diff": size_diff}
+                    for line, size_diff in sorted(
+                        (
+                            (line, lines.get(line, 0) - previous_lines.get(line, 0))
+                            for line in set(lines) | set(previous_lines)
+                        ),
+                        key=lambda item: -abs(item[1]),
+                    )[:limit]
+                    if size_diff
+                ],
+            }
+        # Keep the summary, not the snapshot, for the next comparison
+        self.snapshot = summary
+        return result
+
+    def summarize(self, snapshot) -> tuple:
+        """Return the traced memory by stage and by the allocating line"""
+        stages = collections.defaultdict(lambda: {"size": 0, "count": 0})
+        lines = collections.Counter()
+        for statistic in snapshot.statistics("traceback"):
+            stage = stages[self.stage(statistic.traceback)]
+            stage["size"] += statistic.size
+            stage["count"] += statistic.count
+            frame = statistic.traceback[-1]
+            lines[f"{frame.filename}:{frame.lineno}"] += statistic.size
+        return dict(stages), dict(lines)
+
+    def stats(self) -> dict:
+        peaks = [peak for _, peak in self.peaks]
+        result = {
+            "rss": memory_rss(),
+            "tracing": self.tracing,
+            "sample_rate": self.sample_rate,
+            "requests": {"sampled": len(peaks), "peak": percentiles(peaks)},
+        }
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            result["traced"] = {"current": current, "peak": peak}
+            result["requests"]["largest"] = [
+                {"path": path, "peak": peak}
+                for path, peak in sorted(self.peaks, key=lambda item: -item[1])[:5]
+            ]
+        return result
+
+
+class MemoryHandler(AdminAuthHandler):
+    """Report memory use and control allocation tracing
+
+    GET reports the memory use, ?snapshot includes a tracemalloc snapshot
+    grouped by stage and compared with the previous snapshot. POST starts or
+    stops tracing with a JSON object.
+
+    {"trace": true, "frames": 25, "sample_rate": 0.1}
+    """
+
+    def respond(self, result: dict):
+        self.set_header("Content-Type", "text/json")
+        self.write(
+            json.dumps(
+                result,
+                indent=4,
+                separators=(",", ": "),
+                sort_keys=True,
+                cls=JSONEncoderPlus,
+            )
+            + "\n"
+        )
+
+    async def get(self, **kwargs):
+        memory_monitor = self.settings.get("memory_monitor")
+        result = memory_monitor.stats()
+        if self.get_argument("snapshot", None) is not None:
+            if not memory_monitor.tracing:
+                raise tornado.web.HTTPError(409, "memory allocations are not traced")
+            limit = self.get_argument("limit", "10")
+            if not limit.isdigit() or int(limit) < 1:
+                raise tornado.web.HTTPError(400, "limit must be a positive integer")
+            result["snapshot"] = await memory_monitor.take_snapshot(limit=int(limit))
+        self.respond(result)
+
+    def post(self, **kwargs):
+        name = "MemoryHandler.post"
+        memory_monitor = self.settings.get("memory_monitor")
+        try:
+            changes = json.loads(self.request.body or b"{}")
+            if not isinstance(changes, dict):
+                raise ValueError("Memory tracing changes must be a JSON object")
+            logging.info(f"{name} - changes: {changes!r}")
+            if changes.get("trace"):
+                memory_monitor.start_tracing(
+                    frames=changes.get("frames", 25),
+                    sample_rate=changes.get("sample_rate"),
+                )
+            elif "trace" in changes:
+                memory_monitor.stop_tracing()
+            elif "sample_rate" in changes:
+                memory_monitor.sample_rate = float(changes["sample_rate"])
+        except (TypeError, ValueError) as err:
+            raise tornado.web.HTTPError(400, str(err))
+        self.respond(memory_monitor.stats())
+
+
+class MockApplication(tornado.web.Application):
+    """Application which can reload its rule files at runtime"""
+
+    ADMISSION_LIMITS = (
+        "max_inflight",
+        "max_inflight_bytes",
+        "max_queue",
+        "queue_timeout",
+    )
+
+    # Settings from the command line options, restored when removed from the
+    # config file
+    config_baseline = None
+
+    def apply_config(self, snapshot: ConfigSnapshot):
+        """Swap in a compiled ConfigSnapshot
+
+        Limits and sections removed from the config return to the command
+        line options. The outage schedule and worker pools are only replaced
+        when their specification changed, so their state is kept otherwise.
+        """
+        config_store = self.settings["config_store"]
+        admission_control = self.settings["admission_control"]
+        if self.config_baseline is None:
+            self.config_baseline = {
+                **{
+                    limit: getattr(admission_control, limit)
+                    for limit in self.ADMISSION_LIMITS
+                },
+                "rate_limit": self.settings.get("rate_limit"),
+                "rate_limit_key": self.settings.get("rate_limit_key"),
+                "outage_schedule": self.settings.get("outage_schedule"),
+                "capacity_model": self.settings.get("capacity_model"),
+            }
+        baseline = self.config_baseline
+        previous = config_store.current
+        limits = snapshot.limits
+        for limit in self.ADMISSION_LIMITS:
+            setattr(admission_control, limit, limits.get(limit, baseline[limit]))
+        for limit in ["rate_limit", "rate_limit_key"]:
+            self.settings[limit] = limits.get(limit, baseline[limit])
+        if snapshot.schedule_spec != previous.schedule_spec:
+            self.settings["outage_schedule"] = (
+                snapshot.schedule
+                if snapshot.schedule is not None
+                else baseline["outage_schedule"]
+            )
+        if snapshot.worker_pools_spec != previous.worker_pools_spec:
+            self.settings["capacity_model"] = (
+                snapshot.capacity_model
+                if snapshot.capacity_model is not None
+                else baseline["capacity_model"]
+            )
+        self.settings["runtime_control"].set_base(snapshot.defaults)
+
+        config_store.current = snapshot
+        config_store.generation += 1
+        config_store.counters["reloads"] += 1
+        logging.info(f"Applied config {snapshot.source!r}")
+
+    def reload(self) -> list:
+        """Reload rule files from disk, return the names of those reloaded"""
+        reloaded = []
+        config_store = self.settings.get("config_store")
+        if config_store is not None and config_store.path:
+            try:
+                snapshot = config_store.load()
+            except ConfigStore.ERRORS as err:
+                config_store.record_error(err)
+                raise ValueError(f"Config reload failed: {err}")
+            self.apply_config(snapshot)
+            reloaded.append("config")
+        if self.settings.get("schedule"):
+            outage_schedule = OutageSchedule.from_file(self.settings.get("schedule"))
+            # A schedule in the config file is used ahead of the --schedule file
+            if self.config_baseline is not None:
+                self.config_baseline["outage_schedule"] = outage_schedule
+            if config_store is None or config_store.current.schedule is None:
+                self.settings["outage_schedule"] = outage_schedule
+            reloaded.append("schedule")
+        logging.info(f"Reloaded: {reloaded!r}")
+        return reloaded
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    """Report liveness at /_/live and readiness at /_/ready as JSON
+
+    Liveness only requires the IOLoop to respond. Readiness responds 503
+    while draining or when a HealthCheck load threshold is crossed, so a load
+    balancer moves traffic away before the tail latency grows.
+    """
+
+    def initialize(self, **kwargs):
+        self.set_header("Cache-Control", "private, no-store")
+        self.set_header("Server", self.settings.get("name"))
+        self.set_header("Content-Type", "text/json")
+
+    def get(self, probe):
+        body = {"pid": os.getpid()}
+        if probe == "ready":
+            values, reasons = self.settings["health_check"].check(
+                self.settings.get("drain_control"),
+                self.settings.get("loop_monitor"),
+            )
+            body.update(values)
+            body["ready"] = not reasons
+            if reasons:
+                self.set_status(503)
+                body["reasons"] = reasons
+        else:
+            body["live"] = True
+        self.write(json.dumps(body, sort_keys=True) + "\n")
+
+    def head(self, probe):
+        # Tornado does not send the body for HEAD requests
+        self.get(probe)
+
+
+class StatsHandler(tornado.web.RequestHandler):
+    """Report server statistics as JSON"""
+
+    # Sections of the stats and the settings reporting them
+    STATS_SECTIONS = [
+        ("admission", "admission_control"),
+        ("capacity", "capacity_model"),
+        ("catalog", "catalog"),
+        ("config", "config_store"),
+        ("connections", "connection_stats"),
+        ("drain", "drain_control"),
+        ("echo", "stream_echo"),
+        ("health", "health_check"),
+        ("loop", "loop_monitor"),
+        ("memory", "memory_monitor"),
+        ("objects", "object_store"),
+        ("profiler", "profiler"),
+        ("rate_limit", "rate_limiter"),
+        ("revalidation", "revalidation_stats"),
+        ("runtime", "runtime_control"),
+        ("scenarios", "scenario_state"),
+        ("schedule", "outage_schedule"),
+        ("shared_state", "shared_state"),
+        ("sink", "upload_sink"),
+    ]
+
+    def initialize(self, **kwargs):
+        self.set_header("Cache-Control", "private, no-store")
+        self.set_header("Server", self.settings.get("name"))
+
+    def get(self, **kwargs):
+        stats = {}
+        # Sections not kept in the shared state report this worker process only
+        per_worker = []
+        for key, setting in self.STATS_SECTIONS:
+            setting = self.settings.get(setting)
+            if setting is not None:
+                stats[key] = setting.stats()
+                if getattr(setting, "shared_state", None) is None:
+                    per_worker.append(key)
+        if "shared_state" in per_worker:
+            per_worker.remove("shared_state")
+        stats["pid"] = os.getpid()
+        stats["per_worker"] = per_worker
+        self.set_header("Content-Type", "text/json")
+        self.write(
+            json.dumps(
+                stats,
+                indent=4,
+                separators=(",", ": "),
+                sort_keys=True,
+                cls=JSONEncoderPlus,
+            )
+            + "\n"
+        )
+
+
+@tornado.web.stream_request_body
 class RepeaterHandler(tornado.web.RequestHandler):
-    """Repeat the HTTP request back to the requester"""
+    """Repeat the HTTP request back to the requester
+
+    Request bodies are streamed through `data_received' so large uploads are
+    measured without being held in memory.
+    """
 
     def initialize(self, **kwargs):
         logging.debug(f"RepeaterHandler.initialize - **kwargs: {kwargs!r}")
         self.set_header("Cache-Control", "private, no-store")
         self.set_header("Server", self.settings.get("name"))
+        # ConfigSnapshot used for this request
+        config_store = self.settings.get("config_store")
+        self.config = config_store.current if config_store else ConfigSnapshot()
+        # Request body bytes counted against the admission limits
+        self.admitted_size = None
+        # RequestBody measured as it is received, when a body is sent
+        self.request_body = None
+        # Discard the request body read at most `read_rate' bytes per second
+        self.sink = False
+        self.read_rate = None
+        # Stream the request body back as it is received, optionally gzipped
+        self.echo = False
+        self.echo_encoder = None
+        # Content of the conditions once evaluated for this request
+        self.condition_content = None
+        # GeneratedContent used as the response body, with ?content
+        self.generated_content = None
+        # Close the connection once the response is sent
+        self.close_connection = False
+        # Requests in-flight are counted until finished
+        self.drain_control = self.settings.get("drain_control")
+        self.drain_tracked = False
+        # Traced memory when this request started, when sampled
+        self.memory_traced = None
+        # Stage timings for the Server-Timing header, when enabled
+        self.timings = None
+        self.timing_mark = None
+        # RuntimeSettings snapshot used for this request
+        self.runtime_settings = RuntimeSettings()
+
+    async def prepare(self):
+        """Admit the request or shed it when over the admission limits"""
+        name = "RepeaterHandler.prepare"
+
+        # Track requests in-flight to drain them when the server is stopped
+        if self.drain_control is not None:
+            self.drain_control.request_started()
+            self.drain_tracked = True
+
+        # Sample the peak memory allocated while tracing allocations
+        memory_monitor = self.settings.get("memory_monitor")
+        if memory_monitor is not None and memory_monitor.tracing:
+            self.memory_traced = memory_monitor.request_started()
+
+        # Count requests across all worker processes
+        if self.settings.get("shared_state") is not None:
+            self.settings.get("shared_state").add("requests")
+
+        # Allow request bodies larger than the HTTPServer default
+        max_body_size = self.settings.get("max_body_size")
+        if max_body_size is not None:
+            self.request.connection.set_max_body_size(max_body_size)
+
+        # Discard the body of uploads to a sink, ?sink[&sink_hash][&sink_rate=]
+        upload_sink = self.settings.get("upload_sink")
+        if (
+            upload_sink is not None
+            and self.request.method in UploadSink.METHODS
+            and (
+                "sink" in self.request.arguments
+                or upload_sink.select(self.request.method, self.request.path)
+            )
+        ):
+            self.sink = True
+            self.request_body = RequestBody(
+                keep=0, hashed="sink_hash" in self.request.arguments
+            )
+            read_rate = self.get_query_argument("sink_rate", upload_sink.read_rate)
+            try:
+                self.read_rate = float(read_rate) if read_rate else None
+            except ValueError:
+                self.read_rate = math.nan
+            if self.read_rate is not None and not 0 < self.read_rate < math.inf:
+                raise tornado.web.HTTPError(
+                    400, "sink_rate must be a positive number of bytes per second"
+                )
+            logging.debug(f"{name} - sink read_rate: {self.read_rate!r}")
+
+        # Stream the body of uploads back as it is received, ?echo
+        stream_echo = self.settings.get("stream_echo")
+        if (
+            not self.sink
+            and stream_echo is not None
+            and self.request.method in StreamEcho.METHODS
+            and (
+                "echo" in self.request.arguments
+                or stream_echo.select(self.request.method, self.request.path)
+            )
+        ):
+            self.echo = True
+            self.request_body = RequestBody(keep=0, hashed=False)
+            self.set_header(
+                "Content-Type",
+                self.request.headers.get("Content-Type", "application/octet-stream"),
+            )
+            accept_encoding = self.get_query_argument(
+                "encoding", self.request.headers.get("Accept-Encoding", "")
+            )
+            for encoding in [v.strip() for v in accept_encoding.split(",")]:
+                if encoding.startswith("gzip") and not encoding.endswith(";q=0"):
+                    # wbits=31 writes the gzip header and trailer
+                    self.echo_encoder = zlib.compressobj(wbits=31)
+                    self.set_header("Content-Encoding", "gzip")
+                    self.set_header("Vary", "Accept-Encoding")
+                    break
+            logging.debug(f"{name} - echo encoder: {self.echo_encoder!r}")
+
+        # Answer a client waiting for a `100 Continue' before sending the body
+        if "Expect" in self.request.headers and await self.expect_continue():
+            return
+
+        admission_control = self.settings.get("admission_control")
+        if admission_control is None:
+            return
+
+        # The request body has not been received yet, use the declared length
+        # Bodies discarded by a sink are never held, see data_received for
+        # bodies without a declared length
+        try:
+            size = int(self.request.headers.get("Content-Length") or 0)
+        except ValueError:
+            size = 0
+        if self.sink:
+            size = 0
+        reason = await admission_control.acquire(size)
+        logging.debug(f"{name} - admission shed reason: {reason!r}")
+        if reason is not None:
+            self.set_status(503)
+            self.set_header("Retry-After", self.settings.get("retry_after", 1))
+            self.set_header("X-Shed-Reason", reason)
+            # The response is finished, the request body is not echoed
+            self.echo = False
+            self.finish()
+            return
+
+        self.admitted_size = size
+
+    def data_received(self, chunk: bytes):
+        # Measure the request body as it arrives, see complete_request_body
+        if self.request_body is None:
+            self.request_body = RequestBody(
+                keep=self.settings.get("max_body_echo", 10240)
+            )
+        self.request_body.received(chunk)
+        # A body without a declared length is counted as it is received
+        if (
+            self.admitted_size is not None
+            and not self.sink
+            and "Content-Length" not in self.request.headers
+        ):
+            self.settings.get("admission_control").hold(len(chunk))
+            self.admitted_size += len(chunk)
+        # Returning an awaitable delays reading the rest of the body
+        if self.echo:
+            return self.echo_chunk(chunk)
+        if self.read_rate:
+            return self.throttle_read()
+
+    def echo_chunk(self, chunk: bytes):
+        """Write a chunk of the request body back and flush it
+
+        The flush completes once the chunk is written to the client, so the
+        body is read no faster than the client reads the response.
+        """
+        if self.echo_encoder is not None:
+            chunk = self.echo_encoder.compress(chunk) + self.echo_encoder.flush(
+                zlib.Z_SYNC_FLUSH
+            )
+        self.write(chunk)
+        return self.flush()
+
+    def finish_echo(self):
+        """Write the end of an echoed request body"""
+        name = "RepeaterHandler.finish_echo"
+
+        self.request_body.complete()
+        self.settings.get("stream_echo").record(self.request_body)
+        logging.debug(f"{name} - request_body: {self.request_body.summary()!r}")
+        if self.echo_encoder is not None:
+            self.write(self.echo_encoder.flush())
+
+    async def throttle_read(self):
+        """Wait until the body bytes received match the read rate"""
+        wait = self.request_body.size / self.read_rate - self.request_body.seconds()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def write_sink_summary(self):
+        """Respond to an upload to a sink with a summary of the body read"""
+        name = "RepeaterHandler.write_sink_summary"
+
+        self.request_body.complete()
+        self.settings.get("upload_sink").record(self.request_body)
+        seconds = self.request_body.seconds()
+        summary = {
+            "bytes": self.request_body.size,
+            "seconds": round(seconds, 6),
+            "megabytes_per_second": (
+                round(self.request_body.size / seconds / 1e6, 3) if seconds else None
+            ),
+            "read_rate": self.read_rate,
+        }
+        if self.request_body.hash is not None:
+            summary.update(sha256=self.request_body.hash.hexdigest())
+        logging.debug(f"{name} - summary: {summary!r}")
+
+        self.set_header("Content-Type", "text/json")
+        self.write(
+            json.dumps(
+                {"sink": summary},
+                indent=4,
+                separators=(",", ": "),
+                sort_keys=True,
+            )
+            + "\n"
+        )
+
+    def complete_request_body(self):
+        """Finish measuring the request body received
+
+        The leading bytes held are used as `self.request.body' and any form
+        arguments are parsed from them when the whole body was held.
+        """
+        name = "RepeaterHandler.complete_request_body"
+
+        if self.request_body is None:
+            return
+        self.request_body.complete()
+        logging.debug(f"{name} - request_body: {self.request_body.summary()!r}")
+
+        self.request.body = bytes(self.request_body.kept)
+        if self.request_body.truncated:
+            return
+
+        # Mirrors tornado.httputil.HTTPServerRequest._parse_body
+        try:
+            tornado.httputil.parse_body_arguments(
+                self.request.headers.get("Content-Type", ""),
+                self.request.body,
+                self.request.body_arguments,
+                self.request.files,
+                self.request.headers,
+            )
+        except tornado.httputil.HTTPInputError as err:
+            raise tornado.web.HTTPError(400, f"Invalid body: {err}") from err
+        for key, values in self.request.body_arguments.items():
+            arguments = self.request.arguments.setdefault(key, [])
+            # Conditions set before the body was received are kept
+            if isinstance(arguments, list):
+                arguments.extend(values)
+
+    def finish(self, chunk=None):
+        # Close the connection after this response while draining
+        if self.drain_tracked and self.drain_control.draining:
+            self.close_connection = True
+        if self.close_connection and not self._headers_written:
+            self.set_header("Connection", "close")
+        future = super().finish(chunk)
+        # Tornado only closes the connection by itself for a request asking
+        # to, so close the stream once everything written to it is sent
+        stream = self.request.connection.stream
+        if self.close_connection and not stream.closed():
+            stream.write(b"").add_done_callback(lambda _: stream.close())
+        return future
+
+    def on_finish(self):
+        # Release the admission for the next waiting request
+        if self.admitted_size is not None:
+            self.settings.get("admission_control").release(self.admitted_size)
+            self.admitted_size = None
+        if self.drain_tracked:
+            self.drain_control.request_finished()
+            self.drain_tracked = False
+        if self.memory_traced is not None:
+            self.settings.get("memory_monitor").request_finished(
+                self.memory_traced, self.request.path
+            )
+            self.memory_traced = None
 
     # Allowed HTTP methods
     # https://developer.mozilla.org/en-US/docs/Web/HTTP/Methods
@@ -91,11 +3030,26 @@ class RepeaterHandler(tornado.web.RequestHandler):
     async def post(self, **kwargs):
         """Convenience method to self.repeat"""
         name = "RepeaterHandler.post"
+        if self.echo:
+            logging.debug(f"{name} - calling finish_echo")
+            self.finish_echo()
+            return
+        if self.sink:
+            logging.debug(f"{name} - calling write_sink_summary")
+            self.write_sink_summary()
+            return
         logging.debug(f"{name} - calling repeat")
         await self.repeat(**kwargs)
 
     # Handle PUT requests
     async def put(self, **kwargs):
+        """Uploads are only allowed to a sink or echoed"""
+        if self.echo:
+            self.finish_echo()
+            return
+        if self.sink:
+            self.write_sink_summary()
+            return
         self.set_status(405)
 
     # -------------------------------------------------------------------------
@@ -229,7 +3183,10 @@ class RepeaterHandler(tornado.web.RequestHandler):
                             cls=JSONEncoderPlus,
                         )
                         content_as_json += "\n"  # pretty trailing line break
-                    content_as_json = gzip.compress(content_as_json.encode("utf-8"))
+                    # A fixed mtime keeps the encoded bytes the same each time
+                    content_as_json = gzip.compress(
+                        content_as_json.encode("utf-8"), mtime=0
+                    )
                 logging.debug(
                     f"{name} - `content_as_json' length with {encoding}: {len(content_as_json or '')}"
                 )
@@ -239,7 +3196,9 @@ class RepeaterHandler(tornado.web.RequestHandler):
                 logging.debug(
                     f"{name} - `content' length with identity: {len(content)}"
                 )
-                content = gzip.compress(content.encode("utf-8"))
+                if isinstance(content, str):
+                    content = content.encode("utf-8")
+                content = gzip.compress(content, mtime=0)
                 logging.debug(
                     f"{name} - `content' length with {encoding}: {len(content)}"
                 )
@@ -267,7 +3226,7 @@ class RepeaterHandler(tornado.web.RequestHandler):
     # -------------------------------------------------------------------------
 
     def generate_content(self, **kwargs):
-        """Generate pseudo random body content
+        """Generate deterministic body content, see GeneratedContent
 
         content <str|list>: Passed through when URL query string key `content'
           is not provided in the request.
@@ -322,10 +3281,7 @@ class RepeaterHandler(tornado.web.RequestHandler):
             )
 
         # Fill pattern to use with generating content
-        default_fill_pattern = (
-            "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 "
-        )
-        fill_pattern = self.request.arguments.get("fill", default_fill_pattern)
+        fill_pattern = self.request.arguments.get("fill", None)
         # Unpack a list of values and use the first value ONLY
         if isinstance(fill_pattern, list):
             fill_pattern = fill_pattern[0]
@@ -333,20 +3289,23 @@ class RepeaterHandler(tornado.web.RequestHandler):
             fill_pattern = fill_pattern.decode()
         logging.debug(f"{name} - fill_pattern {type(fill_pattern)}: {fill_pattern!r}")
 
-        # List of lines to gather body content
-        generated_content = []
-
-        # Generate random content until content length is correct
-        while len("".join(generated_content)) < content_length:
-            # bandit security scan raises B311 for a blacklisted call of random
-            # CWE: CWE-330 (https://cwe.mitre.org/data/definitions/330.html)
-            # https://bandit.readthedocs.io/en/1.7.10/blacklists/blacklist_calls.html#b311-random
-            # NOTE: The following use of random.randint is not used in any
-            # security context. It is only used to choose a pseudo random
-            # value from the available list of characters.
-            generated_content.append(
-                fill_pattern[random.randint(0, (len(fill_pattern) - 1))]  # nosec B311
+        # Seed of the generated content ?seed=<str>
+        seed = self.request.arguments.get("seed", "0")
+        # Unpack a list of values and use the first value ONLY
+        if isinstance(seed, list):
+            seed = seed[0]
+        if isinstance(seed, bytes):
+            seed = seed.decode()
+        logging.debug(f"{name} - seed {type(seed)}: {seed!r}")
+
+        # Content is only generated for the byte ranges read from it
+        try:
+            generated_content = GeneratedContent(
+                content_length, fill=fill_pattern, seed=seed
             )
+        except ValueError as err:
+            raise tornado.web.HTTPError(400, str(err))
+        self.generated_content = generated_content
         logging.debug(
             f"{name} - generated_content {type(generated_content)}: length={len(generated_content)}"
         )
@@ -382,7 +3341,7 @@ class RepeaterHandler(tornado.web.RequestHandler):
         """
 
         # Return the generated content
-        return "".join(generated_content)
+        return generated_content
 
     # -------------------------------------------------------------------------
 
@@ -410,6 +3369,26 @@ class RepeaterHandler(tornado.web.RequestHandler):
 
     # -------------------------------------------------------------------------
 
+    def status_argument(self):
+        """Return the status code set by `?status' or a condition, or None
+
+        Raise a 400 HTTPError unless the status is an integer 100 to 599.
+        """
+        status = self.request.arguments.get("status", False)
+        if isinstance(status, list):
+            status = status[0]
+        if isinstance(status, bytes):
+            status = status.decode()
+        if not status:
+            return None
+        try:
+            status = int(status)
+        except ValueError:
+            status = None
+        if status is None or not 100 <= status <= 599:
+            raise tornado.web.HTTPError(400, "Status must be an integer 100 to 599")
+        return status
+
     def modify_status_code(self, **kwargs) -> str:
         """Modify the HTTP status code"""
         name = "RepeaterHandler.modify_status_code"
@@ -420,11 +3399,8 @@ class RepeaterHandler(tornado.web.RequestHandler):
         logging.debug(
             f"{name} - match `reason' query parameter: {self.request.arguments.get('reason', False)!r}"
         )
-        if self.request.arguments.get("status", False):
-            new_status = self.request.arguments.get("status")
-            if isinstance(new_status, list):
-                new_status = new_status[0]
-            new_status = int(new_status)
+        new_status = self.status_argument()
+        if new_status is not None:
             logging.debug(f"{name} - new_status: {new_status!r}")
 
             # Allow the reason test to be set
@@ -589,7 +3565,11 @@ class RepeaterHandler(tornado.web.RequestHandler):
                 # Use 'body_length' instead of 'body'
                 # since POST/PUT data may be large
                 elif key == "body":
-                    value = len(getattr(self.request, key))
+                    value = (
+                        self.request_body.size
+                        if self.request_body is not None
+                        else len(getattr(self.request, key))
+                    )
                     key = "body_length"
                 else:
                     value = getattr(self.request, key)
@@ -597,6 +3577,9 @@ class RepeaterHandler(tornado.web.RequestHandler):
                 logging.debug(
                     f"{name} - content_as_json['request'][{key!r}]: {value!r}"
                 )
+            # Include the measurements of a request body received
+            if self.request_body is not None:
+                request.update(body_received=self.request_body.summary())
             content_as_json.update(request=request)
 
         # Return a pong when asked for a ping
@@ -648,9 +3631,9 @@ class RepeaterHandler(tornado.web.RequestHandler):
             content.append(
                 f"# Headers received and returned for this request at: {now} UTC"
             )
-            # Note late additions
+            # Note the response headers derived from this body once rendered
             content.append(
-                "# NOTE: `Etag' and `Content-Length' response headers are omitted"
+                "# NOTE: `Etag' and `Content-Length' are added after this body"
             )
             # Note the use of a downstream proxy
             if self.settings.get("proxied", False):
@@ -694,7 +3677,17 @@ class RepeaterHandler(tornado.web.RequestHandler):
         # Include POST data provided
         # TODO: This is not very DRY: already performed for `content_as_json'
         if self.request.method == "POST":
-            content.append(f"* POST DATA {self.request.body!r}{NL}")
+            body = self.request_body or RequestBody()
+            more = ""
+            if body.truncated:
+                more = f" ... {body.size - len(body.kept)} more bytes"
+            content.append(f"* POST DATA {self.request.body!r}{more}")
+            rate = body.throughput()
+            rate = f" {rate:.0f} B/s" if rate is not None else ""
+            content.append(
+                f"* POST DATA {body.size} bytes sha256={body.hash.hexdigest()}"
+                f"{rate}{NL}"
+            )
 
         # Modify the HTTP status code
         content.append(self.modify_status_code())
@@ -742,7 +3735,10 @@ class RepeaterHandler(tornado.web.RequestHandler):
 
         # Allow for random content of some length to be generated and used
         # instead of the response content generated above
-        content = self.generate_content(content=content)
+        content = self.generate_content(
+            content=content,
+            max_content_length=self.max_content_length(),
+        )
 
         logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
         logging.debug(
@@ -753,6 +3749,125 @@ class RepeaterHandler(tornado.web.RequestHandler):
 
     # -------------------------------------------------------------------------
 
+    @staticmethod
+    def number_argument(argument: str, value) -> float:
+        """Return a query argument as a finite number or raise a 400 HTTPError"""
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = math.nan
+        if not math.isfinite(number):
+            raise tornado.web.HTTPError(400, f"{argument} must be a number")
+        return number
+
+    def manage_connection(self, **kwargs):
+        """Apply keep-alive and connection reuse controls to this request"""
+        name = "RepeaterHandler.manage_connection"
+
+        content = kwargs.get("content", [])
+
+        # Connection tracking is only available with MockHTTPServer
+        connection_stats = self.settings.get("connection_stats")
+        record = None
+        if connection_stats is not None:
+            record = connection_stats.lookup(self.request.connection.stream)
+        logging.debug(f"{name} - record: {record!r}")
+
+        # Change the read timeouts for any remaining requests on this connection
+        # The idle keep-alive timeout also bounds reading the request headers
+        # ?idle_timeout=<seconds>&body_timeout=<seconds>
+        for argument, attribute in [
+            ("idle_timeout", "header_timeout"),
+            ("body_timeout", "body_timeout"),
+        ]:
+            value = self.request.arguments.get(argument, False)
+            if isinstance(value, list):
+                value = value[0]
+            if value:
+                logging.debug(f"{name} - {argument}: {value!r}")
+                value = self.number_argument(argument, value)
+                if value <= 0:
+                    raise tornado.web.HTTPError(
+                        400, f"{argument} must be a positive number of seconds"
+                    )
+                if record is not None:
+                    setattr(record.server_conn.params, attribute, value)
+
+        # Decide if the connection should be closed after this response
+        close = "close" in self.request.arguments
+        logging.debug(f"{name} - match `close' query parameter: {close!r}")
+
+        # ?max_requests=<int>
+        max_requests = self.request.arguments.get(
+            "max_requests", self.settings.get("max_requests_per_connection")
+        )
+        if isinstance(max_requests, list):
+            max_requests = max_requests[0]
+        if isinstance(max_requests, bytes):
+            max_requests = max_requests.decode()
+        if max_requests:
+            logging.debug(f"{name} - max_requests: {max_requests!r}")
+            if not str(max_requests).isdigit() or int(max_requests) < 1:
+                raise tornado.web.HTTPError(
+                    400, "max_requests must be a positive integer"
+                )
+            if record is not None and record.requests >= int(max_requests):
+                close = True
+
+        # ?close_ratio=<float>
+        close_ratio = self.request.arguments.get(
+            "close_ratio", self.settings.get("close_connection_ratio")
+        )
+        if isinstance(close_ratio, list):
+            close_ratio = close_ratio[0]
+        if close_ratio:
+            logging.debug(f"{name} - close_ratio: {close_ratio!r}")
+            close_ratio = self.number_argument("close_ratio", close_ratio)
+            if not 0 <= close_ratio <= 1:
+                raise tornado.web.HTTPError(400, "close_ratio must be 0 to 1")
+            # NOTE: random.random is not used in any security context here
+            if random.random() < close_ratio:  # nosec B311
+                close = True
+
+        logging.debug(f"{name} - close: {close!r}")
+        if close:
+            # A `Connection: close' response header is set when finished
+            self.close_connection = True
+
+        # Report the connection reuse details
+        if record is not None:
+            self.set_header("X-Connection-Requests", record.requests)
+            self.set_header("X-Connection-Age", f"{record.age():.3f}")
+
+        return content
+
+    # -------------------------------------------------------------------------
+
+    async def model_capacity(self, **kwargs):
+        """Wait for and hold a virtual worker when a capacity model applies"""
+        name = "RepeaterHandler.model_capacity"
+
+        content = kwargs.get("content", [])
+
+        capacity_model = self.settings.get("capacity_model")
+        if capacity_model is None:
+            return content
+
+        pool = capacity_model.select(
+            str(self.request.headers.get("host")), self.request.path
+        )
+        logging.debug(f"{name} - pool: {pool!r}")
+        if pool is None:
+            return content
+
+        wait, service = await pool.serve()
+        logging.debug(f"{name} - wait: {wait!r}, service: {service!r}")
+        self.set_header("X-Worker-Pool", f"wait={wait:.6f};service={service:.6f}")
+
+        return content
+
+    # -------------------------------------------------------------------------
+
     async def delay_response(self, **kwargs):
         """Allow the response to be delayed"""
         name = "RepeaterHandler.delay_response"
@@ -779,6 +3894,252 @@ class RepeaterHandler(tornado.web.RequestHandler):
 
     # -------------------------------------------------------------------------
 
+    def client_address(self) -> str:
+        """Return the requesting client's IP address
+
+        The `for' attribute of the Forwarded request header is used ahead of
+        the address of the connected peer.
+        """
+        name = "RepeaterHandler.client_address"
+
+        # Check the Forwarded request header: `for=<client addr>'
+        # Forwarded: for="4.68.48.225";scheme=https;method=GET
+        forwarded = self.request.headers.get("Forwarded", False)
+        logging.debug(f"{name} - forwarded: {forwarded!r}")
+        if forwarded and forwarded.find("for=") != -1:
+            # Remove double quotes and split at semi colons
+            forwarded = forwarded.replace('"', "").split(";")
+            # Unpack the `for' item value as the `client_addr'
+            client_addr = [
+                item.split("=")[-1] for item in forwarded if item.startswith("for")
+            ][0]
+        else:
+            client_addr = self.request.remote_ip
+
+        return client_addr
+
+    # -------------------------------------------------------------------------
+
+    def limit_rate(self, **kwargs):
+        """Limit the request rate per client address, Host or header value"""
+        name = "RepeaterHandler.limit_rate"
+
+        content = kwargs.get("content", [])
+
+        # ?rate_limit=<requests per second>[:<burst>]
+        rate_limit = self.request.arguments.get(
+            "rate_limit", self.settings.get("rate_limit")
+        )
+        if isinstance(rate_limit, list):
+            rate_limit = rate_limit[0]
+        if isinstance(rate_limit, bytes):
+            rate_limit = rate_limit.decode()
+        logging.debug(f"{name} - rate_limit: {rate_limit!r}")
+        if not rate_limit:
+            return content
+        try:
+            rate, burst = parse_rate_limit(rate_limit)
+        except ValueError as err:
+            raise tornado.web.HTTPError(400, str(err))
+
+        # ?rate_limit_key=<addr|host|header:<name>>
+        rate_limit_key = self.request.arguments.get(
+            "rate_limit_key", self.settings.get("rate_limit_key") or "addr"
+        )
+        if isinstance(rate_limit_key, list):
+            rate_limit_key = rate_limit_key[0]
+        if isinstance(rate_limit_key, bytes):
+            rate_limit_key = rate_limit_key.decode()
+        if rate_limit_key.lower() == "host":
+            key = str(self.request.headers.get("host")).lower()
+        elif rate_limit_key.lower().startswith("header:"):
+            key = self.request.headers.get(rate_limit_key.split(":", 1)[1], "")
+        else:
+            key = self.client_address()
+        key = f"{rate_limit_key}={key}"
+        logging.debug(f"{name} - key: {key!r}")
+
+        allowed, remaining, reset = self.settings.get("rate_limiter").check(
+            key, rate, burst
+        )
+        logging.debug(f"{name} - allowed: {allowed!r}, remaining: {remaining!r}")
+
+        # draft-ietf-httpapi-ratelimit-headers
+        self.set_header("RateLimit-Limit", int(burst))
+        self.set_header("RateLimit-Remaining", int(remaining))
+        self.set_header("RateLimit-Reset", math.ceil(reset))
+        if not allowed:
+            self.set_status(429)
+            self.set_header("Retry-After", math.ceil((1 - remaining) / rate))
+
+        return content
+
+    # -------------------------------------------------------------------------
+
+    def evaluate_conditions(self, **kwargs):
+        """Set the conditions for this request from the request options
+
+        The conditions are evaluated once, either from the request headers
+        alone before the request body is received or when repeating the
+        request, so stateful sequences and error rates are not sampled twice.
+        """
+        name = "RepeaterHandler.evaluate_conditions"
+
+        content = kwargs.get("content", [])
+
+        # Conditions already set from the request headers
+        if self.condition_content is not None:
+            self.mark_timing("options")
+            self.mark_timing("condition")
+            return content + self.condition_content
+
+        start = len(content)
+
+        # Apply the default behavior changed at runtime
+        content = self.apply_runtime_settings(content=content)
+        logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
+
+        # Apply the conditions of matching config rules
+        content = self.apply_config_rules(content=content)
+        logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
+        self.mark_timing("options")
+
+        # Allow a condition to only be set for a matching condition
+        content = self.set_condition(content=content)
+        logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
+
+        # Allow conditions to be set by the position in a stateful sequence
+        content = self.run_scenario(content=content)
+        logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
+
+        # Apply the conditions of any active outage window
+        content = self.apply_schedule(content=content)
+        logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
+        self.mark_timing("condition")
+
+        self.condition_content = content[start:]
+        return content
+
+    async def expect_continue(self) -> bool:
+        """Decide from the request headers alone to accept the request body
+
+        Clients sending `Expect: 100-continue' wait for a `100 Continue'
+        interim response before sending the request body. A request which
+        will be rejected is answered now so the body is never transferred.
+        Return True when the request was rejected.
+        """
+        name = "RepeaterHandler.expect_continue"
+
+        expect = self.request.headers.get("Expect")
+        logging.debug(f"{name} - expect: {expect!r}")
+
+        # Simulate an origin slow to decide, ?expect_delay=<seconds>
+        expect_delay = self.get_query_argument(
+            "expect_delay", self.settings.get("expect_delay")
+        )
+        if expect_delay:
+            try:
+                expect_delay = float(expect_delay)
+            except ValueError:
+                expect_delay = math.nan
+            if not 0 <= expect_delay < math.inf:
+                raise tornado.web.HTTPError(400, "expect_delay must be seconds")
+            await asyncio.sleep(expect_delay)
+
+        status = None
+        try:
+            size = int(self.request.headers.get("Content-Length") or 0)
+        except ValueError:
+            size = 0
+        max_body_size = self.settings.get("max_body_size")
+        # The expectation token is case-insensitive
+        if expect.lower() != "100-continue":
+            status = 417
+        elif max_body_size is not None and size > max_body_size:
+            status = 413
+        else:
+            self.evaluate_conditions()
+            value = self.status_argument()
+            if value is not None and value >= 400:
+                status = value
+        logging.debug(f"{name} - status: {status!r}")
+        if status is None:
+            # Only the exact token is answered with `100 Continue' by tornado
+            if expect != "100-continue":
+                self.request.connection.stream.write(b"HTTP/1.1 100 (Continue)\r\n\r\n")
+            return False
+
+        reason = self.request.arguments.get("reason", False)
+        if isinstance(reason, list):
+            reason = reason[0]
+        if isinstance(reason, bytes):
+            reason = reason.decode()
+        self.set_status(status, reason or None)
+        self.set_header("X-Status-Code", f"{status} set before the request body")
+        # The unread request body leaves the connection unusable
+        self.set_header("Connection", "close")
+        # The response is finished, the request body is not echoed
+        self.echo = False
+        self.finish()
+        return True
+
+    # -------------------------------------------------------------------------
+
+    def apply_runtime_settings(self, **kwargs):
+        """Apply the default behavior changed at runtime to this request"""
+        name = "RepeaterHandler.apply_runtime_settings"
+
+        content = kwargs.get("content", [])
+
+        runtime_control = self.settings.get("runtime_control")
+        if runtime_control is None:
+            return content
+
+        # Keep the same snapshot for the whole request
+        self.runtime_settings = runtime_control.snapshot()
+        logging.debug(f"{name} - {self.runtime_settings.as_dict()!r}")
+
+        # Request options are used ahead of the runtime defaults
+        applied = []
+        for key in ["delay", "status"]:
+            value = getattr(self.runtime_settings, key)
+            if value is not None and key not in self.request.arguments:
+                self.request.arguments[key] = str(value)
+                applied.append(f"{key}={value}")
+
+        error_rate = self.runtime_settings.error_rate
+        # NOTE: random.random is not used in any security context here
+        if error_rate and random.random() < error_rate:  # nosec B311
+            error_status = self.runtime_settings.error_status or 500
+            self.request.arguments["status"] = str(error_status)
+            applied.append(f"error={error_status}")
+
+        if applied:
+            self.set_header("X-Runtime-Settings", ";".join(applied))
+
+        return content
+
+    # -------------------------------------------------------------------------
+
+    def apply_config_rules(self, **kwargs):
+        """Set the conditions of the config rules matching this request"""
+        name = "RepeaterHandler.apply_config_rules"
+
+        content = kwargs.get("content", [])
+
+        matched = []
+        for rule in self.config.rules:
+            if rule.matches(self.request):
+                self.apply_conditions(rule.conditions)
+                matched.append(rule.name)
+        logging.debug(f"{name} - matched: {matched!r}")
+        if matched:
+            self.set_header("X-Config-Rule", ", ".join(matched))
+
+        return content
+
+    # -------------------------------------------------------------------------
+
     def set_condition(self, **kwargs):
         """Set a condition to occur only when a value matches"""
         name = "RepeaterHandler.set_condition"
@@ -829,21 +4190,7 @@ class RepeaterHandler(tornado.web.RequestHandler):
             # Match the requesting client's IP address
             # ?set=delay:3,status:599,addr:4.68.48.225
             elif set_match_key.lower() == "addr":
-                # Check the Forwarded request header: `for=<client addr>'
-                # Forwarded: for="4.68.48.225";scheme=https;method=GET
-                forwarded = self.request.headers.get("Forwarded", False)
-                logging.debug(f"{name} - forwarded: {forwarded!r}")
-                if forwarded and forwarded.find("for=") != -1:
-                    # Remove double quotes and split at semi colons
-                    forwarded = forwarded.replace('"', "").split(";")
-                    # Unpack the `for' item value as the `client_addr'
-                    client_addr = [
-                        item.split("=")[-1]
-                        for item in forwarded
-                        if item.startswith("for")
-                    ][0]
-                else:
-                    client_addr = self.request.remote_ip
+                client_addr = self.client_address()
                 logging.debug(f"{name} - client_addr: {client_addr!r}")
                 # Be mindful of IPv6 addresses
                 if client_addr.lower() == set_match_value.lower():
@@ -856,51 +4203,395 @@ class RepeaterHandler(tornado.web.RequestHandler):
                 continue
 
             # Set the condition on this request as we did match
-            for set_condition in set_conditions:
-                logging.debug(f"{name} - set_condition: {set_condition!r}")
+            self.apply_conditions(set_conditions)
 
-                # A `set_condition' should be a <key>:<value> pair
-                # Be mindful of IPv6 addresses
-                set_condition = set_condition.split(":", 1)
-                if len(set_condition) != 2:
-                    logging.debug(
-                        f"{name} - `set_condition' missing arguments: {set_condition!r}"
-                    )
-                    continue
+        return content
+
+    # -------------------------------------------------------------------------
+
+    def apply_conditions(self, set_conditions: list):
+        """Set each <key>:<value> condition as a request argument
 
-                set_condition_key, set_condition_value = set_condition
-                self.request.arguments[set_condition_key] = set_condition_value
+        set_conditions <list>: Conditions such as ["delay:4", "status:699"].
+        """
+        name = "RepeaterHandler.apply_conditions"
+
+        for set_condition in set_conditions:
+            logging.debug(f"{name} - set_condition: {set_condition!r}")
+
+            # A `set_condition' should be a <key>:<value> pair
+            # Be mindful of IPv6 addresses
+            set_condition = set_condition.split(":", 1)
+            if len(set_condition) != 2:
                 logging.debug(
-                    f"{name} - self.request.arguments[{set_condition_key!r}]: \
-                    {self.request.arguments.get(set_condition_key)!r}"
+                    f"{name} - `set_condition' missing arguments: {set_condition!r}"
+                )
+                continue
+
+            set_condition_key, set_condition_value = set_condition
+            self.request.arguments[set_condition_key] = set_condition_value
+            logging.debug(
+                f"{name} - self.request.arguments[{set_condition_key!r}]: \
+                {self.request.arguments.get(set_condition_key)!r}"
+            )
+
+    # -------------------------------------------------------------------------
+
+    def run_scenario(self, **kwargs):
+        """Set conditions according to the position in a stateful sequence"""
+        name = "RepeaterHandler.run_scenario"
+
+        content = kwargs.get("content", [])
+
+        # ?scenario=<first:<int>|every:<int>|cycle>;<conditions>[;<conditions>]
+        scenario = self.request.arguments.get("scenario", False)
+        if isinstance(scenario, list):
+            scenario = scenario[0]
+        if isinstance(scenario, bytes):
+            scenario = scenario.decode()
+        logging.debug(f"{name} - scenario: {scenario!r}")
+        if not scenario:
+            return content
+
+        # Parse the mode once, first and every count a positive number
+        mode, *steps = scenario.split(";")
+        mode, _, number = mode.partition(":")
+        if mode in ["first", "every"]:
+            if not number.isdigit() or int(number) < 1:
+                raise tornado.web.HTTPError(
+                    400, f"Scenario {mode} needs a positive integer: {number!r}"
                 )
+            number = int(number)
+
+        # The scenario state is kept per key, an explicit `scenario_key' is
+        # used ahead of a key derived from the request
+        # ?scenario_by=<addr|host|path|header:<name>>
+        scenario_key = self.request.arguments.get("scenario_key", False)
+        if isinstance(scenario_key, list):
+            scenario_key = scenario_key[0]
+        if isinstance(scenario_key, bytes):
+            scenario_key = scenario_key.decode()
+        if not scenario_key:
+            scenario_by = self.request.arguments.get("scenario_by", "addr")
+            if isinstance(scenario_by, list):
+                scenario_by = scenario_by[0]
+            if isinstance(scenario_by, bytes):
+                scenario_by = scenario_by.decode()
+            if scenario_by.lower() == "host":
+                scenario_key = str(self.request.headers.get("host")).lower()
+            elif scenario_by.lower() == "path":
+                scenario_key = self.request.path
+            elif scenario_by.lower().startswith("header:"):
+                scenario_key = self.request.headers.get(
+                    scenario_by.split(":", 1)[1], ""
+                )
+            else:
+                scenario_key = self.client_address()
+            scenario_key = f"{scenario_by}={scenario_key}"
+        logging.debug(f"{name} - scenario_key: {scenario_key!r}")
+
+        count = self.settings.get("scenario_state").increment(
+            f"{scenario_key}|{scenario}"
+        )
+        logging.debug(f"{name} - count: {count!r}")
+        self.set_header("X-Scenario", f"{scenario_key} request {count}")
+
+        # Choose the conditions for this request in the sequence
+        if mode == "first":
+            step = steps[0] if steps and count <= number else ""
+        elif mode == "every":
+            step = steps[0] if steps and count % number == 0 else ""
+        elif mode == "cycle":
+            step = steps[(count - 1) % len(steps)] if steps else ""
+        else:
+            logging.debug(f"{name} - unknown scenario mode: {mode!r}")
+            step = ""
+        logging.debug(f"{name} - step: {step!r}")
+
+        if step:
+            self.apply_conditions(step.split(","))
+
+        return content
+
+    # -------------------------------------------------------------------------
+
+    def apply_schedule(self, **kwargs):
+        """Set the conditions of any active outage window"""
+        name = "RepeaterHandler.apply_schedule"
+
+        content = kwargs.get("content", [])
+
+        outage_schedule = self.settings.get("outage_schedule")
+        if outage_schedule is None:
+            return content
+
+        outage_schedule = outage_schedule.check()
+        if outage_schedule.header is not None:
+            logging.debug(f"{name} - active: {outage_schedule.header!r}")
+            self.apply_conditions(outage_schedule.conditions)
+            self.set_header("X-Outage-Window", outage_schedule.header)
 
         return content
 
     # -------------------------------------------------------------------------
 
+    def max_content_length(self) -> int:
+        """Return the maximum length of generated content for this request"""
+        return (
+            self.runtime_settings.max_content_length
+            or self.settings.get("max_content_length")
+            or 10240
+        )
+
+    def answer_conditional(self) -> bool:
+        """Set the response validators and answer a conditional request
+
+        Static responses use validators computed at start up and generated
+        content uses validators derived from its parameters, so a request
+        which is not modified is answered with a 304 status code before the
+        response is rendered or compressed. Other responses describe the
+        request and tornado adds an ETag of their body when written.
+        Return True when the response is not modified.
+
+        See Also:
+        * https://httpwg.org/specs/rfc9110.html#evaluation
+        """
+        name = "RepeaterHandler.answer_conditional"
+
+        if self.request.method not in ["GET", "HEAD"]:
+            return False
+        # Only a 200 response is validated, conditions may change the status
+        status = self.status_argument()
+        if status is not None and status != 200:
+            return False
+
+        path = self.request.path
+        as_json = self.request.headers.get("Accept", "").endswith(
+            "/json"
+        ) or path.endswith(".json")
+        encoding = self._headers.get("Content-Encoding")
+        etag = None
+        for suffix in ["/ping", "/hello_world", "/football.svg"]:
+            if path.endswith(suffix):
+                etag = STATIC_ETAGS.get(f"{suffix}.json" if as_json else suffix)
+                etag = etag or STATIC_ETAGS[suffix]
+                if encoding:
+                    etag = f'{etag[:-1]}-{encoding}"'
+                break
+        else:
+            generated_content = (
+                None
+                if as_json
+                else self.generate_content(
+                    content=None, max_content_length=self.max_content_length()
+                )
+            )
+            if generated_content is not None:
+                etag = generated_content.etag(encoding)
+        logging.debug(f"{name} - etag: {etag!r}")
+        if etag is None:
+            return False
+        return self.validate_response(etag)
+
+    def validate_response(self, etag: str, last_modified: int | None = None) -> bool:
+        """Set the ETag and Last-Modified validators of the response and
+        answer a conditional request with a 304 status code when the
+        response is not modified. Return True when not modified.
+
+        etag <str>: Strong entity tag of the response.
+
+        last_modified <int>: Time the response was last modified, in seconds
+            since the epoch. (Default = None, the modified time of this file)
+        """
+        name = "RepeaterHandler.validate_response"
+
+        if last_modified is None:
+            last_modified = STATIC_LAST_MODIFIED
+        self.set_header("Etag", etag)
+        self.set_header(
+            "Last-Modified",
+            datetime.datetime.fromtimestamp(last_modified, datetime.timezone.utc),
+        )
+
+        # If-None-Match is used ahead of If-Modified-Since
+        not_modified = False
+        if_none_match = self.request.headers.get("If-None-Match")
+        if_modified_since = self.request.headers.get("If-Modified-Since")
+        if if_none_match is not None:
+            # Weak comparison of the entity tags
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            not_modified = "*" in tags or etag in tags
+        elif if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+                not_modified = since.timestamp() >= last_modified
+            except (TypeError, ValueError):
+                not_modified = False
+        logging.debug(f"{name} - not_modified: {not_modified!r}")
+
+        revalidation_stats = self.settings.get("revalidation_stats")
+        if revalidation_stats is not None:
+            revalidation_stats.record(
+                if_none_match is not None or if_modified_since is not None,
+                not_modified,
+            )
+        if not_modified:
+            self.set_status(304)
+        return not_modified
+
+    def select_ranges(self, content) -> bytes:
+        """Return the byte ranges of the content requested by a Range header
+
+        A single range is returned with a 206 status code and multiple ranges
+        as a multipart/byteranges body. Ranges are read from generated content
+        without generating the rest of it. An `If-Range' validator which does
+        not match the response, or an invalid Range header, returns the whole
+        content. Unsatisfiable ranges return a 416 status code.
+
+        content <str|bytes|GeneratedContent>: Whole response body content.
+        """
+        name = "RepeaterHandler.select_ranges"
+
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        length = len(content)
+
+        def read(start, end):
+            if isinstance(content, GeneratedContent):
+                return content.read(start, end)
+            return content[start:end]
+
+        # Ranges apply only while the validator matches, compared strongly
+        # https://httpwg.org/specs/rfc9110.html#field.if-range
+        if_range = self.request.headers.get("If-Range")
+        if if_range is not None:
+            if if_range.startswith(("W/", '"')):
+                validator = self._headers.get("Etag")
+                matched = not if_range.startswith("W/") and if_range == validator
+            else:
+                matched = if_range == self._headers.get("Last-Modified")
+            logging.debug(f"{name} - If-Range {if_range!r} matched: {matched!r}")
+            if not matched:
+                return read(0, length)
+
+        ranges = parse_byte_ranges(self.request.headers.get("Range"), length)
+        logging.debug(f"{name} - ranges: {ranges!r}")
+        if ranges is None:
+            return read(0, length)
+        if not ranges:
+            self.set_status(416)
+            self.set_header("Content-Range", f"bytes */{length}")
+            return b""
+
+        self.set_status(206)
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.set_header("Content-Range", f"bytes {start}-{end - 1}/{length}")
+            return read(start, end)
+
+        # https://httpwg.org/specs/rfc9110.html#multipart.byteranges
+        boundary = os.urandom(12).hex()
+        content_type = self._headers.get("Content-Type", "application/octet-stream")
+        parts = []
+        for start, end in ranges:
+            parts.append(
+                f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Range: bytes {start}-{end - 1}/{length}\r\n\r\n".encode(
+                    "utf-8"
+                )
+            )
+            parts.append(read(start, end))
+            parts.append(b"\r\n")
+        parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+        self.set_header("Content-Type", f"multipart/byteranges; boundary={boundary}")
+        return b"".join(parts)
+
+    # -------------------------------------------------------------------------
+
+    def mark_timing(self, stage: str):
+        """Record the time since the previous mark as the `stage' timing"""
+        if self.timings is not None:
+            now = time.perf_counter()
+            self.timings.append((stage, now - self.timing_mark))
+            self.timing_mark = now
+
+    def set_server_timing(self):
+        """Report the recorded stage timings in a Server-Timing header
+
+        https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Server-Timing
+        """
+        if self.timings is None:
+            return
+        self.timings.append(("total", self.request.request_time()))
+        self.set_header(
+            "Server-Timing",
+            ", ".join(
+                f"{stage};dur={1000 * seconds:.3f}" for stage, seconds in self.timings
+            ),
+        )
+
+    # -------------------------------------------------------------------------
+
     async def repeat(self, **kwargs):
         """Repeat the request made in the response body"""
         name = "RepeaterHandler.repeat"
         logging.debug(f"{name} - **kwargs: {kwargs!r}")
 
+        # Record the time taken by each stage for a Server-Timing header
+        if self.settings.get("server_timing") or (
+            "server_timing" in self.request.arguments
+        ):
+            self.timings = []
+            self.timing_mark = time.perf_counter()
+
+        # Use the leading bytes of the request body received
+        self.complete_request_body()
+
         # Always start with an empty content list
         # Weird issue seen that content was not initiated clean per a request
         content = []
         logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
 
-        # Allow a condition to only be set for a matching condition
-        content = self.set_condition(content=content)
+        # Apply the conditions set for this request
+        content = self.evaluate_conditions(content=content)
+        logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
+
+        # Apply keep-alive and connection reuse controls
+        content = self.manage_connection(content=content)
+        logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
+
+        # Allow the request rate to be limited
+        content = self.limit_rate(content=content)
+        logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
+        self.mark_timing("connection")
+        # Escape early without body content when over the rate limit
+        if self.get_status() == 429:
+            self.set_server_timing()
+            return
+
+        # Queue for a virtual worker when a capacity model is configured
+        content = await self.model_capacity(content=content)
         logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
+        self.mark_timing("queue")
 
         # Allow the response to be delayed
         content = await self.delay_response(content=content)
         logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
+        self.mark_timing("delay")
+
+        # Byte ranges are served from the identity encoded content, with the
+        # identity ETag, which a cache must not use for other encodings
+        ranged = self.request.method == "GET" and "Range" in self.request.headers
+        logging.debug(f"{name} - ranged: {ranged!r}")
+        if ranged:
+            self.set_header("Vary", "Accept-Encoding")
 
         # Include encoding response headers in the content as requested
-        content, content_as_json = self.content_encoding(
-            content=content, add_headers_only=True
-        )
+        content_as_json = {}
+        if not ranged:
+            content, content_as_json = self.content_encoding(
+                content=content, add_headers_only=True
+            )
         logging.debug(
             f"{name} - content {type(content)}: \
             length={len(content)!r}"
@@ -910,6 +4601,12 @@ class RepeaterHandler(tornado.web.RequestHandler):
             length={len(content_as_json or '')!r}"
         )
 
+        # Answer a conditional request before rendering the response
+        if self.answer_conditional():
+            self.mark_timing("render")
+            self.set_server_timing()
+            return
+
         # Prepare the body content for the response
         # `content_as_json' may be ignored as input at this point
         # since `prepare_body_text' will set it accordingly
@@ -918,15 +4615,21 @@ class RepeaterHandler(tornado.web.RequestHandler):
         logging.debug(
             f"{name} - content_as_json {type(content_as_json)}: length={len(content_as_json or '')!r}"
         )
+        # Generated content is read in full unless byte ranges are requested
+        if isinstance(content, GeneratedContent) and not ranged:
+            content = content.read()
+        self.mark_timing("render")
 
         # Encode the content as requested
-        content, content_as_json = self.content_encoding(
-            content=content, content_as_json=content_as_json
-        )
+        if not ranged:
+            content, content_as_json = self.content_encoding(
+                content=content, content_as_json=content_as_json
+            )
         logging.debug(f"{name} - content {type(content)}: length={len(content)!r}")
         logging.debug(
             f"{name} - content_as_json {type(content_as_json)}: length={len(content_as_json or '')!r}"
         )
+        self.mark_timing("compress")
 
         # Only include body content with some status codes
         if self.get_status() in [200]:
@@ -948,6 +4651,11 @@ class RepeaterHandler(tornado.web.RequestHandler):
             if content_as_json:
                 logging.debug(f"{name} - using `content_as_json' as response `content'")
                 content = content_as_json
+            # Serve the byte ranges requested
+            if self.request.method in ["GET", "HEAD"]:
+                self.set_header("Accept-Ranges", "bytes")
+            if ranged:
+                content = self.select_ranges(content)
             # Do not include body content with some request methods
             if self.request.method == "OPTIONS":
                 self.set_header("Access-Control-Allow-Origin", "*")
@@ -964,6 +4672,110 @@ class RepeaterHandler(tornado.web.RequestHandler):
                 self.set_header("Content-Length", len(content))
             else:
                 self.write(content)
+        self.mark_timing("write")
+        self.set_server_timing()
+
+
+class ObjectHandler(RepeaterHandler):
+    """Serve cacheable objects from the object store
+
+    The object of a request path and query string is created on the first
+    request, with a size and Cache-Control, Age and Last-Modified headers
+    which do not change, and served from memory while it is kept in the
+    object store. Conditions, delays and byte ranges apply as they do to
+    other responses.
+    """
+
+    SUPPORTED_METHODS = ("GET", "HEAD")
+
+    async def repeat(self, **kwargs):
+        """Serve the stored object of the request"""
+        name = "ObjectHandler.repeat"
+        logging.debug(f"{name} - **kwargs: {kwargs!r}")
+
+        # Record the time taken by each stage for a Server-Timing header
+        if self.settings.get("server_timing") or (
+            "server_timing" in self.request.arguments
+        ):
+            self.timings = []
+            self.timing_mark = time.perf_counter()
+
+        # Apply the conditions, connection controls and delays to the object
+        content = self.evaluate_conditions(content=[])
+        content = self.manage_connection(content=content)
+        content = self.limit_rate(content=content)
+        self.mark_timing("connection")
+        if self.get_status() == 429:
+            self.set_server_timing()
+            return
+        content = await self.model_capacity(content=content)
+        self.mark_timing("queue")
+        content = await self.delay_response(content=content)
+        self.mark_timing("delay")
+
+        # Set the status code of the conditions, only a 200 serves the object
+        self.modify_status_code()
+        if self.get_status() != 200:
+            self.modify_response_headers(content=content)
+            self.set_server_timing()
+            return
+
+        found = self.lookup(**kwargs)
+        if found is None:
+            self.set_status(404)
+            self.modify_response_headers(content=content)
+            self.set_server_timing()
+            return
+        content, headers = found
+        logging.debug(f"{name} - content length: {len(content)!r}")
+        for header, value in headers.items():
+            if header not in ["Etag", "Last-Modified"]:
+                self.set_header(header, value)
+        # Headers set with `?header' override those of the object
+        self.modify_response_headers(content=[])
+        self.mark_timing("render")
+
+        # Answer a conditional request with the validators of the object
+        last_modified = headers.get("Last-Modified")
+        if last_modified is not None:
+            last_modified = email.utils.parsedate_to_datetime(last_modified)
+            last_modified = int(last_modified.timestamp())
+        if not self.validate_response(headers["Etag"], last_modified):
+            self.set_header("Accept-Ranges", "bytes")
+            if self.request.method == "GET" and "Range" in self.request.headers:
+                content = self.select_ranges(content)
+            if self.request.method == "HEAD":
+                self.set_header("Content-Length", len(content))
+            elif isinstance(content, GeneratedContent):
+                # Headers are sent with the first block, the write is not timed
+                self.set_server_timing()
+                # Generate and send one block at a time
+                self.set_header("Content-Length", len(content))
+                for start in range(0, len(content), content.BLOCK_SIZE):
+                    self.write(content.read(start, start + content.BLOCK_SIZE))
+                    await self.flush()
+                return
+            else:
+                self.write(content)
+        self.mark_timing("write")
+        self.set_server_timing()
+
+    def lookup(self, **kwargs):
+        """Return the body content and response headers of the object, or
+        None when there is no such object"""
+        stored = self.settings.get("object_store").get(self.request.uri)
+        return stored.body, stored.headers
+
+
+class CatalogHandler(ObjectHandler):
+    """Serve the objects of the synthetic catalog by id
+
+    Each object is described from its id on every request, generating the
+    body one block at a time, so no object is kept in memory.
+    """
+
+    def lookup(self, object_id: str | None = None, **kwargs):
+        return self.settings.get("catalog").describe(int(object_id))
 
 
 def make_app(**kwargs):
@@ -973,39 +4785,356 @@ def make_app(**kwargs):
     name = "make_app"
     logging.debug(f"{name} - **kwargs: {kwargs!r}")
 
+    # Reject an invalid rate limit now rather than on each request
+    if kwargs.get("rate_limit"):
+        parse_rate_limit(kwargs.get("rate_limit"))
+
     # tornado.web.Application routes
     # www.tornadoweb.org/en/stable/web.html#application-configuration
     routes = kwargs.get(
         "routes",
         [
+            (r"/_/admin", AdminHandler),
+            (r"/_/memory", MemoryHandler),
+            (r"/_/profile", ProfileHandler),
+            (r"/_/(live|ready)", HealthHandler),
+            (r"/_/stats", StatsHandler),
             (r"/.*", RepeaterHandler),
         ],
     )
+    # Serve the object store and catalog path prefixes ahead of the repeater
+    if kwargs.get("object_store") and "routes" not in kwargs:
+        routes.insert(
+            -1, (rf"{re.escape(kwargs.get('object_store'))}.*", ObjectHandler)
+        )
+    if kwargs.get("catalog") and "routes" not in kwargs:
+        routes.insert(
+            -1,
+            (rf"{re.escape(kwargs.get('catalog'))}(?P<object_id>\d+)", CatalogHandler),
+        )
     logging.debug(f"{name} - tornado.web.Application routes: {routes!r}")
 
     # tornado.web.Application settings
     # www.tornadoweb.org/en/stable/web.html#tornado.web.Application.settings
-    app = tornado.web.Application(
+    app = MockApplication(
         routes,
-        autoreload=kwargs.get("debug", False),
+        autoreload=kwargs.get("autoreload", kwargs.get("debug", False)),
         debug=kwargs.get("debug", False),
         compress_response=kwargs.get("compress_response", False),
         allow_ipv6=kwargs.get("allow_ipv6", True),
         name=kwargs.get("name", "Python/Tornado"),
         proxied=kwargs.get("proxied", False),
         version=kwargs.get("version", "0.0.0a"),
+        max_requests_per_connection=kwargs.get("max_requests_per_connection"),
+        close_connection_ratio=kwargs.get("close_connection_ratio"),
+        server_timing=kwargs.get("server_timing", False),
+        catalog=(
+            Catalog(
+                objects=kwargs.get("catalog_objects"),
+                size=kwargs.get("catalog_size"),
+                max_size=kwargs.get("catalog_max_size"),
+                types=kwargs.get("catalog_types"),
+                cacheable=kwargs.get("catalog_cacheable"),
+                max_age=kwargs.get("catalog_max_age"),
+            )
+            if kwargs.get("catalog")
+            else None
+        ),
+        connection_stats=ConnectionStats(),
+        revalidation_stats=RevalidationStats(),
+        health_check=HealthCheck(
+            max_loop_lag=kwargs.get("ready_max_loop_lag"),
+            max_inflight=kwargs.get("ready_max_inflight"),
+            max_rss=kwargs.get("ready_max_rss"),
+        ),
+        memory_monitor=MemoryMonitor(
+            sample_rate=(
+                0.01
+                if kwargs.get("memory_sample_rate") is None
+                else kwargs.get("memory_sample_rate")
+            )
+        ),
+        profiler=Profiler(enabled=kwargs.get("profiling", False)),
+        loop_monitor=LoopMonitor(threshold=kwargs.get("slow_callback_threshold")),
+        drain_control=DrainControl(
+            timeout=(
+                25
+                if kwargs.get("drain_timeout") is None
+                else kwargs.get("drain_timeout")
+            )
+        ),
+        admission_control=AdmissionControl(
+            max_inflight=kwargs.get("max_inflight_requests"),
+            max_inflight_bytes=kwargs.get("max_inflight_body_bytes"),
+            max_queue=kwargs.get("max_queue"),
+            queue_timeout=kwargs.get("queue_timeout"),
+        ),
+        retry_after=kwargs.get("retry_after") or 1,
+        capacity_model=CapacityModel(kwargs.get("worker_pool")),
+        rate_limit=kwargs.get("rate_limit"),
+        rate_limit_key=kwargs.get("rate_limit_key"),
+        rate_limiter=RateLimiter(
+            max_keys=kwargs.get("rate_limit_max_keys") or 100000,
+            shared_state=kwargs.get("shared_state"),
+        ),
+        scenario_state=ScenarioState(
+            ttl=kwargs.get("scenario_ttl") or 300,
+            max_keys=kwargs.get("scenario_max_keys") or 100000,
+            shared_state=kwargs.get("shared_state"),
+        ),
+        shared_state=kwargs.get("shared_state"),
+        runtime_control=RuntimeControl(kwargs.get("shared_state")),
+        admin_token=kwargs.get("admin_token")
+        or os.environ.get("MOCK_ORIGIN_ADMIN_TOKEN"),
+        max_content_length=kwargs.get("max_content_length"),
+        max_body_size=kwargs.get("max_body_size"),
+        expect_delay=kwargs.get("expect_delay"),
+        max_body_echo=(
+            10240
+            if kwargs.get("max_body_echo") is None
+            else kwargs.get("max_body_echo")
+        ),
+        object_store=(
+            ObjectStore(
+                budget=kwargs.get("object_store_budget"),
+                size=kwargs.get("object_size"),
+                max_age=kwargs.get("object_max_age"),
+                age=kwargs.get("object_age"),
+                spill=kwargs.get("object_store_spill"),
+                spill_size=kwargs.get("object_store_spill_size"),
+            )
+            if kwargs.get("object_store")
+            else None
+        ),
+        schedule=kwargs.get("schedule"),
+        stream_echo=StreamEcho(matches=kwargs.get("echo")),
+        upload_sink=UploadSink(
+            matches=kwargs.get("sink"), read_rate=kwargs.get("sink_read_rate")
+        ),
+        outage_schedule=(
+            OutageSchedule.from_file(kwargs.get("schedule"))
+            if kwargs.get("schedule")
+            else None
+        ),
     )
     logging.debug(f"{name} - tornado.web.Application app: {app!r}")
 
+    # Apply the config file over the options above
+    config_store = ConfigStore(
+        kwargs.get("config"), kwargs.get("config_poll_interval") or 1
+    )
+    app.settings["config_store"] = config_store
+    if config_store.path:
+        app.apply_config(config_store.load())
+
     return app
 
 
+class MockHTTPServer(tornado.httpserver.HTTPServer):
+    """HTTPServer which tracks the requests served for each connection
+
+    Connection details are recorded in the `connection_stats' application
+    setting when it exists.
+    """
+
+    def handle_stream(self, stream, address):
+        # Refuse new connections during an outage window by resetting them
+        outage_schedule = self.request_callback.settings.get("outage_schedule")
+        if outage_schedule is not None and outage_schedule.check().refuse:
+            stream.socket.setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+            )
+            stream.close()
+            return
+
+        connection_stats = self.request_callback.settings.get("connection_stats")
+        if connection_stats is None:
+            return super().handle_stream(stream, address)
+
+        # Mirrors tornado.httpserver.HTTPServer.handle_stream with a copy of
+        # the connection parameters so each connection may be tuned alone
+        context = tornado.httpserver._HTTPRequestContext(
+            stream, address, self.protocol, self.trusted_downstream
+        )
+        conn = tornado.http1connection.HTTP1ServerConnection(
+            stream, copy.copy(self.conn_params), context
+        )
+        self._connections.add(conn)
+        connection_stats.connection_opened(stream, conn)
+        conn.start_serving(self)
+
+    def start_request(self, server_conn, request_conn):
+        connection_stats = self.request_callback.settings.get("connection_stats")
+        if connection_stats is not None:
+            connection_stats.request_started(server_conn.stream)
+        return super().start_request(server_conn, request_conn)
+
+    def on_close(self, server_conn):
+        connection_stats = self.request_callback.settings.get("connection_stats")
+        if connection_stats is not None:
+            connection_stats.connection_closed(server_conn.stream)
+        super().on_close(server_conn)
+
+
+# https://www.freedesktop.org/software/systemd/man/latest/sd_listen_fds.html
+SD_LISTEN_FDS_START = 3
+
+
+def listen_fds() -> list:
+    """Return the listening sockets passed by systemd socket activation
+
+    The LISTEN_* environment variables are removed so they are not passed on
+    to other processes.
+    """
+    name = "listen_fds"
+    try:
+        if int(os.environ.get("LISTEN_PID", 0)) != os.getpid():
+            return []
+        count = int(os.environ.get("LISTEN_FDS", 0))
+    except ValueError:
+        return []
+    finally:
+        for key in ["LISTEN_PID", "LISTEN_FDS", "LISTEN_FDNAMES"]:
+            os.environ.pop(key, None)
+
+    sockets = []
+    for fd in range(SD_LISTEN_FDS_START, SD_LISTEN_FDS_START + count):
+        sock = socket.socket(fileno=fd)
+        if sock.type != socket.SOCK_STREAM:
+            logging.warning(f"{name} - ignoring inherited socket fd {fd}: {sock!r}")
+            sock.detach()
+            continue
+        sock.setblocking(False)
+        sockets.append(sock)
+    logging.debug(f"{name} - sockets: {sockets!r}")
+    return sockets
+
+
+def handoff_sockets(sockets: list) -> int:
+    """Start a new copy of this server process with the listening sockets
+
+    The sockets are passed with the socket activation protocol and the new
+    process is told which process to stop once it is ready, the listening
+    sockets stay open throughout so no connection is refused. Returns the new
+    process id.
+
+    sockets <list>: Listening sockets to hand over.
+    """
+    fds = [sock.fileno() for sock in sockets]
+    argv = [sys.executable] + sys.orig_argv[1:]
+    pid = os.fork()
+    if pid == 0:
+        try:
+            # Move the sockets clear of the range they are moved into first
+            moved = [
+                fcntl.fcntl(fd, fcntl.F_DUPFD, SD_LISTEN_FDS_START + len(fds))
+                for fd in fds
+            ]
+            for index, fd in enumerate(moved):
+                os.dup2(fd, SD_LISTEN_FDS_START + index, inheritable=True)
+            environ = dict(os.environ)
+            environ["LISTEN_PID"] = str(os.getpid())
+            environ["LISTEN_FDS"] = str(len(fds))
+            environ["MOCK_ORIGIN_HANDOFF_PID"] = str(os.getppid())
+            os.execve(sys.executable, argv, environ)
+        finally:
+            os._exit(1)
+    return pid
+
+
+class SystemdNotifier:
+    """Send service state notifications to systemd
+
+    Notifications are only sent when the NOTIFY_SOCKET environment variable
+    is set, a watchdog keep-alive is sent at half the WATCHDOG_USEC interval.
+    https://www.freedesktop.org/software/systemd/man/latest/sd_notify.html
+    """
+
+    def __init__(self):
+        address = os.environ.get("NOTIFY_SOCKET") or None
+        if address is not None and address.startswith("@"):
+            # Abstract namespace socket
+            address = "\0" + address[1:]
+        self.address = address
+        self.socket = None
+        self.watchdog_interval = None
+        watchdog_pid = os.environ.get("WATCHDOG_PID")
+        if os.environ.get("WATCHDOG_USEC") and (
+            not watchdog_pid or int(watchdog_pid) == os.getpid()
+        ):
+            self.watchdog_interval = int(os.environ["WATCHDOG_USEC"]) / 1e6
+        self.periodic_callback = None
+
+    def notify(self, *states) -> bool:
+        """Send `KEY=value' states, return True when sent"""
+        name = "SystemdNotifier.notify"
+        if self.address is None:
+            return False
+        logging.debug(f"{name} - states: {states!r}")
+        if self.socket is None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            self.socket.sendto("\n".join(states).encode("utf-8"), self.address)
+        except OSError as err:
+            logging.warning(f"{name} - failed to notify {self.address!r}; {err}")
+            return False
+        return True
+
+    def start_watchdog(self):
+        """Send watchdog keep-alive notifications while the IOLoop runs"""
+        if self.address is None or not self.watchdog_interval:
+            return
+        # https://www.tornadoweb.org/en/stable/ioloop.html#tornado.ioloop.PeriodicCallback
+        self.periodic_callback = tornado.ioloop.PeriodicCallback(
+            lambda: self.notify("WATCHDOG=1"), self.watchdog_interval * 1000 / 2
+        )
+        self.periodic_callback.start()
+
+
 def main(*args, **kwargs):
     """Run a Tornado application server"""
     name = "main"
     logging.debug(f"{name} - *args: {args!r}")
     logging.debug(f"{name} - **kwargs: {kwargs!r}")
 
+    address = kwargs.get("address")
+    port = int(kwargs.get("port", 8888))
+
+    # Stateful features share memory when running multiple worker processes
+    # The shared memory and listening sockets must exist before forking
+    # https://www.tornadoweb.org/en/stable/process.html
+    processes = int(kwargs.get("processes") or 1)
+    if processes != 1:
+        kwargs["shared_state"] = SharedState(
+            slots=int(kwargs.get("shared_state_slots") or 262144)
+        )
+    notifier = SystemdNotifier()
+    # Use listening sockets from systemd socket activation or a restart
+    sockets = listen_fds()
+    if sockets:
+        listening = ", ".join(str(sock.getsockname()) for sock in sockets)
+    else:
+        sockets = tornado.netutil.bind_sockets(port, address=address)
+        listening = f"http://{address or '127.0.0.1'}:{port}/"
+    if processes != 1:
+        # Worker processes drain and exit when the read end of this pipe is
+        # closed, on a stop signal or when the parent process exits
+        stop_pipe = os.pipe()
+
+        def stop_workers(signum, frame):
+            for signum in [signal.SIGTERM, signal.SIGINT]:
+                signal.signal(signum, signal.SIG_IGN)
+            os.close(stop_pipe[1])
+
+        for signum in [signal.SIGTERM, signal.SIGINT]:
+            signal.signal(signum, stop_workers)
+        tornado.process.fork_processes(processes)
+        os.close(stop_pipe[1])
+        # The parent process waits on the workers, notifications are sent
+        # from the first worker process only, see NotifyAccess=all
+        if tornado.process.task_id():
+            notifier.address = None
+
     # tornado.web.Application settings
     # www.tornadoweb.org/en/stable/web.html#tornado.web.Application.settings
     app = make_app(**kwargs)
@@ -1014,13 +5143,89 @@ def main(*args, **kwargs):
     # tornado.httpserver.HTTPServer
     # https://www.tornadoweb.org/en/stable/httpserver.html#http-server
     # https://www.tornadoweb.org/en/stable/tcpserver.html
-    server = tornado.httpserver.HTTPServer(app)
-    address = kwargs.get("address")
-    port = int(kwargs.get("port", 8888))
-    server.listen(port, address=address)
-    try:
-        logging.info(f"Started listening at http://{address or '127.0.0.1'}:{port}/")
-        server.start(1)
-        tornado.ioloop.IOLoop.current().start()
-    except KeyboardInterrupt:
-        logging.info(f"Stopped listening at http://{address or '127.0.0.1'}:{port}/")
+    server = MockHTTPServer(
+        app,
+        idle_connection_timeout=kwargs.get("idle_connection_timeout"),
+        body_timeout=kwargs.get("body_timeout"),
+        max_body_size=kwargs.get("max_body_size"),
+    )
+    server.add_sockets(sockets)
+
+    # Reload the config file in the background when it changes
+    app.settings["config_store"].start(app)
+    # Trace memory allocations from start up
+    if kwargs.get("trace_memory"):
+        app.settings["memory_monitor"].start_tracing(frames=kwargs["trace_memory"])
+    # Sample the IOLoop lag and watch for callbacks blocking the IOLoop
+    app.settings["loop_monitor"].start()
+
+    io_loop = tornado.ioloop.IOLoop.current()
+    handoff_pid = os.environ.pop("MOCK_ORIGIN_HANDOFF_PID", None)
+    restart_pid = None
+
+    def started():
+        states = ["READY=1", f"STATUS=Listening at {listening}"]
+        if handoff_pid:
+            # Take over as the main process of the service before the
+            # process being restarted is stopped
+            states.append(f"MAINPID={os.getpid()}")
+        notifier.notify(*states)
+        notifier.start_watchdog()
+        if handoff_pid:
+            logging.info(f"Stopping the restarted process (pid {handoff_pid})")
+            os.kill(int(handoff_pid), signal.SIGTERM)
+
+    async def stop():
+        drain_control = app.settings["drain_control"]
+        if drain_control.draining:
+            # Stop waiting on a second signal
+            drain_control.force()
+            return
+        # The new process is the main process of the service after a restart
+        if restart_pid is None:
+            notifier.notify("STOPPING=1")
+        await drain_control.drain(server)
+        io_loop.stop()
+
+    def restart():
+        nonlocal restart_pid
+        if restart_pid is not None:
+            logging.warning(f"Already restarting (pid {restart_pid})")
+            return
+        restart_pid = handoff_sockets(sockets)
+        logging.info(f"Restarting with the listening sockets (pid {restart_pid})")
+        io_loop.call_later(1, check_restart)
+
+    def check_restart():
+        nonlocal restart_pid
+        pid, status = os.waitpid(restart_pid, os.WNOHANG)
+        if pid == 0:
+            io_loop.call_later(1, check_restart)
+            return
+        logging.error(
+            f"Restart failed, the new process exited (pid {restart_pid}, "
+            f"status {os.waitstatus_to_exitcode(status)})"
+        )
+        restart_pid = None
+
+    # SIGTERM and SIGINT drain and stop the server, SIGUSR2 restarts it
+    # without closing the listening sockets when running a single process
+    for signum in [signal.SIGTERM, signal.SIGINT]:
+        io_loop.asyncio_loop.add_signal_handler(
+            signum, lambda: io_loop.add_callback(stop)
+        )
+    if processes == 1:
+        io_loop.asyncio_loop.add_signal_handler(signal.SIGUSR2, restart)
+    else:
+
+        def stop_worker(fd, events):
+            io_loop.remove_handler(fd)
+            if not app.settings["drain_control"].draining:
+                io_loop.add_callback(stop)
+
+        io_loop.add_handler(stop_pipe[0], stop_worker, io_loop.READ)
+    io_loop.add_callback(started)
+
+    logging.info(f"Started listening at {listening} (pid {os.getpid()})")
+    io_loop.start()
+    logging.info(f"Stopped listening at {listening} (pid {os.getpid()})")
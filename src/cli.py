@@ -39,6 +39,21 @@ if __name__ == "__main__":
         default=8888,
         help="set the port to listen for HTTP traffic (default: 8888)",
     )
+    parser.add_argument(
+        "--processes",
+        metavar="<int>",
+        type=int,
+        default=1,
+        help="fork this many worker processes, 0 for one per CPU (default: 1)",
+    )
+    parser.add_argument(
+        "--shared-state-slots",
+        metavar="<int>",
+        type=int,
+        default=262144,
+        help="number of keyed slots shared by worker processes for rate limits\n"
+        "and scenarios (default: 262144)",
+    )
     parser.add_argument(
         "--name",
         metavar="<str>",
@@ -51,10 +66,338 @@ if __name__ == "__main__":
         action="store_true",
         help='enable the "proxied" application state (Default: False)',
     )
+    parser.add_argument(
+        "--server-timing",
+        action="store_true",
+        help="add a Server-Timing response header with the time taken by each\n"
+        "stage of handling the request (Default: False)",
+    )
+    parser.add_argument(
+        "--max-requests-per-connection",
+        metavar="<int>",
+        type=int,
+        help="close a connection after serving this many requests (default: None)",
+    )
+    parser.add_argument(
+        "--idle-connection-timeout",
+        metavar="<seconds>",
+        type=float,
+        help="close a keep-alive connection after this many idle seconds,\n"
+        "also bounds reading request headers (default: 3600)",
+    )
+    parser.add_argument(
+        "--body-timeout",
+        metavar="<seconds>",
+        type=float,
+        help="set the timeout for reading a request body (default: None)",
+    )
+    parser.add_argument(
+        "--max-body-size",
+        metavar="<bytes>",
+        type=int,
+        default=1073741824,
+        help="limit the size of a request body, bodies are streamed and not\n"
+        "held in memory (default: 1073741824)",
+    )
+    parser.add_argument(
+        "--max-body-echo",
+        metavar="<bytes>",
+        type=int,
+        default=10240,
+        help="limit the leading request body bytes echoed back (default: 10240)",
+    )
+    parser.add_argument(
+        "--expect-delay",
+        metavar="<seconds>",
+        type=float,
+        help="wait this long before answering `Expect: 100-continue'\n(default: None)",
+    )
+    parser.add_argument(
+        "--echo",
+        metavar="<spec>",
+        action="append",
+        help="stream the request body of uploads back as it is received,\n"
+        "may be repeated  method:<POST|PUT> | path:<prefix> (default: None)",
+    )
+    parser.add_argument(
+        "--sink",
+        metavar="<spec>",
+        action="append",
+        help="read and discard the request body of uploads, may be repeated\n"
+        "  method:<POST|PUT> | path:<prefix> (default: None)",
+    )
+    parser.add_argument(
+        "--sink-read-rate",
+        metavar="<bytes>",
+        type=float,
+        help="limit the body bytes read per second by each upload to a sink\n"
+        "(default: None)",
+    )
+    parser.add_argument(
+        "--object-store",
+        metavar="<prefix>",
+        help="serve stable cacheable objects below this path prefix from an\n"
+        "in-memory LRU object store, e.g. /objects/ (default: None)",
+    )
+    parser.add_argument(
+        "--object-store-budget",
+        metavar="<bytes>",
+        type=int,
+        default=67108864,
+        help="limit the object bytes kept in memory (default: 67108864)",
+    )
+    parser.add_argument(
+        "--object-store-spill",
+        metavar="<directory>",
+        help="spill evicted objects to a memory-mapped file in this directory\n"
+        "(default: None)",
+    )
+    parser.add_argument(
+        "--object-store-spill-size",
+        metavar="<bytes>",
+        type=int,
+        default=1073741824,
+        help="size of the memory-mapped spill file (default: 1073741824)",
+    )
+    parser.add_argument(
+        "--object-size",
+        metavar="<distribution>",
+        default="lognormal:9:1",
+        help="distribution of the object sizes in bytes\n(default: lognormal:9:1)",
+    )
+    parser.add_argument(
+        "--object-max-age",
+        metavar="<distribution>",
+        default="const:3600",
+        help="distribution of the object Cache-Control max-age in seconds\n"
+        "(default: const:3600)",
+    )
+    parser.add_argument(
+        "--object-age",
+        metavar="<distribution>",
+        help="distribution of the object Age header in seconds (default: None)",
+    )
+    parser.add_argument(
+        "--catalog",
+        metavar="<prefix>",
+        help="serve a synthetic catalog of objects by id below this path\n"
+        "prefix, e.g. /catalog/ (default: None)",
+    )
+    parser.add_argument(
+        "--catalog-objects",
+        metavar="<int>",
+        type=int,
+        default=100000000,
+        help="objects in the catalog (default: 100000000)",
+    )
+    parser.add_argument(
+        "--catalog-size",
+        metavar="<distribution>",
+        default="lognormal:9:1.5",
+        help="distribution of the catalog object sizes in bytes\n"
+        "(default: lognormal:9:1.5)",
+    )
+    parser.add_argument(
+        "--catalog-max-size",
+        metavar="<bytes>",
+        type=int,
+        default=104857600,
+        help="limit the catalog object sizes (default: 104857600)",
+    )
+    parser.add_argument(
+        "--catalog-types",
+        metavar="<type:weight,...>",
+        help="weighted content types of the catalog objects (default:\n"
+        "image/jpeg:5,text/html:2,application/javascript:2,video/mp4:1)",
+    )
+    parser.add_argument(
+        "--catalog-cacheable",
+        metavar="<float>",
+        type=float,
+        default=0.9,
+        help="fraction of the catalog objects which are cacheable (default: 0.9)",
+    )
+    parser.add_argument(
+        "--catalog-max-age",
+        metavar="<distribution>",
+        default="const:86400",
+        help="distribution of the cacheable catalog object max-age in seconds\n"
+        "(default: const:86400)",
+    )
+    parser.add_argument(
+        "--close-connection-ratio",
+        metavar="<float>",
+        type=float,
+        help="fraction of responses sent with `Connection: close' (default: None)",
+    )
+    parser.add_argument(
+        "--drain-timeout",
+        metavar="<seconds>",
+        type=float,
+        default=25,
+        help="on SIGTERM stop accepting connections and wait this long for\n"
+        "requests in-flight to finish before closing them (default: 25)",
+    )
+    parser.add_argument(
+        "--ready-max-loop-lag",
+        metavar="<seconds>",
+        type=float,
+        help="report not ready at /_/ready over this IOLoop lag (default: None)",
+    )
+    parser.add_argument(
+        "--ready-max-inflight",
+        metavar="<int>",
+        type=int,
+        help="report not ready at /_/ready over this many requests in-flight\n"
+        "(default: None)",
+    )
+    parser.add_argument(
+        "--ready-max-rss",
+        metavar="<bytes>",
+        type=int,
+        help="report not ready at /_/ready over this resident memory size\n"
+        "(default: None)",
+    )
+    parser.add_argument(
+        "--slow-callback-threshold",
+        metavar="<seconds>",
+        type=float,
+        default=0.1,
+        help="log the stage and stack of callbacks blocking the IOLoop longer\n"
+        "than this, 0 to disable (default: 0.1)",
+    )
+    parser.add_argument(
+        "--max-inflight-requests",
+        metavar="<int>",
+        type=int,
+        help="limit the requests handled at the same time (default: None)",
+    )
+    parser.add_argument(
+        "--max-inflight-body-bytes",
+        metavar="<int>",
+        type=int,
+        help="limit the request body bytes held at the same time (default: None)",
+    )
+    parser.add_argument(
+        "--max-queue",
+        metavar="<int>",
+        type=int,
+        default=0,
+        help="limit the requests waiting for admission,\n"
+        "others are shed with a 503 response (default: 0)",
+    )
+    parser.add_argument(
+        "--queue-timeout",
+        metavar="<seconds>",
+        type=float,
+        help="shed requests waiting longer than this for admission (default: None)",
+    )
+    parser.add_argument(
+        "--retry-after",
+        metavar="<seconds>",
+        type=int,
+        default=1,
+        help="set the Retry-After response header value for shed requests\n"
+        "(default: 1)",
+    )
+    parser.add_argument(
+        "--worker-pool",
+        metavar="<spec>",
+        action="append",
+        help="model an origin with a pool of virtual workers, may be repeated\n"
+        "  workers:<int>,service:<distribution>[,host:<str>|path:<prefix>]\n"
+        "  e.g. workers:8,service:exp:0.05 (default: None)",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        metavar="<rate>[:<burst>]",
+        help="limit requests per second for each rate limit key,\n"
+        "others receive a 429 response (default: None)",
+    )
+    parser.add_argument(
+        "--rate-limit-key",
+        metavar="<key>",
+        default="addr",
+        help="rate limit by client address, Host or a request header value\n"
+        "  addr | host | header:<name> (default: addr)",
+    )
+    parser.add_argument(
+        "--rate-limit-max-keys",
+        metavar="<int>",
+        type=int,
+        default=100000,
+        help="limit the number of rate limit keys tracked (default: 100000)",
+    )
+    parser.add_argument(
+        "--scenario-ttl",
+        metavar="<seconds>",
+        type=float,
+        default=300,
+        help="forget the scenario state for a key unused this long (default: 300)",
+    )
+    parser.add_argument(
+        "--scenario-max-keys",
+        metavar="<int>",
+        type=int,
+        default=100000,
+        help="limit the number of scenario keys tracked (default: 100000)",
+    )
+    parser.add_argument(
+        "--config",
+        metavar="<file>",
+        help="apply defaults, limits, rules, a schedule and worker pools from\n"
+        "a JSON config file which is reloaded when changed (default: None)",
+    )
+    parser.add_argument(
+        "--config-poll-interval",
+        metavar="<seconds>",
+        type=float,
+        default=1,
+        help="check the config file for changes this often (default: 1)",
+    )
+    parser.add_argument(
+        "--schedule",
+        metavar="<file>",
+        help="apply outage windows from a JSON schedule file (default: None)",
+    )
+    parser.add_argument(
+        "--max-content-length",
+        metavar="<int>",
+        type=int,
+        default=10240,
+        help="limit the length of generated ?content (default: 10240)",
+    )
+    parser.add_argument(
+        "--admin-token",
+        metavar="<str>",
+        help="enable the /_/admin endpoint with this bearer token, also read\n"
+        "from MOCK_ORIGIN_ADMIN_TOKEN (default: None)",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        metavar="<frames>",
+        type=int,
+        help="trace memory allocations with tracemalloc from start up keeping\n"
+        "this many frames, this slows the server (default: None)",
+    )
+    parser.add_argument(
+        "--memory-sample-rate",
+        metavar="<float>",
+        type=float,
+        default=0.01,
+        help="fraction of requests sampled for their peak memory while tracing\n"
+        "memory allocations (default: 0.01)",
+    )
+    parser.add_argument(
+        "--profiling",
+        action="store_true",
+        help="enable the /_/profile endpoint, requires --admin-token (Default: False)",
+    )
     parser.add_argument(
         "--systemd",
         action="store_true",
-        help='enable the "systemd" application state (Default: False)',
+        help="log in the format used under systemd, notifications and socket\n"
+        "activation are used whenever systemd provides them (Default: False)",
     )
     parser.add_argument(
         "--version",
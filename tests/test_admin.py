@@ -0,0 +1,119 @@
+import json
+import time
+
+import pytest
+import tornado
+
+from src.app import RuntimeControl, RuntimeSettings, SharedState, make_app
+
+
+def test_runtime_settings_immutable():
+    runtime_settings = RuntimeSettings(delay=1)
+    with pytest.raises(AttributeError):
+        runtime_settings.delay = 2
+    assert runtime_settings.replace(status=503).as_dict()["delay"] == 1
+    with pytest.raises(ValueError):
+        runtime_settings.replace(unknown=1)
+    for changes in [
+        {"delay": "abc"},
+        {"delay": -1},
+        {"status": 1.5},
+        {"status": 99},
+        {"error_rate": 2},
+        {"error_status": True},
+        {"max_content_length": -1},
+    ]:
+        with pytest.raises(ValueError):
+            runtime_settings.replace(**changes)
+
+
+def test_runtime_control_shared_across_workers():
+    shared_state = SharedState(slots=64)
+    worker_one = RuntimeControl(shared_state)
+    worker_two = RuntimeControl(shared_state)
+    worker_one.update(status=503, error_rate=0.5)
+    assert worker_two.snapshot().status == 503
+    assert worker_two.snapshot().error_rate == 0.5
+    worker_two.reset()
+    assert worker_one.snapshot().status is None
+
+
+def test_runtime_control_not_evicted():
+    shared_state = SharedState(slots=8)
+    RuntimeControl(shared_state).update(status=503)
+    # Fill the keyed value slots with other keys
+    for index in range(32):
+        shared_state.update(f"key-{index}", lambda values: (1, time.monotonic()))
+    assert RuntimeControl(shared_state).snapshot().status == 503
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestAdminHandler(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, admin_token="secret")
+
+    def admin(self, method="GET", body=None, token="secret"):
+        return self.fetch(
+            "/_/admin",
+            method=method,
+            body=None if body is None else json.dumps(body),
+            headers={"Authorization": f"Bearer {token}"},
+            allow_nonstandard_methods=True,
+        )
+
+    def test_admin_unauthorized(self):
+        response = self.admin(token="wrong")
+        assert response.code == 401
+        assert response.headers.get("WWW-Authenticate") == "Bearer"
+
+    def test_admin_change_status(self):
+        response = self.admin("POST", {"status": 503})
+        assert response.code == 200
+        assert json.loads(response.body)["runtime"]["status"] == 503
+
+        # Check the runtime setting is applied
+        response = self.fetch("/test/with.ext", method="GET")
+        assert response.code == 503
+        assert response.headers.get("X-Runtime-Settings") == "status=503"
+
+        # Check request options are used ahead of runtime settings
+        response = self.fetch("/test/with.ext?status=201", method="GET")
+        assert response.code == 201
+
+        # Check the runtime settings are cleared
+        response = self.admin("DELETE")
+        assert json.loads(response.body)["runtime"]["status"] is None
+        response = self.fetch("/test/with.ext", method="GET")
+        assert response.code == 200
+
+    def test_admin_change_error_rate_and_content_length(self):
+        self.admin("POST", {"error_rate": 1, "error_status": 502})
+        response = self.fetch("/test/with.ext", method="GET")
+        assert response.code == 502
+
+        self.admin("POST", {"error_rate": None, "max_content_length": 16})
+        response = self.fetch("/test/with.ext?content=1024", method="GET")
+        assert response.code == 200
+        assert len(response.body) == 16
+
+    def test_admin_bad_request(self):
+        response = self.admin("POST", {"unknown": 1})
+        assert response.code == 400
+
+    def test_admin_bad_values(self):
+        for body in [{"delay": "abc"}, {"error_rate": "x"}, {"error_rate": 1.5}, []]:
+            response = self.admin("POST", body)
+            assert response.code == 400
+        # Check requests are still answered
+        response = self.fetch("/test/with.ext", method="GET")
+        assert response.code == 200
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestAdminHandlerDisabled(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False)
+
+    def test_admin_disabled(self):
+        response = self.fetch("/_/admin", headers={"Authorization": "Bearer "})
+        assert response.code == 404
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import tornado
+
+from src.app import AdmissionControl, make_app
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerAdmissionShed(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, max_inflight_requests=1)
+
+    def test_autoreload_disabled(self):
+        # Tests are not restarted when a source file changes
+        assert self._app.settings["debug"] is True
+        assert self._app.settings["autoreload"] is False
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_GET_over_limit(self):
+        # Make two HTTP requests at the same time
+        responses = await asyncio.gather(
+            *[
+                self.http_client.fetch(
+                    self.get_url("/test/with.ext?delay=0.25"), raise_error=False
+                )
+                for _ in range(2)
+            ]
+        )
+        codes = sorted(response.code for response in responses)
+        assert codes == [200, 503]
+        shed = [response for response in responses if response.code == 503][0]
+        assert shed.headers.get("Retry-After") == "1"
+        assert shed.headers.get("X-Shed-Reason") == "queue full"
+
+        # Check the shed requests are reported
+        response = await self.http_client.fetch(self.get_url("/_/stats"))
+        stats = json.loads(response.body)
+        assert stats["admission"]["shed"]["queue_full"] == 1
+        assert stats["admission"]["inflight"] == 0
+        assert stats["admission"]["queue_depth"] == 0
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerAdmissionQueue(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(
+            debug=True,
+            autoreload=False,
+            max_inflight_requests=1,
+            max_queue=2,
+            queue_timeout=0.35,
+        )
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_GET_queued(self):
+        # Make three HTTP requests at the same time
+        responses = await asyncio.gather(
+            *[
+                self.http_client.fetch(
+                    self.get_url("/test/with.ext?delay=0.25"), raise_error=False
+                )
+                for _ in range(3)
+            ]
+        )
+        # One is handled, one waits to be handled and one waits too long
+        codes = sorted(response.code for response in responses)
+        assert codes == [200, 200, 503]
+        shed = [response for response in responses if response.code == 503][0]
+        assert shed.headers.get("X-Shed-Reason") == "queue timeout"
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_POST_chunked_body_counted(self):
+        inflight_bytes = []
+
+        async def body_producer(write):
+            await write(b"x" * 1000)
+            await asyncio.sleep(0.05)
+            response = await self.http_client.fetch(self.get_url("/_/stats"))
+            stats = json.loads(response.body)
+            inflight_bytes.append(stats["admission"]["inflight_bytes"])
+            await write(b"x" * 1000)
+
+        # Make the HTTP request with a chunked request body
+        response = await self.http_client.fetch(
+            self.get_url("/test/with.ext?quiet"),
+            method="POST",
+            body_producer=body_producer,
+        )
+        assert response.code == 200
+        # Check the body is counted as it is received and released after
+        assert inflight_bytes == [1000]
+        response = await self.http_client.fetch(self.get_url("/_/stats"))
+        assert json.loads(response.body)["admission"]["inflight_bytes"] == 0
+
+
+def test_admission_cancelled_while_queued():
+    async def cancel_queued():
+        admission_control = AdmissionControl(max_inflight=1, max_queue=1)
+        assert await admission_control.acquire() is None
+        waiting = asyncio.ensure_future(admission_control.acquire())
+        await asyncio.sleep(0)
+        assert admission_control.queue_depth == 1
+        # A request cancelled while queued leaves the queue
+        waiting.cancel()
+        await asyncio.sleep(0)
+        assert admission_control.queue_depth == 0
+        admission_control.release()
+        assert admission_control.inflight == 0
+
+    asyncio.run(cancel_queued())
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import pytest
+import tornado
+
+from src.app import make_app, parse_distribution
+
+
+def test_parse_distribution():
+    assert parse_distribution("const:0.5")() == 0.5
+    assert 1 <= parse_distribution("uniform:1:2")() <= 2
+    assert parse_distribution("exp:0")() == 0
+    assert parse_distribution("normal:-5:0.1")() == 0
+    with pytest.raises(ValueError):
+        parse_distribution("unknown:1")
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerWorkerPool(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(
+            debug=True,
+            autoreload=False,
+            worker_pool=[
+                "workers:1,service:const:0.2,path:/slow/",
+                "workers:4,service:const:0",
+            ],
+        )
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_GET_queues_for_worker(self):
+        # Make two HTTP requests at the same time for a single worker
+        responses = await asyncio.gather(
+            *[self.http_client.fetch(self.get_url("/slow/with.ext")) for _ in range(2)]
+        )
+        waits = sorted(
+            float(response.headers.get("X-Worker-Pool").split(";")[0].split("=")[1])
+            for response in responses
+        )
+        # The second request waits for the first service time to pass
+        assert waits[0] < 0.1
+        assert waits[1] >= 0.15
+
+    def test_HTTP_method_GET_default_pool(self):
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext",
+            method="GET",
+        )
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.headers.get("X-Worker-Pool").endswith("service=0.000000")
+
+        # Check the worker pools are reported
+        response = self.fetch("/_/stats", method="GET")
+        stats = json.loads(response.body)
+        assert stats["capacity"]["default"]["workers"] == 4
+        assert stats["capacity"]["default"]["served"] == 1
+        assert stats["capacity"]["path:/slow/"]["workers"] == 1
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+import tornado
+
+from src.app import Catalog, GeneratedContent, make_app
+
+
+def test_catalog_describe():
+    catalog = Catalog(objects=1000, types="text/html:1,image/png:1", cacheable=0.5)
+    content, headers = catalog.describe(7)
+    again, same_headers = Catalog(
+        objects=1000, types="text/html:1,image/png:1", cacheable=0.5
+    ).describe(7)
+    assert isinstance(content, GeneratedContent)
+    assert content.read() == again.read()
+    assert headers == same_headers
+    assert headers["Content-Type"] in ["text/html", "image/png"]
+    # The catalog has both cacheable and uncacheable objects
+    cache_controls = {catalog.describe(i)[1]["Cache-Control"] for i in range(50)}
+    assert "private, no-store" in cache_controls
+    assert "public, max-age=86400" in cache_controls
+    assert catalog.describe(1000) is None
+    with pytest.raises(ValueError):
+        Catalog(types="text/html")
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestCatalogHandler(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(
+            debug=True,
+            autoreload=False,
+            catalog="/catalog/",
+            catalog_objects=1000,
+            catalog_size="const:100000",
+        )
+
+    def test_HTTP_method_GET_catalog(self):
+        # Make the HTTP requests
+        first = self.fetch("/catalog/1", method="GET")
+        again = self.fetch("/catalog/1", method="GET")
+        # Check response code for the expected value
+        assert first.code == 200
+        assert len(first.body) == 100000
+        assert first.body == again.body
+        assert first.headers.get("Etag") == again.headers.get("Etag")
+        assert first.body != self.fetch("/catalog/2", method="GET").body
+
+    def test_HTTP_method_HEAD_catalog(self):
+        # Make the HTTP request
+        response = self.fetch("/catalog/1", method="HEAD")
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.headers.get("Content-Length") == "100000"
+
+    def test_HTTP_method_GET_catalog_range(self):
+        whole = self.fetch("/catalog/1", method="GET").body
+        # Make the HTTP request
+        response = self.fetch(
+            "/catalog/1", method="GET", headers={"Range": "bytes=65500-65599"}
+        )
+        # Check response code for the expected value
+        assert response.code == 206
+        assert response.body == whole[65500:65600]
+
+    def test_HTTP_method_GET_catalog_status(self):
+        # Make the HTTP request
+        response = self.fetch("/catalog/1?status=503", method="GET")
+        # Check response code for the expected value
+        assert response.code == 503
+        assert response.body == b""
+
+    def test_HTTP_method_GET_catalog_not_found(self):
+        # Make the HTTP request
+        response = self.fetch("/catalog/1000", method="GET")
+        # Check response code for the expected value
+        assert response.code == 404
+
+        # Check the lookups are reported
+        response = self.fetch("/_/stats", method="GET")
+        stats = json.loads(response.body)
+        assert stats["catalog"]["totals"] == {"lookups": 1, "not_found": 1}
+
+    def test_HTTP_method_GET_catalog_server_timing(self):
+        # Make the HTTP request
+        response = self.fetch("/catalog/1?server_timing", method="GET")
+        # Check the stage timings are reported ahead of the streamed body
+        assert response.code == 200
+        assert len(response.body) == 100000
+        stages = [
+            timing.split(";")[0]
+            for timing in response.headers.get("Server-Timing").split(", ")
+        ]
+        assert stages[-2:] == ["render", "total"]
@@ -0,0 +1,92 @@
+import json
+
+import tornado
+
+from src.app import make_app
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerConditional(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False)
+
+    def test_HTTP_method_GET_static_if_none_match(self):
+        # Make the HTTP request
+        response = self.fetch("/test/football.svg", method="GET")
+        etag = response.headers.get("Etag")
+        assert etag.startswith('"s-') and etag.endswith('-gzip"')
+        assert response.headers.get("Last-Modified") is not None
+
+        # Revalidate with the ETag
+        response = self.fetch(
+            "/test/football.svg?server_timing",
+            method="GET",
+            headers={"If-None-Match": f"W/{etag}"},
+        )
+        assert response.code == 304
+        assert response.body == b""
+        assert response.headers.get("Etag") == etag
+        # Answered before the response is rendered or compressed
+        assert "compress" not in response.headers.get("Server-Timing")
+
+        # Check the revalidations are reported
+        response = self.fetch("/_/stats", method="GET")
+        stats = json.loads(response.body)
+        assert stats["revalidation"]["totals"] == {
+            "validated": 2,
+            "conditional": 1,
+            "not_modified": 1,
+        }
+
+    def test_HTTP_method_GET_static_if_modified_since(self):
+        response = self.fetch("/test/ping", method="GET")
+        last_modified = response.headers.get("Last-Modified")
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/ping", method="GET", headers={"If-Modified-Since": last_modified}
+        )
+        assert response.code == 304
+        response = self.fetch(
+            "/test/ping",
+            method="GET",
+            headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"},
+        )
+        assert response.code == 200
+        assert response.body == b"pong\n"
+
+    def test_HTTP_method_GET_static_json(self):
+        text = self.fetch("/test/hello_world", method="GET")
+        as_json = self.fetch("/test/hello_world.json", method="GET")
+        assert text.headers.get("Etag") != as_json.headers.get("Etag")
+
+    def test_HTTP_method_GET_generated_if_none_match(self):
+        response = self.fetch("/test/with.ext?content=1000&seed=1", method="GET")
+        etag = response.headers.get("Etag")
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext?content=1000&seed=1",
+            method="GET",
+            headers={"If-None-Match": etag},
+        )
+        assert response.code == 304
+        response = self.fetch(
+            "/test/with.ext?content=1000&seed=2",
+            method="GET",
+            headers={"If-None-Match": etag},
+        )
+        assert response.code == 200
+
+    def test_HTTP_method_GET_dynamic(self):
+        # Make the HTTP request
+        response = self.fetch("/test/with.ext", method="GET")
+        # Responses describing the request are not validated before rendering
+        assert response.code == 200
+        assert response.headers.get("Last-Modified") is None
+        assert response.headers.get("Etag") is not None
+
+    def test_HTTP_method_GET_invalid_status(self):
+        for status in ["abc", "99", "600"]:
+            # Make the HTTP request
+            response = self.fetch(f"/test/with.ext?status={status}", method="GET")
+            # Check response code for the expected value
+            assert response.code == 400
@@ -0,0 +1,205 @@
+import json
+import os
+import tempfile
+
+import pytest
+import tornado
+
+from src.app import ConfigSnapshot, make_app
+
+
+def test_config_snapshot_compiled():
+    snapshot = ConfigSnapshot(
+        json.dumps(
+            {
+                "defaults": {"delay": 0.1},
+                "limits": {"max_inflight": 4},
+                "rules": [{"path": "/api/", "method": "post", "set": "status:503"}],
+                "worker_pools": ["workers:2,service:const:0"],
+            }
+        )
+    )
+    assert snapshot.defaults.delay == 0.1
+    assert snapshot.limits["max_inflight"] == 4
+    assert snapshot.rules[0].name == "rule-0"
+    assert snapshot.rules[0].methods == {"POST"}
+    assert snapshot.capacity_model is not None
+    assert snapshot.schedule is None
+    with pytest.raises(AttributeError):
+        snapshot.rules = ()
+
+
+def test_config_snapshot_invalid():
+    with pytest.raises(ValueError):
+        ConfigSnapshot('{"unknown": {}}')
+    with pytest.raises(ValueError):
+        ConfigSnapshot('{"limits": {"unknown": 1}}')
+    with pytest.raises(ValueError):
+        ConfigSnapshot("{not json")
+    for rule in [
+        {"path_regex": "("},
+        {"set": {"status": 503}},
+        {"host": 1},
+        {"method": {"GET": 1}},
+    ]:
+        with pytest.raises(ValueError):
+            ConfigSnapshot(json.dumps({"rules": [rule]}))
+    with pytest.raises(ValueError):
+        ConfigSnapshot("[]")
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerWithConfig(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, config=self.config_file)
+
+    def write_config(self, config):
+        with open(self.config_file, "w") as f:
+            json.dump(config, f)
+        # Make sure the file signature changes within the mtime resolution
+        os.utime(self.config_file, ns=(0, os.stat(self.config_file).st_mtime_ns + 1))
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(
+                {
+                    "defaults": {"delay": 0},
+                    "rules": [
+                        {"name": "down", "path": "/down/", "set": "status:503"},
+                        {"name": "gone", "path_regex": r"\.old$", "set": "status:410"},
+                    ],
+                },
+                f,
+            )
+        self.config_file = f.name
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        os.remove(self.config_file)
+
+    def test_HTTP_method_GET_matching_rule(self):
+        # Make the HTTP request
+        response = self.fetch("/down/with.ext", method="GET")
+        # Check response code for the expected value
+        assert response.code == 503
+        assert response.headers.get("X-Config-Rule") == "down"
+
+        response = self.fetch("/test/with.old", method="GET")
+        assert response.code == 410
+        assert response.headers.get("X-Config-Rule") == "gone"
+
+    def test_HTTP_method_GET_no_matching_rule(self):
+        # Make the HTTP request
+        response = self.fetch("/test/with.ext", method="GET")
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.headers.get("X-Config-Rule") is None
+        assert response.headers.get("X-Runtime-Settings") == "delay=0"
+
+    @tornado.testing.gen_test
+    async def test_config_reloaded_when_changed(self):
+        config_store = self._app.settings["config_store"]
+        self.write_config(
+            {"rules": [{"name": "all", "path": "/", "set": "status:418"}]}
+        )
+        await config_store.poll(self._app)
+        assert config_store.generation == 2
+
+        response = await self.http_client.fetch(
+            self.get_url("/test/with.ext"), raise_error=False
+        )
+        assert response.code == 418
+        assert response.headers.get("X-Config-Rule") == "all"
+
+        # An unchanged file is not reloaded
+        await config_store.poll(self._app)
+        assert config_store.generation == 2
+
+    @tornado.testing.gen_test
+    async def test_config_invalid_keeps_current(self):
+        config_store = self._app.settings["config_store"]
+        with open(self.config_file, "w") as f:
+            f.write("{not json")
+        os.utime(self.config_file, ns=(0, 1))
+        await config_store.poll(self._app)
+        assert config_store.generation == 1
+
+        response = await self.http_client.fetch(
+            self.get_url("/down/with.ext"), raise_error=False
+        )
+        assert response.code == 503
+
+        # Check the failed reload is reported
+        response = await self.http_client.fetch(self.get_url("/_/stats"))
+        stats = json.loads(response.body)
+        assert stats["config"]["totals"] == {"reloads": 1, "errors": 1}
+        assert stats["config"]["last_error"].startswith("JSONDecodeError")
+
+    @tornado.testing.gen_test
+    async def test_config_sections_removed_and_unchanged(self):
+        config_store = self._app.settings["config_store"]
+        baseline = self._app.settings["capacity_model"]
+        config = {
+            "limits": {"max_inflight": 4},
+            "worker_pools": ["workers:2,service:const:0"],
+        }
+        self.write_config(config)
+        await config_store.poll(self._app)
+        capacity_model = self._app.settings["capacity_model"]
+        assert capacity_model is not baseline
+        assert self._app.settings["admission_control"].max_inflight == 4
+
+        # An unchanged section keeps its state
+        config["defaults"] = {"delay": 0}
+        self.write_config(config)
+        await config_store.poll(self._app)
+        assert config_store.generation == 3
+        assert self._app.settings["capacity_model"] is capacity_model
+
+        # Removed sections and limits return to the command line options
+        self.write_config({})
+        await config_store.poll(self._app)
+        assert self._app.settings["capacity_model"] is baseline
+        assert self._app.settings["admission_control"].max_inflight is None
+
+    @tornado.testing.gen_test
+    async def test_config_invalid_rule_counted(self):
+        config_store = self._app.settings["config_store"]
+        self.write_config({"rules": [{"path_regex": "(", "set": "status:500"}]})
+        await config_store.poll(self._app)
+        assert config_store.generation == 1
+        assert config_store.counters["errors"] == 1
+        assert config_store.last_error.startswith("ValueError")
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestAdminReloadInvalidConfig(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(
+            debug=True, autoreload=False, config=self.config_file, admin_token="t"
+        )
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"rules": []}, f)
+        self.config_file = f.name
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        os.remove(self.config_file)
+
+    def test_admin_reload_invalid_config(self):
+        with open(self.config_file, "w") as f:
+            json.dump({"rules": [{"set": {"status": 503}}]}, f)
+        # Make the HTTP request
+        response = self.fetch(
+            "/_/admin",
+            method="POST",
+            body=json.dumps({"reload": True}),
+            headers={"Authorization": "Bearer t"},
+        )
+        # Check response code for the expected value
+        assert response.code == 400
+        assert self._app.settings["config_store"].counters["errors"] == 1
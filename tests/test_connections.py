@@ -0,0 +1,113 @@
+import json
+
+import tornado
+import tornado.tcpclient
+
+from src.app import MockHTTPServer, make_app
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerConnectionControls(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False)
+
+    def get_http_server(self):
+        return MockHTTPServer(self._app, **self.get_httpserver_options())
+
+    async def keep_alive_requests(self, path, count):
+        """Send `count' requests over a single connection, return the headers"""
+        stream = await tornado.tcpclient.TCPClient().connect(
+            "127.0.0.1", self.get_http_port()
+        )
+        responses = []
+        for _ in range(count):
+            await stream.write(
+                f"GET {path} HTTP/1.1\r\nHost: test\r\n\r\n".encode("utf-8")
+            )
+            headers = await stream.read_until(b"\r\n\r\n")
+            headers = tornado.httputil.HTTPHeaders.parse(
+                headers.decode("utf-8").split("\r\n", 1)[1]
+            )
+            await stream.read_bytes(int(headers.get("Content-Length")))
+            responses.append(headers)
+            if headers.get("Connection") == "close":
+                break
+        stream.close()
+        return responses
+
+    def test_HTTP_method_GET_with_close(self):
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext?close",
+            method="GET",
+        )
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.headers.get("Connection") == "close"
+
+    def test_HTTP_method_GET_with_connection_headers(self):
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext",
+            method="GET",
+        )
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.headers.get("X-Connection-Requests") == "1"
+        assert float(response.headers.get("X-Connection-Age")) >= 0
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_GET_with_max_requests(self):
+        responses = await self.keep_alive_requests("/test/with.ext?max_requests=3", 5)
+        assert len(responses) == 3
+        assert [r.get("X-Connection-Requests") for r in responses] == ["1", "2", "3"]
+        assert responses[-1].get("Connection") == "close"
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_GET_with_close_ratio(self):
+        responses = await self.keep_alive_requests("/test/with.ext?close_ratio=1", 2)
+        assert len(responses) == 1
+        assert responses[0].get("Connection") == "close"
+
+    def test_HTTP_method_GET_stats(self):
+        self.fetch("/test/with.ext?close", method="GET")
+        # Make the HTTP request
+        response = self.fetch(
+            "/_/stats",
+            method="GET",
+        )
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.headers.get("Content-Type") == "text/json"
+        stats = json.loads(response.body)
+        assert stats["connections"]["totals"]["requests"] >= 2
+        assert stats["connections"]["totals"]["closed"] >= 1
+        assert stats["connections"]["requests_per_connection"]["max"] >= 1
+        # Check the sections of this worker process only are labelled
+        assert isinstance(stats["pid"], int)
+        assert {"admission", "connections", "drain"} <= set(stats["per_worker"])
+
+    def test_HTTP_method_GET_with_invalid_options(self):
+        for query in [
+            "idle_timeout=abc",
+            "body_timeout=-1",
+            "max_requests=abc",
+            "max_requests=0",
+            "close_ratio=abc",
+            "close_ratio=2",
+        ]:
+            # Make the HTTP request
+            response = self.fetch(f"/test/with.ext?{query}", method="GET")
+            # Check response code for the expected value
+            assert response.code == 400
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_GET_with_close_closes_connection(self):
+        stream = await tornado.tcpclient.TCPClient().connect(
+            "127.0.0.1", self.get_http_port()
+        )
+        await stream.write(b"GET /test/with.ext?close HTTP/1.1\r\nHost: test\r\n\r\n")
+        # The server closes the connection after the response
+        response = await stream.read_until_close()
+        assert b"Connection: close" in response
+        assert response.startswith(b"HTTP/1.1 200")
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+import tornado
+import tornado.httpclient
+
+from src.app import MockHTTPServer, make_app
+
+CLI = os.path.join(os.path.dirname(__file__), "..", "src", "cli.py")
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerDrain(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, drain_timeout=0.5)
+
+    def get_http_server(self):
+        return MockHTTPServer(self._app, **self.get_httpserver_options())
+
+    @tornado.testing.gen_test
+    async def test_drain_waits_for_inflight(self):
+        drain_control = self._app.settings["drain_control"]
+        request = asyncio.ensure_future(
+            self.http_client.fetch(self.get_url("/test/with.ext?delay=0.2"))
+        )
+        while drain_control.inflight == 0:
+            await asyncio.sleep(0.01)
+
+        counts = await drain_control.drain(self.http_server)
+        assert counts["inflight"] == 1
+        assert counts["finished"] == 1
+        assert counts["forced"] == 0
+        response = await request
+        assert response.code == 200
+        assert response.headers.get("Connection") == "close"
+        assert drain_control.stats()["ready"] is False
+
+    @tornado.testing.gen_test
+    async def test_drain_deadline(self):
+        drain_control = self._app.settings["drain_control"]
+        request = asyncio.ensure_future(
+            self.http_client.fetch(self.get_url("/test/with.ext?delay=2"))
+        )
+        while drain_control.inflight == 0:
+            await asyncio.sleep(0.01)
+
+        began = time.monotonic()
+        counts = await drain_control.drain(self.http_server)
+        assert time.monotonic() - began < 1
+        assert counts["finished"] == 0
+        assert counts["forced"] == 1
+        # The connection is closed without a response
+        with pytest.raises(tornado.httpclient.HTTPClientError):
+            await request
+
+    def test_HTTP_method_GET_stats(self):
+        # Make the HTTP request
+        response = self.fetch("/_/stats", method="GET")
+        # Check response code for the expected value
+        assert response.code == 200
+        stats = json.loads(response.body)
+        assert stats["drain"] == {
+            "ready": True,
+            "draining": False,
+            "inflight": 0,
+            "timeout": 0.5,
+        }
+
+
+def test_sigterm_drains_worker_processes():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, CLI, "--address=127.0.0.1", f"--port={port}"]
+        + ["--processes=2", "--drain-timeout=5"]
+    )
+    try:
+        url = f"http://127.0.0.1:{port}/test/with.ext"
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=5)
+                break
+            except OSError:
+                assert time.monotonic() < deadline
+                time.sleep(0.1)
+
+        # A slow request finishes after the server is stopped
+        responses = []
+        thread = threading.Thread(
+            target=lambda: responses.append(
+                urllib.request.urlopen(url + "?delay=1", timeout=5)
+            )
+        )
+        thread.start()
+        time.sleep(0.3)
+        process.send_signal(signal.SIGTERM)
+        thread.join()
+        assert responses[0].status == 200
+        assert process.wait(5) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
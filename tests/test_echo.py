@@ -0,0 +1,64 @@
+import json
+
+import tornado
+import tornado.tcpclient
+
+from src.app import make_app
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerEcho(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, echo=["method:PUT"])
+
+    def test_HTTP_method_POST_echo(self):
+        body = bytes(range(256)) * 4096
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext?echo",
+            method="POST",
+            body=body,
+            headers={"Content-Type": "application/x-test", "Accept-Encoding": ""},
+        )
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.headers.get("Content-Type") == "application/x-test"
+        assert response.body == body
+
+    def test_HTTP_method_PUT_echo_gzip(self):
+        body = b"echo " * 100000
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext",
+            method="PUT",
+            body=body,
+            headers={"Accept-Encoding": "gzip"},
+            decompress_response=False,
+        )
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.headers.get("Content-Encoding") == "gzip"
+        assert len(response.body) < len(body)
+        assert tornado.util.GzipDecompressor().decompress(response.body) == body
+
+        # Check the echoed uploads are reported
+        response = self.fetch("/_/stats", method="GET")
+        stats = json.loads(response.body)
+        assert stats["echo"]["totals"] == {"requests": 1, "bytes": 500000}
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_POST_echo_full_duplex(self):
+        stream = await tornado.tcpclient.TCPClient().connect(
+            "127.0.0.1", self.get_http_port()
+        )
+        await stream.write(
+            b"POST /test/with.ext?echo HTTP/1.1\r\nHost: test\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n5\r\nfirst\r\n"
+        )
+        # The first chunk is echoed before the rest of the body is sent
+        headers = await stream.read_until(b"\r\n\r\n")
+        assert b"Transfer-Encoding: chunked" in headers
+        assert await stream.read_until(b"first\r\n") == b"5\r\nfirst\r\n"
+        await stream.write(b"6\r\nsecond\r\n0\r\n\r\n")
+        assert await stream.read_until(b"0\r\n\r\n") == b"6\r\nsecond\r\n0\r\n\r\n"
+        stream.close()
@@ -0,0 +1,85 @@
+import time
+
+import tornado
+import tornado.tcpclient
+
+from src.app import make_app
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerExpectContinue(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, max_body_size=1048576)
+
+    async def send_headers(self, path, expect="100-continue", length=10):
+        """Send the request headers only, return the stream and response line"""
+        stream = await tornado.tcpclient.TCPClient().connect(
+            "127.0.0.1", self.get_http_port()
+        )
+        await stream.write(
+            f"POST {path} HTTP/1.1\r\nHost: test\r\nExpect: {expect}\r\n"
+            f"Content-Length: {length}\r\n\r\n".encode("utf-8")
+        )
+        headers = await stream.read_until(b"\r\n\r\n")
+        return stream, headers.decode("utf-8")
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_POST_continue(self):
+        stream, headers = await self.send_headers("/test/with.ext?scenario=every:2")
+        assert headers.startswith("HTTP/1.1 100")
+        await stream.write(b"0123456789")
+        headers = await stream.read_until(b"\r\n\r\n")
+        assert headers.startswith(b"HTTP/1.1 200")
+        # The scenario is counted once for the request
+        assert b"X-Scenario: addr=127.0.0.1 request 1" in headers
+        stream.close()
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_POST_rejected_by_set(self):
+        stream, headers = await self.send_headers(
+            "/test/with.ext?set=status:503,host:test", length=1000000
+        )
+        # Rejected before the body is sent
+        assert headers.startswith("HTTP/1.1 503")
+        assert "X-Status-Code: 503 set before the request body" in headers
+        assert "Connection: close" in headers
+        stream.close()
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_POST_rejected_over_max_body_size(self):
+        stream, headers = await self.send_headers("/test/with.ext", length=2097152)
+        assert headers.startswith("HTTP/1.1 413")
+        stream.close()
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_POST_unknown_expectation(self):
+        stream, headers = await self.send_headers("/test/with.ext", expect="other")
+        assert headers.startswith("HTTP/1.1 417")
+        stream.close()
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_POST_non_canonical_expectation(self):
+        stream, headers = await self.send_headers(
+            "/test/with.ext", expect="100-Continue"
+        )
+        # The expectation is case-insensitive
+        assert headers.startswith("HTTP/1.1 100")
+        await stream.write(b"0123456789")
+        headers = await stream.read_until(b"\r\n\r\n")
+        assert headers.startswith(b"HTTP/1.1 200")
+        stream.close()
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_POST_invalid_options(self):
+        for path in ["/test/with.ext?expect_delay=x", "/test/with.ext?status=abc"]:
+            stream, headers = await self.send_headers(path)
+            assert headers.startswith("HTTP/1.1 400")
+            stream.close()
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_POST_expect_delay(self):
+        started = time.monotonic()
+        stream, headers = await self.send_headers("/test/with.ext?expect_delay=0.2")
+        assert headers.startswith("HTTP/1.1 100")
+        assert time.monotonic() - started >= 0.2
+        stream.close()
@@ -0,0 +1,89 @@
+import json
+import time
+
+import tornado
+
+from src.app import HealthCheck, LoopMonitor, make_app, memory_rss
+
+
+def test_memory_rss():
+    assert memory_rss() > 1024 * 1024
+
+
+def test_health_check_thresholds():
+    monitor = LoopMonitor()
+    monitor.lag = 0.5
+    values, reasons = HealthCheck(max_loop_lag=0.25, max_rss=1).check(
+        loop_monitor=monitor
+    )
+    assert values["loop_lag"] == 0.5
+    assert reasons == ["loop lag 0.500s > 0.25s", f"rss {values['rss']} > 1"]
+    assert HealthCheck().check(loop_monitor=monitor)[1] == []
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestHealthHandler(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(
+            debug=True, autoreload=False, ready_max_loop_lag=0.05, ready_max_inflight=0
+        )
+
+    def test_HTTP_method_GET_live(self):
+        # Make the HTTP request
+        response = self.fetch("/_/live", method="GET")
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.headers.get("Content-Type") == "text/json"
+        assert json.loads(response.body)["live"] is True
+
+    def test_HTTP_method_GET_ready(self):
+        # Make the HTTP request
+        response = self.fetch("/_/ready", method="GET")
+        # Check response code for the expected value
+        assert response.code == 200
+        body = json.loads(response.body)
+        assert body["ready"] is True
+        assert body["inflight"] == 0
+
+    def test_HTTP_method_HEAD_ready(self):
+        # Make the HTTP request
+        response = self.fetch("/_/ready", method="HEAD")
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.body == b""
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_GET_not_ready_when_loop_lags(self):
+        loop_monitor = self._app.settings["loop_monitor"]
+        loop_monitor.interval = 0.01
+        loop_monitor.start()
+        # Block the IOLoop past the readiness threshold
+        while not loop_monitor.samples:
+            await tornado.gen.sleep(0.01)
+        time.sleep(0.1)
+        await tornado.gen.sleep(0.02)
+        response = await self.http_client.fetch(
+            self.get_url("/_/ready"), raise_error=False
+        )
+        loop_monitor.stop()
+        assert response.code == 503
+        body = json.loads(response.body)
+        assert body["ready"] is False
+        assert body["reasons"][0].startswith("loop lag")
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_GET_not_ready_when_busy(self):
+        request = self.http_client.fetch(self.get_url("/test/with.ext?delay=0.2"))
+        while self._app.settings["drain_control"].inflight == 0:
+            await tornado.gen.sleep(0.01)
+        response = await self.http_client.fetch(
+            self.get_url("/_/ready"), raise_error=False
+        )
+        assert response.code == 503
+        assert json.loads(response.body)["reasons"] == ["inflight 1 > 0"]
+        await request
+
+        # Check the readiness checks are reported
+        response = await self.http_client.fetch(self.get_url("/_/stats"))
+        stats = json.loads(response.body)
+        assert stats["health"]["checks"] == {"ready": 0, "not_ready": 1}
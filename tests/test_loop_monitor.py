@@ -0,0 +1,61 @@
+import gzip
+import json
+import time
+
+import tornado
+
+from src.app import make_app
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestLoopMonitor(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, slow_callback_threshold=0.05)
+
+    def setUp(self):
+        super().setUp()
+        self.loop_monitor = self._app.settings["loop_monitor"]
+        self.loop_monitor.interval = 0.01
+        self.loop_monitor.start()
+
+    def tearDown(self):
+        self.loop_monitor.stop()
+        super().tearDown()
+
+    @tornado.testing.gen_test
+    async def test_blocking_stage_captured(self):
+        compress = gzip.compress
+
+        def slow_compress(data, *args, **kwargs):
+            time.sleep(0.2)
+            return compress(data, *args, **kwargs)
+
+        gzip.compress = slow_compress
+        try:
+            response = await self.http_client.fetch(
+                self.get_url("/test/with.ext"),
+                headers={"Accept-Encoding": "gzip"},
+                decompress_response=False,
+            )
+        finally:
+            gzip.compress = compress
+        assert response.code == 200
+        await tornado.gen.sleep(0.05)
+
+        # Check the blocking callback is reported
+        response = await self.http_client.fetch(self.get_url("/_/stats"))
+        stats = json.loads(response.body)["loop"]
+        assert stats["blocked"] == 1
+        assert stats["recent"]["max"] >= 0.1
+        offender = stats["offenders"][0]
+        assert offender["blocked"] >= 0.1
+        assert offender["stage"].startswith("RepeaterHandler.")
+        assert offender["stack"][-1].endswith(" slow_compress")
+
+    @tornado.testing.gen_test
+    async def test_short_callbacks_not_captured(self):
+        for _ in range(5):
+            time.sleep(0.01)
+            await tornado.gen.sleep(0.01)
+        assert self.loop_monitor.blocked == 0
+        assert len(self.loop_monitor.samples) > 0
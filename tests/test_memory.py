@@ -0,0 +1,96 @@
+import json
+import tracemalloc
+import types
+
+import tornado
+
+import src.app
+from src.app import MemoryMonitor, RepeaterHandler, make_app
+
+HEADERS = {"Authorization": "Bearer secret"}
+
+
+def test_memory_monitor_stage():
+    memory_monitor = MemoryMonitor()
+    line = RepeaterHandler.delay_response.__code__.co_firstlineno + 1
+    traceback = [
+        types.SimpleNamespace(filename=src.app.__file__, lineno=line),
+        types.SimpleNamespace(filename=json.__file__, lineno=1),
+    ]
+    assert memory_monitor.stage(traceback) == "RepeaterHandler.delay_response"
+    assert memory_monitor.stage(traceback[1:]) == "other"
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestMemoryHandler(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, admin_token="secret")
+
+    def tearDown(self):
+        self._app.settings["memory_monitor"].stop_tracing()
+        super().tearDown()
+
+    def test_HTTP_method_GET_rss(self):
+        # Make the HTTP request
+        response = self.fetch("/_/memory", method="GET", headers=HEADERS)
+        # Check response code for the expected value
+        assert response.code == 200
+        result = json.loads(response.body)
+        assert result["rss"] > 0
+        assert result["tracing"] is False
+
+        # A snapshot requires tracing
+        response = self.fetch("/_/memory?snapshot", method="GET", headers=HEADERS)
+        assert response.code == 409
+
+    def test_HTTP_method_GET_unauthorized(self):
+        # Make the HTTP request
+        response = self.fetch("/_/memory", method="GET")
+        # Check response code for the expected value
+        assert response.code == 401
+
+    def test_HTTP_method_POST_trace(self):
+        # Start tracing with every request sampled
+        response = self.fetch(
+            "/_/memory",
+            method="POST",
+            headers=HEADERS,
+            body=json.dumps({"trace": True, "frames": 5, "sample_rate": 1}),
+        )
+        assert response.code == 200
+        assert tracemalloc.is_tracing()
+
+        response = self.fetch("/_/memory?snapshot", method="GET", headers=HEADERS)
+        assert "diff" not in json.loads(response.body)["snapshot"]
+
+        # Make the HTTP request
+        response = self.fetch("/test/with.ext?content=100000", method="GET")
+        assert response.code == 200
+
+        response = self.fetch("/_/memory?snapshot", method="GET", headers=HEADERS)
+        result = json.loads(response.body)
+        assert result["requests"]["sampled"] == 1
+        assert result["requests"]["peak"]["p50"] > 100000
+        assert result["requests"]["largest"][0]["path"] == "/test/with.ext"
+        assert result["snapshot"]["stages"]["other"]["size"] > 0
+        assert "diff" in result["snapshot"]
+
+        # Stop tracing
+        response = self.fetch(
+            "/_/memory", method="POST", headers=HEADERS, body='{"trace": false}'
+        )
+        assert response.code == 200
+        assert not tracemalloc.is_tracing()
+
+    def test_HTTP_method_bad_request(self):
+        # A non-object JSON body
+        response = self.fetch("/_/memory", method="POST", headers=HEADERS, body="[]")
+        assert response.code == 400
+
+        # A snapshot limit which is not a positive integer
+        self.fetch("/_/memory", method="POST", headers=HEADERS, body='{"trace": true}')
+        for limit in ["abc", "0"]:
+            response = self.fetch(
+                f"/_/memory?snapshot&limit={limit}", method="GET", headers=HEADERS
+            )
+            assert response.code == 400
@@ -0,0 +1,139 @@
+import json
+import unittest.mock
+
+import tornado
+
+from src.app import ObjectStore, make_app
+
+
+def test_object_store_lru():
+    object_store = ObjectStore(budget=3000, size="const:1000")
+    first = object_store.get("/a")
+    assert len(first.body) == 1000
+    assert object_store.get("/a") is first
+    for key in ["/b", "/c", "/d"]:
+        object_store.get(key)
+    # The least recently used object was evicted and is created again the same
+    assert "/a" not in object_store.objects
+    assert object_store.get("/a").body == first.body
+    stats = object_store.stats()
+    assert stats["bytes"] == 3000
+    assert stats["totals"]["hits"] == 1
+    assert stats["totals"]["misses"] == 5
+    assert stats["totals"]["evictions"] == 2
+
+
+def test_object_store_deterministic():
+    headers = ObjectStore(size="uniform:1:10000", age="uniform:0:60").get("/x").headers
+    again = ObjectStore(size="uniform:1:10000", age="uniform:0:60").get("/x").headers
+    # Objects created again differ only by the time they were created
+    assert headers.pop("Last-Modified") and again.pop("Last-Modified")
+    assert headers == again
+    assert headers["Cache-Control"] == "public, max-age=3600"
+    assert 0 <= int(headers["Age"]) <= 60
+
+
+def test_object_store_spill(tmp_path):
+    object_store = ObjectStore(
+        budget=1000, size="const:1000", spill=str(tmp_path), spill_size=2500
+    )
+    bodies = {key: object_store.get(key).body for key in ["/a", "/b", "/c", "/d"]}
+    # Two evicted objects fit the spill file, the oldest was overwritten
+    assert list(object_store.spilled) == ["/b", "/c"]
+    assert object_store.get("/b").body == bodies["/b"]
+    assert object_store.get("/a").body == bodies["/a"]
+    totals = object_store.stats()["totals"]
+    assert totals["spill_hits"] == 1
+    assert totals["spill_evictions"] >= 1
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestObjectHandler(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(
+            debug=True,
+            autoreload=False,
+            object_store="/objects/",
+            object_size="const:5000",
+            object_age="const:10",
+        )
+
+    def test_HTTP_method_GET_object(self):
+        # Make the HTTP requests
+        first = self.fetch("/objects/1", method="GET")
+        again = self.fetch("/objects/1", method="GET")
+        # Check response code for the expected value
+        assert first.code == 200
+        assert len(first.body) == 5000
+        assert first.body == again.body
+        for header in ["Cache-Control", "Age", "Etag", "Last-Modified"]:
+            assert first.headers.get(header) == again.headers.get(header)
+        assert first.headers.get("Cache-Control") == "public, max-age=3600"
+        assert first.headers.get("Age") == "10"
+        assert self.fetch("/objects/2", method="GET").body != first.body
+
+        # Check the object store is reported
+        response = self.fetch("/_/stats", method="GET")
+        stats = json.loads(response.body)
+        assert stats["objects"]["objects"] == 2
+        assert stats["objects"]["totals"]["hits"] == 1
+
+    def test_HTTP_method_GET_object_not_modified(self):
+        etag = self.fetch("/objects/1", method="GET").headers.get("Etag")
+        # Make the HTTP request
+        response = self.fetch(
+            "/objects/1", method="GET", headers={"If-None-Match": etag}
+        )
+        # Check response code for the expected value
+        assert response.code == 304
+
+    def test_HTTP_method_GET_object_last_modified(self):
+        with unittest.mock.patch("time.time", return_value=1000000000):
+            last_modified = self.fetch("/objects/1", method="GET").headers.get(
+                "Last-Modified"
+            )
+        # The object is last modified when it was created
+        assert last_modified == "Sun, 09 Sep 2001 01:46:40 GMT"
+        for since, code in [
+            (last_modified, 304),
+            ("Sun, 09 Sep 2001 01:46:39 GMT", 200),
+        ]:
+            # Make the HTTP request
+            response = self.fetch(
+                "/objects/1", method="GET", headers={"If-Modified-Since": since}
+            )
+            # Check response code for the expected value
+            assert response.code == code
+            assert response.headers.get("Last-Modified") == last_modified
+
+    def test_HTTP_method_GET_object_range(self):
+        whole = self.fetch("/objects/1", method="GET").body
+        # Make the HTTP request
+        response = self.fetch(
+            "/objects/1", method="GET", headers={"Range": "bytes=100-199"}
+        )
+        # Check response code for the expected value
+        assert response.code == 206
+        assert response.body == whole[100:200]
+
+    def test_HTTP_method_GET_object_conditions(self):
+        for path in [
+            "/objects/1?status=503",
+            "/objects/1?set=status:503,addr:127.0.0.1",
+            "/objects/2?scenario=first:1;status:503",
+        ]:
+            # Make the HTTP request
+            response = self.fetch(path, method="GET")
+            # Check response code for the expected value
+            assert response.code == 503
+            assert response.body == b""
+        # Check response headers are set
+        response = self.fetch("/objects/1?header=X-Test:1", method="GET")
+        assert response.code == 200
+        assert response.headers.get("X-Test") == "1"
+
+    def test_HTTP_method_POST_object(self):
+        # Make the HTTP request
+        response = self.fetch("/objects/1", method="POST", body="test")
+        # Check response code for the expected value
+        assert response.code == 405
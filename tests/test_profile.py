@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import tornado
+
+from src.app import make_app
+
+HEADERS = {"Authorization": "Bearer secret"}
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestProfileHandlerDisabled(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, admin_token="secret")
+
+    def test_HTTP_method_GET_disabled(self):
+        # Make the HTTP request
+        response = self.fetch("/_/profile", method="GET", headers=HEADERS)
+        # Check response code for the expected value
+        assert response.code == 404
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestProfileHandler(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(
+            debug=True, autoreload=False, admin_token="secret", profiling=True
+        )
+
+    def test_HTTP_method_GET_unauthorized(self):
+        # Make the HTTP request
+        response = self.fetch("/_/profile", method="GET")
+        # Check response code for the expected value
+        assert response.code == 401
+
+    def test_HTTP_method_GET_invalid_mode(self):
+        # Make the HTTP request
+        response = self.fetch("/_/profile?mode=unknown", method="GET", headers=HEADERS)
+        # Check response code for the expected value
+        assert response.code == 400
+
+    async def profile_under_load(self, query):
+        """Profile while requests are made, return the profile"""
+        profile = asyncio.ensure_future(
+            self.http_client.fetch(self.get_url(f"/_/profile?{query}"), headers=HEADERS)
+        )
+        while not profile.done():
+            await self.http_client.fetch(self.get_url("/test/with.ext?content=1024"))
+        response = await profile
+        assert response.code == 200
+        return json.loads(response.body)
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_GET_sample(self):
+        result = await self.profile_under_load("mode=sample&seconds=0.3&limit=5")
+        assert result["mode"] == "sample"
+        assert result["samples"] > 10
+        assert 0 < len(result["functions"]) <= 5
+        assert result["functions"][0]["self_percent"] > 0
+        assert any(
+            "RepeaterHandler" in stack["stack"] or "_run_once" in stack["stack"]
+            for stack in result["stacks"]
+        )
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_GET_cprofile(self):
+        result = await self.profile_under_load("mode=cprofile&seconds=0.3&limit=200")
+        assert result["mode"] == "cprofile"
+        assert result["calls"] > 0
+        assert any("repeat" in function["function"] for function in result["functions"])
+
+    @tornado.testing.gen_test
+    async def test_HTTP_method_GET_one_profile_at_a_time(self):
+        responses = await asyncio.gather(
+            *[
+                self.http_client.fetch(
+                    self.get_url("/_/profile?seconds=0.2"),
+                    headers=HEADERS,
+                    raise_error=False,
+                )
+                for _ in range(2)
+            ]
+        )
+        assert sorted(response.code for response in responses) == [200, 409]
+
+        # Check the profiles are reported
+        response = await self.http_client.fetch(self.get_url("/_/stats"))
+        stats = json.loads(response.body)
+        assert stats["profiler"]["totals"] == {"profiles": 1, "rejected": 1}
@@ -0,0 +1,167 @@
+import pytest
+import tornado
+
+from src.app import GeneratedContent, make_app, parse_byte_ranges
+
+
+def test_parse_byte_ranges():
+    assert parse_byte_ranges("bytes=0-99", 1000) == [(0, 100)]
+    assert parse_byte_ranges("bytes=900-", 1000) == [(900, 1000)]
+    assert parse_byte_ranges("bytes=-100", 1000) == [(900, 1000)]
+    assert parse_byte_ranges("bytes=0-0, 990-2000", 1000) == [(0, 1), (990, 1000)]
+    assert parse_byte_ranges("bytes=1000-", 1000) == []
+    assert parse_byte_ranges("bytes=5-1", 1000) is None
+    assert parse_byte_ranges("items=0-1", 1000) is None
+
+
+def test_generated_content():
+    content = GeneratedContent(200000, seed="test")
+    whole = content.read()
+    assert len(whole) == 200000
+    assert whole == GeneratedContent(200000, seed="test").read()
+    # Any range matches the whole content, including across blocks
+    assert content.read(65530, 65540) == whole[65530:65540]
+    assert content.read(131000, 200000) == whole[131000:]
+    assert content.read(199999, 300000) == whole[-1:]
+    assert set(GeneratedContent(100, fill="ab").read()) == set(b"ab")
+    with pytest.raises(ValueError):
+        GeneratedContent(100, fill="é")
+
+
+def test_generated_content_etag():
+    etag = GeneratedContent(100, seed="1").etag()
+    assert etag == GeneratedContent(100, seed="1").etag()
+    assert etag != GeneratedContent(100, seed="2").etag()
+    assert etag != GeneratedContent(101, seed="1").etag()
+    assert GeneratedContent(100, seed="1").etag("gzip").endswith('-gzip"')
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerRanges(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, max_content_length=1048576)
+
+    def whole(self, path):
+        response = self.fetch(path, method="GET")
+        assert response.code == 200
+        assert response.headers.get("Accept-Ranges") == "bytes"
+        return response.body
+
+    def test_HTTP_method_GET_single_range(self):
+        whole = self.whole("/test/with.ext?content=200000")
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext?content=200000",
+            method="GET",
+            headers={"Range": "bytes=65000-66999"},
+        )
+        # Check response code for the expected value
+        assert response.code == 206
+        assert response.headers.get("Content-Range") == "bytes 65000-66999/200000"
+        assert response.headers.get("Content-Encoding") is None
+        assert response.body == whole[65000:67000]
+
+    def test_HTTP_method_GET_multiple_ranges(self):
+        whole = self.whole("/test/football.svg")
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/football.svg",
+            method="GET",
+            headers={"Range": "bytes=0-9,-10"},
+        )
+        # Check response code for the expected value
+        assert response.code == 206
+        content_type = response.headers.get("Content-Type")
+        assert content_type.startswith("multipart/byteranges; boundary=")
+        boundary = content_type.split("boundary=")[1].encode("utf-8")
+        parts = response.body.split(b"--" + boundary)
+        assert parts[-1] == b"--\r\n"
+        assert parts[1].endswith(b"\r\n\r\n" + whole[:10] + b"\r\n")
+        assert f"Content-Range: bytes {len(whole) - 10}-".encode("utf-8") in parts[2]
+        assert parts[2].endswith(b"\r\n\r\n" + whole[-10:] + b"\r\n")
+
+    def test_HTTP_method_GET_unsatisfiable_range(self):
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext?content=100",
+            method="GET",
+            headers={"Range": "bytes=100-"},
+        )
+        # Check response code for the expected value
+        assert response.code == 416
+        assert response.headers.get("Content-Range") == "bytes */100"
+
+    def test_HTTP_method_GET_if_range_not_matched(self):
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext?content=100",
+            method="GET",
+            headers={"Range": "bytes=0-9", "If-Range": '"other"'},
+        )
+        # Check the whole content is returned
+        assert response.code == 200
+        assert len(response.body) == 100
+
+    def test_HTTP_method_GET_non_ascii_fill(self):
+        # Make the HTTP request
+        response = self.fetch("/test/with.ext?content=100&fill=%C3%A9", method="GET")
+        # Check response code for the expected value
+        assert response.code == 400
+
+    def test_HTTP_method_GET_seed_and_etag(self):
+        # Make the HTTP requests
+        first = self.fetch("/test/with.ext?content=1000&seed=1", method="GET")
+        again = self.fetch("/test/with.ext?content=1000&seed=1", method="GET")
+        other = self.fetch("/test/with.ext?content=1000&seed=2", method="GET")
+        # The same parameters return the same content and ETag
+        assert first.body == again.body
+        assert first.headers.get("Etag") == again.headers.get("Etag")
+        assert first.body != other.body
+        assert first.headers.get("Etag") != other.headers.get("Etag")
+        # The gzip encoded content has a different ETag of its own
+        assert first.headers.get("Etag").endswith('-gzip"')
+
+    def test_HTTP_method_GET_if_range_matched(self):
+        response = self.fetch(
+            "/test/with.ext?content=1000",
+            method="GET",
+            headers={"Accept-Encoding": "identity"},
+            decompress_response=False,
+        )
+        etag = response.headers.get("Etag")
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext?content=1000",
+            method="GET",
+            headers={"Range": "bytes=0-9", "If-Range": etag},
+        )
+        # Check the range is returned
+        assert response.code == 206
+        assert response.headers.get("Etag") == etag
+        assert len(response.body) == 10
+        assert response.headers.get("Vary") == "Accept-Encoding"
+
+    def test_HTTP_method_GET_if_range_gzip_etag(self):
+        response = self.fetch(
+            "/test/with.ext?content=1000",
+            method="GET",
+            headers={"Accept-Encoding": "gzip"},
+            decompress_response=False,
+        )
+        etag = response.headers.get("Etag")
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext?content=1000",
+            method="GET",
+            headers={
+                "Accept-Encoding": "gzip",
+                "Range": "bytes=0-9",
+                "If-Range": etag,
+            },
+            decompress_response=False,
+        )
+        # Ranges are of the identity encoding, the whole content is returned
+        assert response.code == 200
+        assert len(response.body) == 1000
+        assert response.headers.get("Etag") != etag
+        assert response.headers.get("Vary") == "Accept-Encoding"
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+import tornado
+
+from src.app import ConfigSnapshot, RateLimiter, make_app, parse_rate_limit
+
+
+def test_rate_limiter_lru_eviction():
+    rate_limiter = RateLimiter(max_keys=2)
+    for key in ["a", "b", "c"]:
+        assert rate_limiter.check(key, 1, 1)[0] is True
+    assert list(rate_limiter.buckets) == ["b", "c"]
+    assert rate_limiter.counters["evicted"] == 1
+    # The evicted key starts again with a full bucket
+    assert rate_limiter.check("a", 1, 1)[0] is True
+    assert rate_limiter.check("a", 1, 1)[0] is False
+
+
+def test_parse_rate_limit():
+    assert parse_rate_limit("0.5:2") == (0.5, 2)
+    assert parse_rate_limit("10") == (10, 10)
+    for rate_limit in ["0", "-1", "1:0", "abc", "nan"]:
+        with pytest.raises(ValueError):
+            parse_rate_limit(rate_limit)
+    with pytest.raises(ValueError):
+        ConfigSnapshot(json.dumps({"limits": {"rate_limit": "0"}}))
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerWithRateLimitParameter(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False)
+
+    def test_HTTP_method_GET_with_invalid_rate_limit(self):
+        for path in ["/test/with.ext?rate_limit=0", "/test/with.ext?rate_limit=x"]:
+            # Make the HTTP requests
+            for _ in range(2):
+                response = self.fetch(path, method="GET")
+                # Check response code for the expected value
+                assert response.code == 400
+
+    def test_HTTP_method_GET_with_rate_limit(self):
+        # Make the HTTP requests
+        responses = [
+            self.fetch(
+                "/test/with.ext?rate_limit=0.5:2",
+                method="GET",
+                headers={"Forwarded": "for=8.7.6.5"},
+            )
+            for _ in range(3)
+        ]
+        # Check response code for the expected value
+        assert [response.code for response in responses] == [200, 200, 429]
+        assert responses[0].headers.get("RateLimit-Limit") == "2"
+        assert responses[0].headers.get("RateLimit-Remaining") == "1"
+        assert responses[2].headers.get("RateLimit-Remaining") == "0"
+        assert responses[2].headers.get("Retry-After") == "2"
+        assert int(responses[2].headers.get("Content-Length")) == 0
+
+        # Check a different client address has a separate limit
+        response = self.fetch(
+            "/test/with.ext?rate_limit=0.5:2",
+            method="GET",
+            headers={"Forwarded": "for=4.3.2.1"},
+        )
+        assert response.code == 200
+
+        # Check the rate limits are reported
+        response = self.fetch("/_/stats", method="GET")
+        stats = json.loads(response.body)
+        assert stats["rate_limit"]["keys"] == 2
+        assert stats["rate_limit"]["totals"]["limited"] == 1
+
+    def test_HTTP_method_GET_with_rate_limit_key_header(self):
+        # Make the HTTP requests
+        codes = [
+            self.fetch(
+                "/test/with.ext?rate_limit=0.1:1&rate_limit_key=header:X-Api-Key",
+                method="GET",
+                headers={"X-Api-Key": api_key},
+            ).code
+            for api_key in ["one", "two", "one"]
+        ]
+        # Check response code for the expected value
+        assert codes == [200, 200, 429]
@@ -0,0 +1,71 @@
+import hashlib
+import json
+
+import tornado
+
+from src.app import RequestBody, make_app
+
+
+def test_request_body():
+    request_body = RequestBody(keep=4)
+    for chunk in [b"ab", b"cdef", b"gh"]:
+        request_body.received(chunk)
+    request_body.complete()
+    assert request_body.size == 8
+    assert bytes(request_body.kept) == b"abcd"
+    assert request_body.truncated is True
+    summary = request_body.summary()
+    assert summary["sha256"] == hashlib.sha256(b"abcdefgh").hexdigest()
+    assert summary["bytes"] == 8
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerRequestBody(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(
+            debug=True, autoreload=False, max_body_echo=16, max_body_size=1048576
+        )
+
+    def test_HTTP_method_POST_truncated_echo(self):
+        body = b"0123456789" * 10000
+        # Make the HTTP request
+        response = self.fetch("/test/with.ext", method="POST", body=body)
+        # Check response code for the expected value
+        assert response.code == 200
+        text = response.body.decode()
+        assert "* POST DATA b'0123456789012345' ... 99984 more bytes" in text
+        assert f"sha256={hashlib.sha256(body).hexdigest()}" in text
+
+    def test_HTTP_method_POST_json(self):
+        body = b"x" * 200000
+        # Make the HTTP request
+        response = self.fetch("/test/with.json", method="POST", body=body)
+        # Check response code for the expected value
+        assert response.code == 200
+        request = json.loads(response.body)["request"]
+        assert request["body_length"] == 200000
+        assert request["body_received"]["bytes"] == 200000
+        assert request["body_received"]["truncated"] is True
+        assert request["body_received"]["sha256"] == hashlib.sha256(body).hexdigest()
+
+    def test_HTTP_method_POST_form_arguments(self):
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.json",
+            method="POST",
+            body="foo=bar",
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        # Check response code for the expected value
+        assert response.code == 200
+        request = json.loads(response.body)["request"]
+        assert request["body_arguments"] == {"foo": ["bar"]}
+        assert request["arguments"] == {"foo": ["bar"]}
+
+    def test_HTTP_method_POST_over_max_body_size(self):
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext", method="POST", body=b"x" * 2097152, raise_error=False
+        )
+        # Check the request is refused
+        assert response.code != 200
@@ -0,0 +1,68 @@
+import tornado
+
+from src.app import ScenarioState, make_app
+
+
+def test_scenario_state_ttl():
+    scenario_state = ScenarioState(ttl=0)
+    assert scenario_state.increment("a") == 1
+    # The idle key expired and starts over
+    assert scenario_state.increment("a") == 1
+    assert scenario_state.counters["expired"] == 1
+
+
+def test_scenario_state_max_keys():
+    scenario_state = ScenarioState(max_keys=2)
+    for key in ["a", "b", "a", "c"]:
+        scenario_state.increment(key)
+    assert list(scenario_state.counts) == ["a", "c"]
+    assert scenario_state.counts["a"][0] == 2
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerWithScenarioParameter(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False)
+
+    def test_HTTP_method_GET_with_scenario_first(self):
+        # Make the HTTP requests
+        responses = [
+            self.fetch("/test/with.ext?scenario=first:2;status:503", method="GET")
+            for _ in range(3)
+        ]
+        # Check response code for the expected value
+        assert [response.code for response in responses] == [503, 503, 200]
+        assert responses[2].headers.get("X-Scenario") == "addr=127.0.0.1 request 3"
+
+    def test_HTTP_method_GET_with_scenario_every(self):
+        # Make the HTTP requests
+        codes = [
+            self.fetch(
+                "/test/with.ext?scenario=every:3;status:504&scenario_key=every",
+                method="GET",
+            ).code
+            for _ in range(6)
+        ]
+        # Check response code for the expected value
+        assert codes == [200, 200, 504, 200, 200, 504]
+
+    def test_HTTP_method_GET_with_scenario_invalid_number(self):
+        for scenario in ["every:0", "every:abc", "first:-1", "first"]:
+            # Make the HTTP request
+            response = self.fetch(
+                f"/test/with.ext?scenario={scenario};status:503", method="GET"
+            )
+            # Check response code for the expected value
+            assert response.code == 400
+
+    def test_HTTP_method_GET_with_scenario_cycle(self):
+        # Make the HTTP requests
+        codes = [
+            self.fetch(
+                f"/test/{path}?scenario=cycle;status:200;status:500&scenario_by=path",
+                method="GET",
+            ).code
+            for path in ["one", "two", "one", "two"]
+        ]
+        # Check response code for the expected value
+        assert codes == [200, 200, 500, 500]
@@ -0,0 +1,62 @@
+import json
+import math
+import os
+import tempfile
+
+import tornado
+
+from src.app import OutageSchedule, OutageWindow, make_app
+
+
+def test_outage_window_periodic():
+    window = OutageWindow("blip", every=300, duration=30, offset=60)
+    assert window.state(0) == (False, 60)
+    assert window.state(70) == (True, 90)
+    assert window.state(100) == (False, 360)
+    assert window.state(365) == (True, 390)
+
+
+def test_outage_window_one_shot():
+    window = OutageWindow("slow", start=600, end=900)
+    assert window.state(0) == (False, 600)
+    assert window.state(600) == (True, 900)
+    assert window.state(900) == (False, math.inf)
+
+
+def test_outage_schedule_precomputed():
+    schedule = OutageSchedule(
+        [
+            OutageWindow("blip", set="status:503", every=300, duration=30),
+            OutageWindow("slow", set="delay:2", start=10, end=15),
+        ]
+    )
+    started = schedule.started
+    assert schedule.check(started).header == "blip"
+    assert schedule.next_change == started + 10
+    assert schedule.check(started + 12).conditions == ["status:503", "delay:2"]
+    assert schedule.check(started + 20).header == "blip"
+    assert schedule.check(started + 40).header is None
+    assert schedule.next_change == started + 300
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerWithSchedule(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, schedule=self.schedule_file)
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump([{"name": "down", "start": 0, "set": "status:503"}], f)
+        self.schedule_file = f.name
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        os.remove(self.schedule_file)
+
+    def test_HTTP_method_GET_during_window(self):
+        # Make the HTTP request
+        response = self.fetch("/test/with.ext", method="GET")
+        # Check response code for the expected value
+        assert response.code == 503
+        assert response.headers.get("X-Outage-Window") == "down"
@@ -0,0 +1,75 @@
+import tornado
+
+from src.app import make_app
+
+
+def parse_server_timing(header):
+    """Return the stage durations in a Server-Timing header"""
+    timings = {}
+    for metric in header.split(", "):
+        stage, duration = metric.split(";dur=")
+        timings[stage] = float(duration)
+    return timings
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerServerTiming(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False)
+
+    def test_HTTP_method_GET_without_server_timing(self):
+        # Make the HTTP request
+        response = self.fetch("/test/with.ext", method="GET")
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.headers.get("Server-Timing") is None
+
+    def test_HTTP_method_GET_with_server_timing(self):
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext?server_timing&delay=0.1&content=1024",
+            method="GET",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        # Check response code for the expected value
+        assert response.code == 200
+        timings = parse_server_timing(response.headers.get("Server-Timing"))
+        assert list(timings) == [
+            "options",
+            "condition",
+            "connection",
+            "queue",
+            "delay",
+            "render",
+            "compress",
+            "write",
+            "total",
+        ]
+        assert timings["delay"] >= 100
+        assert timings["total"] >= sum(timings.values()) - timings["total"]
+
+    def test_HTTP_method_GET_rate_limited(self):
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext?server_timing&rate_limit=0.001:1", method="GET"
+        )
+        response = self.fetch(
+            "/test/with.ext?server_timing&rate_limit=0.001:1", method="GET"
+        )
+        # Check response code for the expected value
+        assert response.code == 429
+        timings = parse_server_timing(response.headers.get("Server-Timing"))
+        assert list(timings) == ["options", "condition", "connection", "total"]
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerServerTimingEnabled(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, server_timing=True)
+
+    def test_HTTP_method_HEAD(self):
+        # Make the HTTP request
+        response = self.fetch("/test/with.ext", method="HEAD")
+        # Check response code for the expected value
+        assert response.code == 200
+        assert "total;dur=" in response.headers.get("Server-Timing")
@@ -0,0 +1,67 @@
+import json
+import multiprocessing
+
+import tornado
+
+from src.app import RateLimiter, ScenarioState, SharedSlots, SharedState, make_app
+
+
+def test_shared_slots_evicts_least_recently_used():
+    shared_slots = SharedSlots(slots=1, ways=2)
+    assert shared_slots.slots == 2
+    assert shared_slots.update("a", lambda values: (1, 10))[1] == "new"
+    assert shared_slots.update("b", lambda values: (2, 20))[1] == "new"
+    assert shared_slots.update("b", lambda values: (2, 20))[1] == "found"
+    assert shared_slots.update("c", lambda values: (3, 30))[1] == "evicted"
+    assert shared_slots.get("a") is None
+    assert shared_slots.get("b") == (2, 20)
+    assert shared_slots.get("c") == (3, 30)
+
+
+def add_requests(shared_state, count):
+    for _ in range(count):
+        shared_state.add("requests")
+
+
+def test_shared_state_across_processes():
+    shared_state = SharedState(slots=64)
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=add_requests, args=(shared_state, 500)) for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert shared_state.counter("requests") == 2000
+
+
+def test_rate_limiter_with_shared_state():
+    shared_state = SharedState(slots=64)
+    rate_limiter = RateLimiter(shared_state=shared_state)
+    assert rate_limiter.check("a", 0.1, 1)[0] is True
+    # A separate limiter sharing the state sees the empty bucket
+    assert RateLimiter(shared_state=shared_state).check("a", 0.1, 1)[0] is False
+    assert rate_limiter.stats()["totals"]["limited"] == 1
+
+
+def test_scenario_state_with_shared_state():
+    shared_state = SharedState(slots=64)
+    assert ScenarioState(shared_state=shared_state).increment("a") == 1
+    assert ScenarioState(shared_state=shared_state).increment("a") == 2
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestStatsHandlerSharedState(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, shared_state=SharedState(slots=64))
+
+    def test_HTTP_method_GET_stats(self):
+        # Make the HTTP request
+        response = self.fetch("/_/stats", method="GET")
+        stats = json.loads(response.body)
+        # Check the sections kept in the shared state are not per worker
+        assert "admission" in stats["per_worker"]
+        for key in ["rate_limit", "runtime", "scenarios", "shared_state"]:
+            assert key in stats
+            assert key not in stats["per_worker"]
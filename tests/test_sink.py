@@ -0,0 +1,69 @@
+import hashlib
+import json
+
+import pytest
+import tornado
+
+from src.app import UploadSink, make_app
+
+
+def test_upload_sink_select():
+    upload_sink = UploadSink(matches=["method:put", "path:/upload/"])
+    assert upload_sink.select("PUT", "/test") is True
+    assert upload_sink.select("POST", "/upload/file") is True
+    assert upload_sink.select("POST", "/test") is False
+    with pytest.raises(ValueError):
+        UploadSink(matches=["method:GET"])
+    with pytest.raises(ValueError):
+        UploadSink(read_rate=-1)
+
+
+# https://www.tornadoweb.org/en/stable/testing.html
+class TestRepeaterHandlerSink(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return make_app(debug=True, autoreload=False, sink=["method:PUT"])
+
+    def test_HTTP_method_PUT_sink(self):
+        body = b"x" * 1048576
+        # Make the HTTP request
+        response = self.fetch("/test/with.ext?sink_hash", method="PUT", body=body)
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.headers.get("Content-Type") == "text/json"
+        summary = json.loads(response.body)["sink"]
+        assert summary["bytes"] == 1048576
+        assert summary["sha256"] == hashlib.sha256(body).hexdigest()
+
+        # Check the uploads are reported
+        response = self.fetch("/_/stats", method="GET")
+        stats = json.loads(response.body)
+        assert stats["sink"]["totals"] == {"requests": 1, "bytes": 1048576}
+
+    def test_HTTP_method_POST_sink_read_rate(self):
+        # Make the HTTP request
+        response = self.fetch(
+            "/test/with.ext?sink&sink_rate=1000000", method="POST", body=b"x" * 300000
+        )
+        # Check response code for the expected value
+        assert response.code == 200
+        summary = json.loads(response.body)["sink"]
+        assert "sha256" not in summary
+        assert summary["read_rate"] == 1000000
+        # The body is read no faster than the read rate
+        assert summary["seconds"] >= 0.2
+
+    def test_HTTP_method_POST_sink_invalid_read_rate(self):
+        for sink_rate in ["abc", "-1"]:
+            # Make the HTTP request
+            response = self.fetch(
+                f"/test/with.ext?sink&sink_rate={sink_rate}", method="POST", body="x"
+            )
+            # Check response code for the expected value
+            assert response.code == 400
+
+    def test_HTTP_method_POST_without_sink(self):
+        # Make the HTTP request
+        response = self.fetch("/test/with.ext", method="POST", body="test")
+        # Check response code for the expected value
+        assert response.code == 200
+        assert response.body.decode().find("* POST DATA b'test'") != -1
@@ -0,0 +1,138 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import pytest
+
+from src.app import SystemdNotifier, listen_fds
+
+CLI = os.path.join(os.path.dirname(__file__), "..", "src", "cli.py")
+
+
+def notify_socket(directory):
+    """Return a stand-in for the systemd notify socket"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(os.path.join(directory, "notify"))
+    sock.settimeout(10)
+    return sock
+
+
+def receive(sock, state):
+    """Return the next notification including `state'"""
+    while True:
+        message = sock.recv(4096).decode("utf-8")
+        if state in message.split("\n"):
+            return dict(line.split("=", 1) for line in message.split("\n"))
+
+
+def test_systemd_notifier(monkeypatch):
+    with tempfile.TemporaryDirectory() as directory:
+        sock = notify_socket(directory)
+        monkeypatch.setenv("NOTIFY_SOCKET", sock.getsockname())
+        monkeypatch.setenv("WATCHDOG_USEC", "2000000")
+        notifier = SystemdNotifier()
+        assert notifier.watchdog_interval == 2
+        assert notifier.notify("READY=1", "STATUS=testing")
+        assert sock.recv(4096) == b"READY=1\nSTATUS=testing"
+
+
+def test_systemd_notifier_disabled(monkeypatch):
+    monkeypatch.delenv("NOTIFY_SOCKET", raising=False)
+    monkeypatch.setenv("WATCHDOG_USEC", "2000000")
+    monkeypatch.setenv("WATCHDOG_PID", "1")
+    notifier = SystemdNotifier()
+    assert notifier.watchdog_interval is None
+    assert not notifier.notify("READY=1")
+
+
+def test_listen_fds_for_other_process(monkeypatch):
+    monkeypatch.setenv("LISTEN_PID", "1")
+    monkeypatch.setenv("LISTEN_FDS", "1")
+    assert listen_fds() == []
+    assert "LISTEN_FDS" not in os.environ
+
+
+def test_socket_activation_and_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        sock = notify_socket(directory)
+        listener = socket.create_server(("127.0.0.1", 0))
+        url = f"http://127.0.0.1:{listener.getsockname()[1]}/test/with.ext"
+
+        def activate():
+            # Pass the listening socket as systemd socket activation does
+            os.dup2(listener.fileno(), 3)
+            os.environ["LISTEN_PID"] = str(os.getpid())
+            os.environ["LISTEN_FDS"] = "1"
+            os.environ["NOTIFY_SOCKET"] = sock.getsockname()
+
+        process = subprocess.Popen(
+            [sys.executable, CLI],
+            preexec_fn=activate,
+            close_fds=False,
+        )
+        listener.close()
+        successor = None
+        try:
+            receive(sock, "READY=1")
+            assert urllib.request.urlopen(url, timeout=5).status == 200
+
+            # Restart with the listening socket while making requests
+            process.send_signal(signal.SIGUSR2)
+            refused = served = 0
+            errors = []
+            deadline = time.monotonic() + 10
+            while process.poll() is None and time.monotonic() < deadline:
+                try:
+                    urllib.request.urlopen(url, timeout=5)
+                    served += 1
+                except ConnectionRefusedError:
+                    refused += 1
+                except OSError as err:
+                    errors.append(err)
+            state = receive(sock, "READY=1")
+            successor = int(state["MAINPID"])
+            assert process.wait(5) == 0
+            assert refused == 0
+            assert errors == []
+            assert served > 0
+            assert successor != process.pid
+            assert urllib.request.urlopen(url, timeout=5).status == 200
+
+            # The new process stops on SIGTERM
+            os.kill(successor, signal.SIGTERM)
+            receive(sock, "STOPPING=1")
+        finally:
+            if process.poll() is None:
+                process.kill()
+            # The successor is not a child process, stop it by its pid
+            if successor is not None and successor != process.pid:
+                try:
+                    os.kill(successor, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+
+def test_notify_from_one_worker_process():
+    with tempfile.TemporaryDirectory() as directory:
+        sock = notify_socket(directory)
+        process = subprocess.Popen(
+            [sys.executable, CLI, "--port", "0", "--processes", "2"],
+            env=dict(os.environ, NOTIFY_SOCKET=sock.getsockname()),
+        )
+        try:
+            receive(sock, "READY=1")
+            process.send_signal(signal.SIGTERM)
+            receive(sock, "STOPPING=1")
+            assert process.wait(10) == 0
+            # No other worker process notified
+            sock.settimeout(0.5)
+            with pytest.raises(TimeoutError):
+                sock.recv(4096)
+        finally:
+            if process.poll() is None:
+                process.kill()